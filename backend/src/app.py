@@ -23,6 +23,9 @@ import socket
 from src.config import Config
 from src.services.octoprintService import octoprint_service
 from src.services.bambuCloudService import bambu_cloud_service
+from src.services.statusFeed import status_feed
+from src.services.requestTiming import request_timing
+from src.services.discoveryCache import ssdp_listener
 
 def get_host_ip():
     """Ermittelt die Host-IP"""
@@ -102,10 +105,17 @@ octoprint_service.initialize_from_stored_printers()
 logger.info("Initializing Bambu Cloud printers from stored configurations")
 bambu_cloud_service.initialize_from_stored_printers()
 
-@app.before_request
-def log_request_info():
-    if request.path.startswith('/api/'):  # Nur API-Anfragen loggen
-        logger.info(f"API Request: {request.method} {request.url}")
+# Starte WebSocket-Status-Feed
+logger.info("Starting WebSocket status feed")
+status_feed.start()
+
+# Passive Drucker-Erkennung über SSDP-Ankündigungen
+if Config.SSDP_LISTEN:
+    logger.info("Starting SSDP listener")
+    ssdp_listener.start()
+
+# Laufzeit je Route, Perzentile und Slow-Request-Log (ersetzt log_request_info)
+request_timing.init_app(app)
 
 @app.route('/stream/<printer_id>/stop', methods=['POST'])
 def stop_stream(printer_id):
@@ -79,6 +79,123 @@ class Config:
     TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
     TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 
+    # Status-Persistenz (Write-Behind)
+    # Intervall in Sekunden, in dem geänderte Drucker-Status gesammelt geschrieben werden (<= 0: nur beim Beenden)
+    STATUS_FLUSH_INTERVAL = float(os.getenv('STATUS_FLUSH_INTERVAL', 30))
+    # Felder, die nur im Speicher gehalten und nie auf die Platte geschrieben werden
+    STATUS_VOLATILE_FIELDS = [
+        field.strip()
+        for field in os.getenv('STATUS_VOLATILE_FIELDS', 'temperatures,targets,power,progress,print_duration').split(',')
+        if field.strip()
+    ]
+
+    # WebSocket-Status-Feed (Deltas statt vollständiger Status)
+    STATUS_FEED_PORT = int(os.getenv('STATUS_FEED_PORT', 9200))
+    # Zeitfenster in Sekunden, in dem Änderungen je Drucker zusammengefasst werden
+    STATUS_FEED_INTERVAL = float(os.getenv('STATUS_FEED_INTERVAL', 0.25))
+
+    # Telemetrie-Verlauf (Ringpuffer je Drucker)
+    # Höchstzahl Samples je Drucker, bei 1 Sample/s entspricht 3600 einer Stunde.
+    # Ältere Abfragen beantwortet der TelemetryStore.
+    HISTORY_CAPACITY = int(os.getenv('HISTORY_CAPACITY', 3600))
+    # Mindestabstand zwischen zwei Samples in Sekunden (neuere Werte überschreiben das letzte Sample)
+    HISTORY_MIN_INTERVAL = float(os.getenv('HISTORY_MIN_INTERVAL', 1.0))
+
+    # Dauerhafte Telemetrie (SQLite im WAL-Modus)
+    TELEMETRY_ENABLED = os.getenv('TELEMETRY_ENABLED', 'True') == 'True'
+    TELEMETRY_DB = Path(os.getenv('TELEMETRY_DB', DATA_DIR / 'telemetry.db'))
+    # Maximale Anzahl wartender Samples, weitere werden verworfen
+    TELEMETRY_QUEUE_SIZE = int(os.getenv('TELEMETRY_QUEUE_SIZE', 10000))
+    # Maximale Zeilen pro Transaktion und Sekunden, die für einen Batch gesammelt wird
+    TELEMETRY_BATCH_SIZE = int(os.getenv('TELEMETRY_BATCH_SIZE', 500))
+    TELEMETRY_FLUSH_INTERVAL = float(os.getenv('TELEMETRY_FLUSH_INTERVAL', 1.0))
+    # Verdichtung Rohdaten -> 1 Minute -> 1 Stunde (Intervall in Sekunden, <= 0: aus)
+    TELEMETRY_COMPACT_INTERVAL = float(os.getenv('TELEMETRY_COMPACT_INTERVAL', 300))
+    # Aufbewahrung je Stufe in Sekunden (Standard: 1 Tag, 30 Tage, 1 Jahr)
+    TELEMETRY_RAW_RETENTION = float(os.getenv('TELEMETRY_RAW_RETENTION', 24 * 3600))
+    TELEMETRY_1M_RETENTION = float(os.getenv('TELEMETRY_1M_RETENTION', 30 * 24 * 3600))
+    TELEMETRY_1H_RETENTION = float(os.getenv('TELEMETRY_1H_RETENTION', 365 * 24 * 3600))
+
+    # Request-Timing
+    # Anfragen, die länger dauern (Sekunden), werden als Slow-Request protokolliert
+    SLOW_REQUEST_THRESHOLD = float(os.getenv('SLOW_REQUEST_THRESHOLD', 1.0))
+    # Anzahl der letzten Laufzeiten je Route für die Perzentile
+    REQUEST_TIMING_WINDOW = int(os.getenv('REQUEST_TIMING_WINDOW', 1000))
+    # Anzahl der gemerkten Slow-Request-Einträge
+    SLOW_REQUEST_HISTORY = int(os.getenv('SLOW_REQUEST_HISTORY', 100))
+
+    # Sampling-Profiler (/api/system/profile)
+    # Maximale Messdauer in Sekunden
+    PROFILER_MAX_SECONDS = float(os.getenv('PROFILER_MAX_SECONDS', 60))
+    # Standard-Abstand zwischen zwei Samples in Sekunden
+    PROFILER_INTERVAL = float(os.getenv('PROFILER_INTERVAL', 0.01))
+
+    # Adaptive Abfrageintervalle (Sekunden) je nach Zustand des Druckers
+    # Creality/Moonraker HTTP-Polling: druckt oder heizt / Standby / von einem Client angesehen
+    POLL_INTERVAL_ACTIVE = float(os.getenv('POLL_INTERVAL_ACTIVE', 2.0))
+    POLL_INTERVAL_IDLE = float(os.getenv('POLL_INTERVAL_IDLE', 15.0))
+    POLL_INTERVAL_VIEWED = float(os.getenv('POLL_INTERVAL_VIEWED', 1.0))
+    # Längster Abstand zwischen Abfragen eines nicht erreichbaren Druckers
+    POLL_MAX_BACKOFF = float(os.getenv('POLL_MAX_BACKOFF', 60.0))
+    # Periodische pushall-Anfragen an lokale Bambu-Drucker (Reports kommen ohnehin inkrementell,
+    # P1-Drucker reagieren auf häufige pushall träge). 0 = aus, ein pushall gibt es immer beim Connect.
+    # Standard: nur alle 5 Minuten, solange ein Client den Drucker ansieht.
+    PUSHALL_INTERVAL_ACTIVE = float(os.getenv('PUSHALL_INTERVAL_ACTIVE', 0))
+    PUSHALL_INTERVAL_IDLE = float(os.getenv('PUSHALL_INTERVAL_IDLE', 0))
+    PUSHALL_INTERVAL_VIEWED = float(os.getenv('PUSHALL_INTERVAL_VIEWED', 300.0))
+    PUSHALL_MAX_BACKOFF = float(os.getenv('PUSHALL_MAX_BACKOFF', 600.0))
+    # Wie lange ein Drucker nach dem letzten Zugriff eines Clients als angesehen gilt
+    POLL_VIEW_HOLD = float(os.getenv('POLL_VIEW_HOLD', 30.0))
+
+    # Creality/Moonraker Polling
+    # Maximal gleichzeitig laufende Abfragen über alle Drucker
+    CREALITY_POLL_CONCURRENCY = int(os.getenv('CREALITY_POLL_CONCURRENCY', 16))
+    # Timeout je Abfrage bzw. nur für den Verbindungsaufbau (Sekunden)
+    CREALITY_POLL_TIMEOUT = float(os.getenv('CREALITY_POLL_TIMEOUT', 2.0))
+    CREALITY_CONNECT_TIMEOUT = float(os.getenv('CREALITY_CONNECT_TIMEOUT', 1.0))
+    # Status per Moonraker-WebSocket abonnieren (printer.objects.subscribe), Polling nur als Rückfallebene
+    CREALITY_SUBSCRIBE = os.getenv('CREALITY_SUBSCRIBE', 'True') == 'True'
+    # Wartezeit vor dem nächsten Abo-Versuch in Sekunden, verdoppelt sich je Fehlschlag bis zum Maximum
+    CREALITY_SUBSCRIBE_RETRY = float(os.getenv('CREALITY_SUBSCRIBE_RETRY', 2.0))
+    CREALITY_SUBSCRIBE_MAX_RETRY = float(os.getenv('CREALITY_SUBSCRIBE_MAX_RETRY', 300.0))
+    # Ping-Abstand der WebSocket-Verbindung, eine tote Verbindung fällt nach spätestens doppelt so langer Zeit auf
+    CREALITY_WS_PING_INTERVAL = float(os.getenv('CREALITY_WS_PING_INTERVAL', 10.0))
+
+    # Ausgehende HTTP-Aufrufe (Moonraker, OctoPrint, go2rtc, Telegram, Cloud)
+    # Offen gehaltene Keep-Alive-Verbindungen je Gegenstelle und Anzahl Gegenstellen mit eigenem Pool
+    HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 4))
+    HTTP_POOL_HOSTS = int(os.getenv('HTTP_POOL_HOSTS', 64))
+    # Standard-Timeouts in Sekunden für Verbindungsaufbau und Antwort, wenn ein Aufruf keinen eigenen setzt
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 3.0))
+    HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 10.0))
+
+    # Netzwerk-Scan (Port-Scan, wenn SSDP keine Drucker findet)
+    # Gleichzeitige Verbindungsversuche und Timeout je Verbindungsaufbau (Sekunden)
+    SCAN_CONCURRENCY = int(os.getenv('SCAN_CONCURRENCY', 256))
+    SCAN_CONNECT_TIMEOUT = float(os.getenv('SCAN_CONNECT_TIMEOUT', 1.0))
+    # Geprüfte Ports je Host: Bambu Lab (MQTT 8883 plus FTPS 990, RTSPS 322 oder Kamera 6000),
+    # Moonraker 7125, OctoPrint 80
+    SCAN_PORTS = [int(port) for port in os.getenv('SCAN_PORTS', '8883,990,322,6000,7125,80').split(',')]
+    # Größtes scanbares Netz als Präfixlänge (16 = 65534 Hosts)
+    SCAN_MIN_PREFIX = int(os.getenv('SCAN_MIN_PREFIX', 16))
+    # Größtes Netz für das blockierende GET /scan (22 = 1022 Hosts), größere nur über /scan/stream
+    SCAN_BLOCKING_MIN_PREFIX = int(os.getenv('SCAN_BLOCKING_MIN_PREFIX', 22))
+
+    # Video-Streams (ffmpeg -> WebSocket, ein Leser je Stream für alle Zuschauer)
+    # Wartende fMP4-Fragmente je Zuschauer, darüber setzt ein langsamer Zuschauer am nächsten Keyframe neu auf
+    STREAM_CLIENT_QUEUE = int(os.getenv('STREAM_CLIENT_QUEUE', 128))
+    # Obergrenze für die gemerkten Fragmente seit dem letzten Keyframe (Bytes), für sofortigen Einstieg neuer Zuschauer
+    STREAM_GOP_CACHE_BYTES = int(os.getenv('STREAM_GOP_CACHE_BYTES', 8 * 1024 * 1024))
+
+    # Passive Erkennung über SSDP-Ankündigungen (NOTIFY) der Bambu-Drucker
+    SSDP_LISTEN = os.getenv('SSDP_LISTEN', 'True') == 'True'
+    SSDP_LISTEN_PORTS = [int(port) for port in os.getenv('SSDP_LISTEN_PORTS', '2021,1990').split(',')]
+    # Sekunden nach der letzten Sichtung, die ein Drucker im Discovery-Cache bleibt und Scans direkt beantwortet
+    DISCOVERY_TTL = int(os.getenv('DISCOVERY_TTL', 300))
+    # Gespeicherte Drucker anhand der Seriennummer automatisch auf eine neue IP (DHCP) umstellen,
+    # sofern das TLS-Zertifikat unter der neuen IP die Seriennummer als CN trägt
+    DISCOVERY_REMATCH = os.getenv('DISCOVERY_REMATCH', 'False') == 'True'
+
     # Cloud Konfiguration
     CLOUD_API_URL = os.getenv('CLOUD_API_URL')
     CLOUD_API_KEY = os.getenv('CLOUD_API_KEY')
@@ -5,6 +5,7 @@ from .system import system_bp
 from .notifications import notifications_bp
 from .stream import stream_bp
 from .cloud import cloud_bp
+from .metrics import metrics_bp
 
 def register_blueprints(app):
     """Registriert alle Blueprints"""
@@ -14,11 +15,13 @@ def register_blueprints(app):
     from .notifications import notifications_bp
     from .stream import stream_bp
     from .printers import printers_bp
+    from .metrics import metrics_bp
 
     app.register_blueprint(cloud_bp, url_prefix='')
     #app.register_blueprint(system_bp)
     app.register_blueprint(system_bp, url_prefix='/api/system')    
     app.register_blueprint(notifications_bp)
     app.register_blueprint(stream_bp)
-    app.register_blueprint(printers_bp) 
+    app.register_blueprint(printers_bp)
+    app.register_blueprint(metrics_bp) 
     
\ No newline at end of file
@@ -0,0 +1,131 @@
+from flask import Blueprint, Response
+import logging
+import time
+from src.services.metrics import metrics
+from src.services.mqttService import mqtt_service
+from src.services.octoprintService import octoprint_service
+from src.services.bambuCloudService import bambu_cloud_service
+from src.services.statusStore import status_store
+from src.services.statusEvents import status_events
+from src.services.statusFeed import status_feed
+from src.services.streamService import stream_service
+from src.services.telemetryHistory import telemetry_history
+from src.services.moonrakerPoller import moonraker_poller
+from src.services.httpClient import http_client
+from src.services.discoveryCache import discovery_cache, ssdp_listener
+
+logger = logging.getLogger(__name__)
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+def _printer_states():
+    """(backend, PrinterState) aller Backends"""
+    states = [('bambulab', state) for state in list(mqtt_service.states.values())]
+    states += [('octoprint', printer['state']) for printer in list(octoprint_service.printers.values())
+               if 'state' in printer]
+    states += [('cloud', state) for state in list(bambu_cloud_service.states.values())]
+    states += [('creality', state) for state in status_store.states()]
+    return states
+
+
+def _update_counts():
+    return {(backend, state.printer_id): state.version for backend, state in _printer_states()}
+
+
+def _update_ages():
+    now = time.time()
+    return {
+        (backend, state.printer_id): round(now - state.updated_at, 3)
+        for backend, state in _printer_states() if state.updated_at
+    }
+
+
+def _ffmpeg_processes():
+    streams = list(stream_service.active_streams.values())
+    running = sum(1 for stream in streams if stream.get('process') and stream['process'].poll() is None)
+    return {(): running}
+
+
+def _push_clients():
+    return {('websocket',): len(status_feed.clients), ('sse',): status_events.subscriber_count()}
+
+
+def _telemetry_samples():
+    store = telemetry_history.store
+    if store is None:
+        return {}
+    return {('written',): store.written, ('dropped',): store.dropped}
+
+
+def _moonraker_printers():
+    return {(): moonraker_poller.printer_count()}
+
+
+def _moonraker_subscribed():
+    return {(): moonraker_poller.subscribed_count()}
+
+
+def _moonraker_idle_connections():
+    client = moonraker_poller.client
+    return {(): client.idle_connections() if client else 0}
+
+
+def _moonraker_connections_opened():
+    client = moonraker_poller.client
+    return {(): client.connections_opened if client else 0}
+
+
+def _http_client_pools():
+    return {(): http_client.pooled_hosts()}
+
+
+def _discovery_cached():
+    return {(): len(discovery_cache)}
+
+
+def _ssdp_listening():
+    return {(): int(ssdp_listener.running)}
+
+
+def _ssdp_announcements():
+    return {(): ssdp_listener.announcements}
+
+
+# Werte, die erst beim Abruf aus den Services gelesen werden.
+# Monoton steigende Zählerstände als Counter, damit rate() Neustarts erkennt.
+metrics.counter_function('bambucam_printer_state_updates_total', 'Status changes per printer since start',
+                         ('backend', 'printer_id'), _update_counts)
+metrics.gauge_function('bambucam_printer_last_update_age_seconds', 'Seconds since the last status change',
+                       ('backend', 'printer_id'), _update_ages)
+metrics.gauge_function('bambucam_ffmpeg_processes', 'Running ffmpeg stream processes', (), _ffmpeg_processes)
+metrics.gauge_function('bambucam_status_push_clients', 'Connected status push clients',
+                       ('transport',), _push_clients)
+metrics.counter_function('bambucam_telemetry_samples_total', 'Telemetry samples written to or dropped by the store',
+                         ('result',), _telemetry_samples)
+metrics.gauge_function('bambucam_moonraker_printers', 'Creality printers handled by the Moonraker poller',
+                       (), _moonraker_printers)
+metrics.gauge_function('bambucam_moonraker_subscribed_printers', 'Creality printers with an active status subscription',
+                       (), _moonraker_subscribed)
+metrics.gauge_function('bambucam_moonraker_idle_connections', 'Pooled idle keep-alive connections to Moonraker',
+                       (), _moonraker_idle_connections)
+metrics.counter_function('bambucam_moonraker_connections_opened_total', 'Connections opened by the Moonraker poller',
+                         (), _moonraker_connections_opened)
+metrics.gauge_function('bambucam_http_client_pools', 'Hosts with a pooled keep-alive connection in the shared HTTP client',
+                       (), _http_client_pools)
+metrics.gauge_function('bambucam_discovery_cached_printers', 'Printers currently in the discovery cache',
+                       (), _discovery_cached)
+metrics.gauge_function('bambucam_ssdp_listener_up', 'Whether the passive SSDP listener is running (1) or not (0)',
+                       (), _ssdp_listening)
+metrics.counter_function('bambucam_ssdp_announcements_total', 'Bambu SSDP announcements received by the listener',
+                         (), _ssdp_announcements)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus-Textformat für Scraper"""
+    try:
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+    except Exception as e:
+        logger.error(f"Error rendering metrics: {e}", exc_info=True)
+        return Response(f"# error: {e}\n", status=500, mimetype='text/plain')
@@ -4,7 +4,7 @@ import logging
 import os
 import json
 from src.config import Config
-import requests
+from src.services.httpClient import http_client
 from src.services.telegramService import telegram_service
 
 logger = logging.getLogger(__name__)
@@ -86,7 +86,7 @@ def setup_telegram():
         # Teste den Bot Token
         test_url = f"https://api.telegram.org/bot{token}/getMe"
         logger.info(f"Testing bot token at URL: {test_url}")
-        response = requests.get(test_url)
+        response = http_client.get(test_url)
         
         if not response.ok:
             logger.error(f"Invalid bot token. Response: {response.text}")
@@ -1,4 +1,4 @@
-from flask import jsonify, Blueprint, request
+from flask import jsonify, Blueprint, request, Response
 from flask_cors import cross_origin
 from src.services.streamService import stream_service
 from src.services import (
@@ -14,54 +14,41 @@ import json
 import uuid
 import requests
 import os
+import queue
 from src.config import Config  # Importiere Config
 from src.services.mqttService import mqtt_service
 from src.services.octoprintService import octoprint_service
+from src.services.printerRegistry import printer_registry
+from src.services.statusStore import status_store
+from src.services.bambuCloudService import bambu_cloud_service
+from src.services.statusEvents import status_events, RESYNC
+from src.services.printerState import offline_status
+from src.services.telemetryHistory import telemetry_history
+from src.services.pollPolicy import printer_views
+from src.services.networkScanner import parse_network_range, scan_coordinator
 
 logger = logging.getLogger(__name__)
 printers_bp = Blueprint('printers', __name__, url_prefix='/api')
 
 PRINTERS_DIR = Config.PRINTERS_DIR  # Nutze den Pfad aus der Config
 
+# Server-Sent Events
+SSE_KEEPALIVE_INTERVAL = 15  # Sekunden ohne Event bis zum Keepalive-Kommentar
+SSE_RETRY_MS = 3000  # Reconnect-Intervall für EventSource
+
 def getNextPort() -> int:
     """
     Findet den nächsten freien Port für einen neuen Drucker.
     Startet bei 8554 und erhöht um 1 bis ein freier Port gefunden wird.
     """
-    try:
-        printers_dir = 'data/printers'
-        used_ports = []
-        
-        # Durchsuche alle Drucker-Dateien
-        for printer_file in os.listdir(printers_dir):
-            if printer_file.endswith('.json'):
-                with open(os.path.join(printers_dir, printer_file), 'r') as f:
-                    printer = json.load(f)
-                    used_ports.append(printer.get('port', 0))
-                    
-        if not used_ports:
-            return 8554  # Startport wenn keine Drucker existieren
-        return max(used_ports) + 1
-    except FileNotFoundError:
-        return 8554  # Startport wenn Verzeichnis nicht existiert
-    except json.JSONDecodeError:
-        return 8554  # Startport wenn JSON ungültig
+    return printer_registry.next_port()
 
 def save_printer(printer_data: dict) -> None:
     """
     Speichert einen neuen Drucker in seiner eigenen JSON-Datei.
     """
     try:
-        printer_id = printer_data['id']
-        printer_dir = 'data/printers'
-        
-        # Stelle sicher, dass das Verzeichnis existiert
-        os.makedirs(printer_dir, exist_ok=True)
-        
-        # Speichere Drucker in seiner eigenen Datei
-        printer_file = os.path.join(printer_dir, f"{printer_id}.json")
-        with open(printer_file, 'w') as f:
-            json.dump(printer_data, f, indent=2)
+        printer_registry.save(printer_data)
 
     except Exception as e:
         logger.error(f"Fehler beim Speichern des Druckers: {str(e)}")
@@ -133,72 +120,262 @@ def delete_printer(printer_id):
         logger.error(f"Error deleting printer: {e}")
         return jsonify({"error": str(e)}), 500
 
+def _wants_refresh() -> bool:
+    return request.args.get('refresh', '').lower() in ('1', 'true', 'yes')
+
 @printers_bp.route('/scan', methods=['GET'])
 def scan_network():
+    """
+    Sucht Drucker per SSDP, sonst per Port-Scan (optional ?range=192.168.0.0/22, Standard: lokales /24).
+    Antwortet aus dem Discovery-Cache, solange dieser aktuell ist, ?refresh=1 erzwingt eine neue Suche.
+    Netze größer als /SCAN_BLOCKING_MIN_PREFIX nur über /scan/stream, sonst blockiert der Scan
+    einen Worker für Minuten.
+    """
+    network_range = request.args.get('range')
+    if network_range:
+        try:
+            network = parse_network_range(network_range)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if network.prefixlen < Config.SCAN_BLOCKING_MIN_PREFIX:
+            return jsonify({
+                "error": f"Network {network} is larger than /{Config.SCAN_BLOCKING_MIN_PREFIX}, use /scan/stream"
+            }), 400
     try:
-        printers = scanNetwork()
+        printers = scanNetwork(network_range, refresh=_wants_refresh())
         return jsonify({"printers": printers})
     except Exception as e:
         logger.error(f"Error scanning network: {e}")
         return jsonify({"error": str(e)}), 500
 
-@printers_bp.route('/printers/<printer_id>/status', methods=['GET'])
-def get_printer_status(printer_id: str):
+@printers_bp.route('/scan/stream', methods=['GET'])
+@cross_origin()
+def scan_network_stream():
+    """
+    Wie /scan, aber als Server-Sent Events: jeder Drucker kommt, sobald SSDP oder
+    der Port-Scan ihn erkennt (event: printer), dazu event: phase und
+    event: progress (probed/total Hosts) und zum Schluss event: done.
+    Der Client muss die Verbindung nach done schließen, sonst startet
+    EventSource beim Reconnect einen neuen Scan.
+
+    Gleichzeitige Anfragen für denselben Bereich teilen sich einen Scan, solange
+    ein anderer Bereich gescannt wird, gibt es 409. Gehen alle Clients, wird der
+    Scan abgebrochen.
+    """
+    network_range = request.args.get('range')
     try:
-        printer = getPrinterById(printer_id)
+        joined = scan_coordinator.join(network_range, refresh=_wants_refresh())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if joined is None:
+        return jsonify({"error": "Another network scan is running"}), 409
+    scan, events = joined
+
+    def generate():
+        try:
+            while True:
+                try:
+                    event = events.get(timeout=SSE_KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    return
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            # Auch beim Abbruch durch den Client (GeneratorExit beim nächsten Schreiben)
+            scan.leave(events)
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',  # nginx darf den Stream nicht puffern
+        }
+    )
+
+def _ensure_creality_polling(printer: dict):
+    """Startet das Polling für Creality-Drucker, falls es noch nicht läuft"""
+    if printer.get('type') == 'CREALITY' and not printer_service.is_polling(printer['id']):
+        printer_service.connect_printer(
+            printer_id=printer['id'],
+            printer_type=printer['type'],
+            ip=printer['ip']
+        )
+
+def _offline_printer_status(printer_id: str, printer: dict = None) -> dict:
+    """Fallback-Status im Format, in dem der Drucker sonst geliefert wird (Cloud, Bambu, Creality, OctoPrint)"""
+    printer = printer or {}
+    kind = 'CLOUD' if printer.get('isCloud') else printer.get('type')
+    if kind not in ('BAMBULAB', 'CREALITY', 'CLOUD'):
+        kind = 'OCTOPRINT'
+    return offline_status(kind, printer_id, printer.get('name', ''))
+
+def _cached_printer_status(printer: dict) -> dict:
+    """Baut den Status eines LAN-Druckers aus den In-Memory-Caches der Services"""
+    printer_id = printer['id']
+    
+    if printer['type'] == 'BAMBULAB':
+        return mqtt_service.get_printer_status(printer_id)
+    
+    if printer['type'] == 'OCTOPRINT':
+        status = octoprint_service.get_printer_status(printer_id)
+        logger.debug(f"OctoPrint status for {printer_id}: {status}")
+        return status or offline_status('OCTOPRINT', printer_id, printer.get('name', ''))
+    
+    _ensure_creality_polling(printer)
+    
+    # Creality-Status: gespeicherte Konfiguration plus Live-Status vom Moonraker-Poller
+    return {**printer, **status_store.get(printer_id)}
+
+@printers_bp.route('/printers/status', methods=['GET'])
+@cross_origin()
+def get_all_printer_status():
+    """Liefert den Status aller (oder der per ids= gewählten) Drucker in einer Antwort"""
+    try:
+        ids = request.args.get('ids')
+        wanted = {printer_id for printer_id in ids.split(',') if printer_id} if ids else None
         
-        if printer['type'] == 'BAMBULAB':
-            # Bestehender Bambulab Code bleibt unverändert
-            status = mqtt_service.get_printer_status(printer_id)
-            return jsonify(status)
-        elif printer['type'] == 'OCTOPRINT':
-            # Hole Status vom OctoPrint Service
-            status = octoprint_service.get_printer_status(printer_id)
-            logger.info(f"OctoPrint status for {printer_id}: {status}")
-            
-            if status:
-                return jsonify(status)
+        statuses = {}
+        for printer in getPrinters():
+            printer_id = printer['id']
+            if wanted is not None and printer_id not in wanted:
+                continue
+            try:
+                if printer.get('type') == 'CLOUD' or printer.get('isCloud'):
+                    statuses[printer_id] = (
+                        bambu_cloud_service.get_cached_status(printer.get('cloudId'))
+                        or offline_status('CLOUD')
+                    )
+                else:
+                    statuses[printer_id] = _cached_printer_status(printer)
+            except Exception as e:
+                logger.error(f"Error getting status for printer {printer_id}: {e}")
+                statuses[printer_id] = _offline_printer_status(printer_id, printer)
+        
+        return jsonify({'printers': statuses})
+        
+    except Exception as e:
+        logger.error(f"Error getting printer status list: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+def _format_sse(event: dict) -> str:
+    """Formatiert ein Status-Event als Server-Sent Event (einmal pro Event, geteilt von allen Clients)"""
+    message = event.get('sse')
+    if message is None:
+        data = json.dumps({
+            'printerId': event['printerId'],
+            'status': event['status'],
+            'timestamp': event['timestamp']
+        })
+        message = event['sse'] = f"id: {event['id']}\nevent: status\ndata: {data}\n\n"
+    return message
+
+@printers_bp.route('/printers/events', methods=['GET'])
+@cross_origin()
+def printer_events():
+    """Server-Sent Events mit Status-Änderungen aller Drucker (Fortsetzen per Last-Event-ID)"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    
+    ids = request.args.get('ids')
+    wanted = {printer_id for printer_id in ids.split(',') if printer_id} if ids else None
+    
+    # Creality-Status entsteht nur durch Polling, das ggf. erst gestartet werden muss
+    for printer in getPrinters():
+        _ensure_creality_polling(printer)
+    
+    def generate():
+        subscriber = status_events.subscribe()
+        try:
+            # Reconnect-Intervall für den Browser
+            yield f"retry: {SSE_RETRY_MS}\n\n"
             
-            # Fallback wenn kein Status verfügbar ist
-            return jsonify({
-                'id': printer_id,
-                'name': printer.get('name', ''),
-                'temps': {'hotend': 0, 'nozzle': 0, 'bed': 0, 'chamber': 0},
-                'temperatures': {'hotend': 0, 'nozzle': 0, 'bed': 0, 'chamber': 0},
-                'status': 'offline',
-                'progress': 0
-            })
-        else:
-            # Bestehender Code für Creality bleibt unverändert
-            printer_file = os.path.join(PRINTERS_DIR, f"{printer_id}.json")
-            with open(printer_file, 'r') as f:
-                printer_data = json.load(f)
+            last_sent = last_event_id
+            pending = status_events.events_since(last_event_id)
+            while True:
+                for event in pending:
+                    # Events aus dem Verlauf können zusätzlich in der Queue liegen
+                    if last_sent is not None and event['id'] <= last_sent:
+                        continue
+                    last_sent = event['id']
+                    if wanted is None or event['printerId'] in wanted:
+                        yield _format_sse(event)
                 
-            if printer_data['type'] == 'CREALITY':
-                printer_service.connect_printer(
-                    printer_id=printer_id,
-                    printer_type=printer_data['type'],
-                    ip=printer_data['ip']
-                )
-            
-            return jsonify(printer_data)
+                try:
+                    event = subscriber.get(timeout=SSE_KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    pending = []
+                    continue
+                
+                if event is RESYNC:
+                    # Queue ist übergelaufen: mit Snapshot neu synchronisieren
+                    last_sent = None
+                    pending = status_events.events_since(None)
+                else:
+                    pending = [event]
+        finally:
+            status_events.unsubscribe(subscriber)
+    
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',  # nginx darf den Stream nicht puffern
+        }
+    )
+
+@printers_bp.route('/printers/<printer_id>/status', methods=['GET'])
+def get_printer_status(printer_id: str):
+    printer = None
+    try:
+        printer = getPrinterById(printer_id)
+        # Ein Client sieht den Drucker an: Poller fragen ihn vorübergehend häufiger ab
+        printer_views.touch(printer_id)
+        return jsonify(_cached_printer_status(printer))
             
     except Exception as e:
         logger.error(f"Error getting printer status: {e}")
-        return jsonify({
-            'id': printer_id,
-            'name': getPrinterById(printer_id).get('name', '') if getPrinterById(printer_id) else '',
-            'temps': {'hotend': 0, 'nozzle': 0, 'bed': 0, 'chamber': 0},
-            'temperatures': {'hotend': 0, 'nozzle': 0, 'bed': 0, 'chamber': 0},
-            'status': 'offline',
-            'progress': 0
-        })
+        return jsonify(_offline_printer_status(printer_id, printer))
+
+@printers_bp.route('/printers/<printer_id>/history', methods=['GET'])
+@cross_origin()
+def get_printer_history(printer_id: str):
+    """
+    Verlauf der Messwerte eines Druckers.
+    Query-Parameter: since (Unix-Zeit in Sekunden), fields (kommagetrennt, z.B. nozzle,bed),
+    points (höchstens so viele Zeitpunkte für alle Felder zusammen) und method (lttb oder minmax, Standard lttb)
+    """
+    try:
+        if not printer_registry.contains(printer_id):
+            return jsonify({'error': 'Printer not found'}), 404
+        
+        since = request.args.get('since', type=float)
+        fields = [field for field in request.args.get('fields', '').split(',') if field]
+        points = request.args.get('points', type=int)
+        method = request.args.get('method', 'lttb')
+        try:
+            history = telemetry_history.query(printer_id, since=since, fields=fields, points=points, method=method)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({'printerId': printer_id, **history})
+        
+    except Exception as e:
+        logger.error(f"Error getting printer history: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
 
 @printers_bp.route('/printers/<printer_id>/status', methods=['PUT'])
 def update_status(printer_id):
     try:
         status_data = request.json
-        update_printer_status(printer_id, status_data)
+        printer_service.update_printer_status(printer_id, status_data)
         return jsonify({'success': True})
     except Exception as e:
         logger.error(f"Error updating printer status: {e}", exc_info=True)
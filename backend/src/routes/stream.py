@@ -1,8 +1,10 @@
 from flask import Blueprint, jsonify, request, Response
 from src.services.streamService import stream_service
 from src.services.printerService import getPrinterById
+from src.services.metrics import MJPEG_CLIENTS
+from src.services.pollPolicy import printer_views
 import logging
-import requests
+from src.services.httpClient import http_client
 
 # Einfacher Logger statt des spezialisierten Loggers
 logger = logging.getLogger(__name__)
@@ -54,8 +56,11 @@ def proxy_mjpeg_stream(printer_id):
         logger.info(f"Proxying stream from: {stream_url}")
         
         def generate():
+            MJPEG_CLIENTS.inc()
+            printer_views.open(printer_id)
+            response = None
             try:
-                response = requests.get(stream_url, stream=True, timeout=5)
+                response = http_client.get(stream_url, stream=True, timeout=5)
                 if response.ok:
                     headers = response.headers
                     logger.debug(f"Original headers: {headers}")
@@ -63,6 +68,12 @@ def proxy_mjpeg_stream(printer_id):
                         yield chunk
             except Exception as e:
                 logger.error(f"Error proxying MJPEG stream: {e}")
+            finally:
+                # Ein abgebrochener Stream kann nicht zurück in den Pool, die Verbindung wird geschlossen
+                if response is not None:
+                    response.close()
+                MJPEG_CLIENTS.dec()
+                printer_views.close(printer_id)
                 
         return Response(
             generate(),
@@ -2,9 +2,12 @@ import psutil
 import os
 import time
 import platform
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request, Response
 from flask_cors import cross_origin
 import logging
+from src.services.requestTiming import request_timing
+from src.services.profiler import profiler, PROFILE_FORMATS
+from src.config import Config
 
 logger = logging.getLogger(__name__)
 system_bp = Blueprint('system', __name__, url_prefix='')
@@ -102,6 +105,54 @@ def get_system_stats():
         logger.error(f"Error getting system stats: {e}")
         return jsonify({'error': str(e)}), 500
 
+@system_bp.route('/requests', methods=['GET'])
+@cross_origin()
+def get_request_timing():
+    """Perzentile der Laufzeit je Route und die letzten Slow-Requests"""
+    try:
+        return jsonify({
+            'threshold_ms': round(request_timing.threshold * 1000, 1),
+            'routes': request_timing.summary(),
+            'slow_requests': list(request_timing.slow_requests)
+        })
+    except Exception as e:
+        logger.error(f"Error getting request timing: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@system_bp.route('/profile', methods=['POST'])
+@cross_origin()
+def run_profiler():
+    """
+    Sampling-Profiler über alle Threads für seconds Sekunden.
+    format=collapsed (Text, flamegraph.pl) oder format=speedscope (JSON)
+    """
+    try:
+        seconds = float(request.args.get('seconds', 10))
+        interval = float(request.args.get('interval', Config.PROFILER_INTERVAL))
+        output = request.args.get('format', 'collapsed')
+    except ValueError:
+        return jsonify({'error': 'seconds and interval must be numbers'}), 400
+    if not 0 < seconds <= Config.PROFILER_MAX_SECONDS:
+        return jsonify({'error': f'seconds must be between 0 and {Config.PROFILER_MAX_SECONDS}'}), 400
+    if not 0.001 <= interval <= 1:
+        return jsonify({'error': 'interval must be between 0.001 and 1'}), 400
+    if output not in PROFILE_FORMATS:
+        return jsonify({'error': f'format must be one of {list(PROFILE_FORMATS)}'}), 400
+
+    try:
+        result = profiler.profile(seconds, interval, output)
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        logger.error(f"Error running profiler: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+    if output == 'collapsed':
+        return Response(result, mimetype='text/plain')
+    response = jsonify(result)
+    response.headers['Content-Disposition'] = 'attachment; filename=bambucam.speedscope.json'
+    return response
+
 @system_bp.route('/system/shutdown', methods=['POST'])
 @cross_origin()
 def shutdown():
@@ -20,6 +20,8 @@ from .streamService import (
 
 from .telegramService import telegram_service
 
+from .printerRegistry import printer_registry
+
 logger = logging.getLogger(__name__)
 
 __all__ = [
@@ -33,6 +35,7 @@ __all__ = [
     'printer_service',
     'stream_service',
     'telegram_service',
+    'printer_registry',
     'startPrint',
     'stopPrint',
     'getPrinterStatus'
@@ -0,0 +1,183 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPResponse:
+    """Antwort von AsyncHTTPClient.request"""
+
+    __slots__ = ('status', 'headers', 'body')
+
+    def __init__(self, status: int, headers: dict, body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 400
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class _Connection:
+    __slots__ = ('reader', 'writer', 'last_used')
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.last_used = time.monotonic()
+
+    def close(self):
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+
+class AsyncHTTPClient:
+    """
+    Schlanker HTTP/1.1-Client für asyncio mit Keep-Alive-Pool je Host.
+
+    Nach einer vollständig gelesenen Antwort geht die Verbindung zurück in den
+    Pool des Hosts und wird von der nächsten Anfrage wiederverwendet, statt für
+    jede Abfrage einen neuen TCP-Handshake zu machen. Verbindungen, die bei einem
+    Timeout oder Fehler mitten in einer Antwort stehen, werden verworfen.
+
+    Gedacht für kleine JSON-APIs im LAN (Moonraker), nicht für große Downloads.
+    Nicht threadsicher, alle Aufrufe müssen aus demselben Event Loop kommen.
+    """
+
+    def __init__(self, max_idle_per_host: int = 2, idle_timeout: float = 30.0, user_agent: str = 'BambuCAM'):
+        self.max_idle_per_host = max_idle_per_host
+        self.idle_timeout = idle_timeout
+        self.user_agent = user_agent
+        self._idle = {}  # (host, port) -> deque[_Connection]
+        self.connections_opened = 0
+
+    async def request(self, method: str, host: str, port: int, path: str, json_body=None,
+                      timeout: float = 5.0, connect_timeout: float = None) -> HTTPResponse:
+        """
+        Führt eine Anfrage aus. timeout gilt für die ganze Anfrage inklusive
+        Verbindungsaufbau, connect_timeout zusätzlich nur für den Verbindungsaufbau.
+        Wirft asyncio.TimeoutError bzw. OSError (ConnectionError) bei Fehlern.
+        """
+        body = json.dumps(json_body).encode('utf-8') if json_body is not None else b''
+        headers = [
+            f"{method} {path} HTTP/1.1",
+            f"Host: {host}:{port}",
+            f"User-Agent: {self.user_agent}",
+            "Accept: application/json",
+            "Connection: keep-alive",
+        ]
+        if json_body is not None:
+            headers.append("Content-Type: application/json")
+        if body or method in ('POST', 'PUT'):
+            headers.append(f"Content-Length: {len(body)}")
+        payload = ('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + body
+        return await asyncio.wait_for(
+            self._request((host, port), payload, method, connect_timeout or timeout), timeout
+        )
+
+    async def _request(self, key: tuple, payload: bytes, method: str, connect_timeout: float) -> HTTPResponse:
+        connection = self._take_idle(key)
+        if connection is not None:
+            try:
+                return await self._exchange(key, connection, payload, method)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # Der Server hat die Keep-Alive-Verbindung inzwischen geschlossen, einmal neu versuchen
+                logger.debug(f"Pooled connection to {key[0]}:{key[1]} was closed, reconnecting")
+
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(*key), connect_timeout)
+        self.connections_opened += 1
+        return await self._exchange(key, _Connection(reader, writer), payload, method)
+
+    async def _exchange(self, key: tuple, connection: _Connection, payload: bytes, method: str) -> HTTPResponse:
+        reusable = False
+        try:
+            connection.writer.write(payload)
+            await connection.writer.drain()
+            response, reusable = await self._read_response(connection.reader, method)
+            return response
+        finally:
+            if reusable:
+                self._put_idle(key, connection)
+            else:
+                connection.close()
+
+    async def _read_response(self, reader, method: str) -> tuple:
+        """Liest Statuszeile, Header und Body. Gibt (HTTPResponse, wiederverwendbar) zurück."""
+        head = await reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        parts = lines[0].split(' ', 2)
+        if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+            raise ConnectionError(f"Invalid HTTP status line: {lines[0]!r}")
+        version, status = parts[0], int(parts[1])
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        connection_header = headers.get('connection', '').lower()
+        keep_alive = connection_header != 'close' and (version == 'HTTP/1.1' or connection_header == 'keep-alive')
+
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            body = b''
+        elif 'chunked' in headers.get('transfer-encoding', '').lower():
+            body = await self._read_chunked(reader)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            # Ohne Länge endet der Body mit der Verbindung
+            body = await reader.read()
+            keep_alive = False
+        return HTTPResponse(status, headers, body), keep_alive
+
+    @staticmethod
+    async def _read_chunked(reader) -> bytes:
+        chunks = []
+        while True:
+            size_line = await reader.readuntil(b'\r\n')
+            size = int(size_line.split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                # Trailer bis zur Leerzeile überspringen
+                while (await reader.readuntil(b'\r\n')) != b'\r\n':
+                    pass
+                return b''.join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+    def _take_idle(self, key: tuple):
+        pool = self._idle.get(key)
+        now = time.monotonic()
+        while pool:
+            connection = pool.pop()
+            if now - connection.last_used < self.idle_timeout and not connection.reader.at_eof():
+                return connection
+            connection.close()
+        return None
+
+    def _put_idle(self, key: tuple, connection: _Connection):
+        pool = self._idle.setdefault(key, deque())
+        connection.last_used = time.monotonic()
+        pool.append(connection)
+        while len(pool) > self.max_idle_per_host:
+            pool.popleft().close()
+
+    def idle_connections(self) -> int:
+        return sum(len(pool) for pool in self._idle.values())
+
+    def close_host(self, host: str, port: int):
+        """Schließt alle gepoolten Verbindungen zu einem Host (z.B. beim Entfernen eines Druckers)"""
+        for connection in self._idle.pop((host, port), ()):
+            connection.close()
+
+    def close(self):
+        for key in list(self._idle):
+            self.close_host(*key)
@@ -1,4 +1,3 @@
-import requests
 import logging
 from datetime import datetime
 from enum import Enum
@@ -11,6 +10,12 @@ import threading
 import time
 import ssl
 from src.services.printerService import getPrinters
+from src.services.printerRegistry import printer_registry
+from src.services.httpClient import http_client
+from src.services.statusEvents import status_events
+from src.services.printerState import PrinterState
+from src.services.telemetryHistory import telemetry_history
+from src.services.metrics import MQTT_MESSAGES, MQTT_PARSE_ERRORS, MQTT_HANDLE_SECONDS
 
 logger = logging.getLogger(__name__)
 
@@ -41,15 +46,14 @@ class BambuCloudService:
     def __init__(self):
         self.base_url = "https://api.bambulab.com"
         self.mqtt_host = "us.mqtt.bambulab.com"
-        self.session = requests.Session()
+        self.session = http_client.new_session()
         self.config_file = Config.BAMBU_CLOUD_FILE
         self.mqtt_client = None
         self.mqtt_connected = False
         self.token = None
         self.config = {}
-        self.temperature_data = {}
         self.printers = []  # Initialize printers list
-        self.printer_data = {}  # Initialize printer data dictionary
+        self.states = {}  # device_id -> PrinterState aus den MQTT-Daten
         self.load_config()
 
     def disconnect_mqtt(self):
@@ -61,7 +65,7 @@ class BambuCloudService:
                 self.mqtt_client.disconnect()
                 self.mqtt_client = None
             self.mqtt_connected = False
-            self.printer_data = {}  # Clear stored printer data
+            self.states = {}  # Clear stored printer data
             logger.info("MQTT client disconnected and data cleared")
         except Exception as e:
             logger.error(f"Error disconnecting MQTT: {e}", exc_info=True)
@@ -475,28 +479,39 @@ class BambuCloudService:
 
     def get_printer_data(self, device_id):
         """Get current printer data"""
-        if hasattr(self, 'printer_data') and device_id in self.printer_data:
+        state = self.states.get(device_id)
+        if state is not None:
             # Format the data to match the expected structure
-            data = self.printer_data[device_id]
+            # Status is ACTIVE as soon as we receive temperature data
+            active = any(temp > 0 for temp in (
+                state.hotend, state.bed, state.chamber, state.target_hotend, state.target_bed
+            ))
             return {
                 'device': {
-                    'status': data.get('device', {}).get('status', 'OFFLINE'),
-                    'hotend_temp': data.get('device', {}).get('hotend_temp', 0.0),
-                    'bed_temp': data.get('device', {}).get('bed_temp', 0.0),
-                    'chamber_temp': data.get('device', {}).get('chamber_temp', 0.0),
-                    'target_nozzle_temp': data.get('device', {}).get('target_nozzle_temp', 0.0),
-                    'target_bed_temp': data.get('device', {}).get('target_bed_temp', 0.0)
+                    'status': 'ACTIVE' if active else 'OFFLINE',
+                    'hotend_temp': state.hotend,
+                    'bed_temp': state.bed,
+                    'chamber_temp': state.chamber,
+                    'target_nozzle_temp': state.target_hotend,
+                    'target_bed_temp': state.target_bed
                 },
                 'print': {
-                    'gcode_state': data.get('print', {}).get('gcode_state', 'IDLE'),
-                    'mc_percent': data.get('print', {}).get('mc_percent', 0.0),
-                    'mc_remaining_time': data.get('print', {}).get('mc_remaining_time', 0),
-                    'current_layer': data.get('print', {}).get('current_layer', 0),
-                    'total_layers': data.get('print', {}).get('total_layers', 0)
+                    'gcode_state': state.status,
+                    'mc_percent': state.progress,
+                    'mc_remaining_time': state.remaining_time,
+                    'current_layer': state.current_layer,
+                    'total_layers': state.total_layers
                 }
             }
         return None
 
+    def get_cached_status(self, device_id):
+        """Formatiert den Status eines Cloud-Druckers aus den MQTT-Daten im Speicher (None ohne Daten)"""
+        state = self.states.get(device_id)
+        if state is None:
+            return None
+        return state.snapshot()
+
     def request_full_printer_status(self, printer_id):
         """Request full printer status using pushing.pushall command"""
         if not self.mqtt_client or not self.mqtt_connected:
@@ -666,6 +681,7 @@ class BambuCloudService:
 
     def on_mqtt_message(self, client, userdata, msg):
         """Handle MQTT messages"""
+        started = time.perf_counter()
         try:
             logger.debug(f"Received MQTT message on topic {msg.topic}")
             
@@ -674,6 +690,7 @@ class BambuCloudService:
             if len(topic_parts) >= 3:
                 device_id = topic_parts[1]
                 logger.debug(f"Message for device: {device_id}")
+                MQTT_MESSAGES.inc('cloud', device_id)
                 
                 # Parse message payload
                 try:
@@ -681,79 +698,43 @@ class BambuCloudService:
                     data = json.loads(payload)
                     logger.debug(f"Parsed message payload: {data}")
                 except json.JSONDecodeError:
+                    MQTT_PARSE_ERRORS.inc('cloud', device_id)
                     logger.error(f"Failed to parse MQTT message as JSON: {msg.payload}")
                     return
                 except UnicodeDecodeError:
+                    MQTT_PARSE_ERRORS.inc('cloud', device_id)
                     logger.error(f"Failed to decode MQTT message as UTF-8")
                     return
                 
-                # Initialize or get existing printer data
-                if device_id not in self.printer_data:
-                    self.printer_data[device_id] = {
-                        'device': {
-                            'status': 'OFFLINE',
-                            'hotend_temp': 0.0,
-                            'bed_temp': 0.0,
-                            'chamber_temp': 0.0,
-                            'target_nozzle_temp': 0.0,
-                            'target_bed_temp': 0.0
-                        },
-                        'print': {
-                            'gcode_state': 'IDLE',
-                            'mc_percent': 0.0,
-                            'mc_remaining_time': 0,
-                            'current_layer': 0,
-                            'total_layers': 0
-                        }
-                    }
-                
-                if device_id not in self.temperature_data:
-                    self.temperature_data[device_id] = {
-                        'temperatures': {
-                            'hotend': 0.0,
-                            'bed': 0.0,
-                            'chamber': 0.0
-                        },
-                        'targets': {
-                            'hotend': 0.0,
-                            'bed': 0.0
-                        }
-                    }
-                
-                # Get current values to preserve them if not updated
-                current_printer_data = self.printer_data[device_id]
-                current_temp_data = self.temperature_data[device_id]
+                # Initialize or get existing printer state
+                state = self.states.get(device_id)
+                is_new = state is None
+                if is_new:
+                    # If we have MQTT data, the printer is online
+                    state = self.states[device_id] = PrinterState(device_id, 'CLOUD', status='IDLE', online=True)
                 
-                # Extract print data
+                # Extract print data, only fields present in the message are updated
                 print_data = data.get('print', {})
+                fields = {}
                 
                 # Update temperatures from direct fields if provided
                 if 'nozzle_temper' in print_data:
                     temp = float(print_data['nozzle_temper'])
                     if temp > 0 or temp == 0 and 'nozzle_target_temper' in print_data:  # Only update if >0 or if we have target temp
-                        current_printer_data['device']['hotend_temp'] = temp
-                        current_temp_data['temperatures']['hotend'] = temp
+                        fields['hotend'] = temp
                 
                 if 'bed_temper' in print_data:
-                    temp = float(print_data['bed_temper'])
-                    current_printer_data['device']['bed_temp'] = temp
-                    current_temp_data['temperatures']['bed'] = temp
+                    fields['bed'] = float(print_data['bed_temper'])
                 
                 if 'chamber_temper' in print_data:
-                    temp = float(print_data['chamber_temper'])
-                    current_printer_data['device']['chamber_temp'] = temp
-                    current_temp_data['temperatures']['chamber'] = temp
+                    fields['chamber'] = float(print_data['chamber_temper'])
                 
                 # Update target temperatures if provided
                 if 'nozzle_target_temper' in print_data:
-                    temp = float(print_data['nozzle_target_temper'])
-                    current_printer_data['device']['target_nozzle_temp'] = temp
-                    current_temp_data['targets']['hotend'] = temp
+                    fields['target_hotend'] = float(print_data['nozzle_target_temper'])
                 
                 if 'bed_target_temper' in print_data:
-                    temp = float(print_data['bed_target_temper'])
-                    current_printer_data['device']['target_bed_temp'] = temp
-                    current_temp_data['targets']['bed'] = temp
+                    fields['target_bed'] = float(print_data['bed_target_temper'])
                 
                 # Check for nested device.nozzle temperature data
                 if 'device' in print_data:
@@ -763,36 +744,35 @@ class BambuCloudService:
                         if '0' in nozzle_data and 'temp' in nozzle_data['0']:
                             temp = float(nozzle_data['0']['temp'])
                             if temp > 0:  # Only update if temperature is greater than 0
-                                current_printer_data['device']['hotend_temp'] = temp
-                                current_temp_data['temperatures']['hotend'] = temp
+                                fields['hotend'] = temp
                 
                 # Update print status if provided
                 if 'gcode_state' in print_data:
-                    current_printer_data['print']['gcode_state'] = print_data['gcode_state']
+                    fields['status'] = print_data['gcode_state']
                 if 'mc_percent' in print_data:
-                    current_printer_data['print']['mc_percent'] = float(print_data['mc_percent'])
+                    fields['progress'] = float(print_data['mc_percent'])
                 if 'mc_remaining_time' in print_data:
-                    current_printer_data['print']['mc_remaining_time'] = int(print_data['mc_remaining_time'])
+                    fields['remaining_time'] = int(print_data['mc_remaining_time'])
                 if 'current_layer' in print_data:
-                    current_printer_data['print']['current_layer'] = int(print_data['current_layer'])
+                    fields['current_layer'] = int(print_data['current_layer'])
                 if 'total_layers' in print_data:
-                    current_printer_data['print']['total_layers'] = int(print_data['total_layers'])
+                    fields['total_layers'] = int(print_data['total_layers'])
+                
+                if not state.update(**fields) and not is_new:
+                    return
                 
-                # Update the status based on whether we're receiving temperature data
-                if any([
-                    current_printer_data['device']['hotend_temp'] > 0,
-                    current_printer_data['device']['bed_temp'] > 0,
-                    current_printer_data['device']['chamber_temp'] > 0,
-                    current_printer_data['device']['target_nozzle_temp'] > 0,
-                    current_printer_data['device']['target_bed_temp'] > 0
-                ]):
-                    current_printer_data['device']['status'] = 'ACTIVE'
+                cached_status = state.snapshot()
+                logger.debug(f"Updated printer state for {device_id}: {cached_status}")
                 
-                logger.debug(f"Updated printer data for {device_id}: {current_printer_data}")
-                logger.debug(f"Updated temperature data for {device_id}: {current_temp_data}")
+                # Push an verbundene Clients, adressiert über die lokale Drucker-ID
+                for printer_id in printer_registry.ids_where('cloudId', device_id):
+                    status_events.publish(printer_id, cached_status)
+                    telemetry_history.record(printer_id, state)
                 
         except Exception as e:
             logger.error(f"Error processing MQTT message: {e}", exc_info=True)
+        finally:
+            MQTT_HANDLE_SECONDS.observe(time.perf_counter() - started, 'cloud')
 
     def on_mqtt_disconnect(self, client, userdata, rc):
         """Callback when client disconnects from MQTT broker"""
@@ -0,0 +1,203 @@
+import copy
+import ipaddress
+import logging
+import re
+import select
+import socket
+import struct
+import threading
+import time
+import uuid
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+SSDP_MULTICAST_GROUP = '239.255.255.250'
+_MAX_AGE = re.compile(r'max-age\s*=\s*(\d+)', re.IGNORECASE)
+
+
+def ssdp_headers(message: str) -> dict:
+    """Header einer SSDP-Nachricht (NOTIFY oder M-SEARCH-Antwort), Namen klein geschrieben"""
+    headers = {}
+    for line in message.split('\r\n')[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    return headers
+
+
+def ssdp_printer_info(message: str, ip: str):
+    """
+    Drucker-Informationen aus einer SSDP-Nachricht eines Bambu-Druckers, ohne
+    Netzwerkzugriff. None, wenn die Nachricht von keinem Bambu-Drucker stammt.
+    """
+    if 'bambulab' not in message.lower() or message.startswith('M-SEARCH'):
+        return None
+    headers = ssdp_headers(message)
+    mode = headers.get('devconnect.bambu.com', 'unknown').lower()
+    return {
+        'id': str(uuid.uuid4()),
+        'ip': ip,
+        'type': 'BAMBULAB',
+        'status': 'online',
+        'mode': mode,
+        'serial': headers.get('usn', ''),
+        'name': headers.get('devname.bambu.com', f'Printer {ip}'),
+        'model': headers.get('devmodel.bambu.com', 'X1C'),
+        'version': headers.get('devversion.bambu.com', ''),
+        'lan_mode_enabled': mode == 'lan',
+        'access_code': ''
+    }
+
+
+class DiscoveryCache:
+    """
+    Zuletzt gesehene Drucker aus passiven SSDP-Ankündigungen und aktiven Scans.
+
+    Schlüssel ist die Seriennummer (sonst die IP), damit ein Drucker nach einem
+    IP-Wechsel derselbe Eintrag bleibt. Ein Eintrag gilt ttl Sekunden nach der
+    letzten Sichtung als aktuell (bzw. so lange, wie CACHE-CONTROL max-age der
+    Ankündigung angibt). Listener werden bei jeder neuen Sichtung aufgerufen und
+    bekommen den Eintrag und die vorherige IP.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = Config.DISCOVERY_TTL if ttl is None else ttl
+        self._entries = {}  # serial oder ip -> Eintrag
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def add_listener(self, listener):
+        """listener(entry, previous_ip) läuft im Thread des Aufrufers von add()"""
+        self._listeners.append(listener)
+
+    def add(self, printer: dict, source: str, max_age: float = None) -> dict:
+        now = time.time()
+        key = printer.get('serial') or printer['ip']
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and printer.get('serial'):
+                # Zuvor nur per IP bekannt (Port-Scan), jetzt mit Seriennummer
+                entry = self._entries.pop(printer['ip'], None)
+            elif not printer.get('serial'):
+                known = next((e for k, e in self._entries.items() if e['ip'] == printer['ip'] and k != key), None)
+                if known is not None:
+                    # Port-Scan eines Druckers, der schon mit Seriennummer bekannt ist: nur die Sichtung zählt
+                    key, entry, printer = known['serial'], known, known
+            previous_ip = entry['ip'] if entry else None
+            merged = {**printer, 'id': entry['id'] if entry else printer['id'],
+                      'source': source, 'first_seen': entry['first_seen'] if entry else now,
+                      'last_seen': now, 'expires': now + (self.ttl if max_age is None else max_age)}
+            self._entries[key] = merged
+            snapshot = copy.deepcopy(merged)
+        for listener in self._listeners:
+            try:
+                listener(snapshot, previous_ip)
+            except Exception as e:
+                logger.error(f"Error in discovery listener: {e}")
+        return snapshot
+
+    def printers(self, network=None) -> list:
+        """Aktuelle Einträge nach IP sortiert, optional nur aus einem ipaddress-Netz"""
+        now = time.time()
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry['expires'] <= now]:
+                del self._entries[key]
+            entries = [copy.deepcopy(entry) for entry in self._entries.values()]
+        if network is not None:
+            entries = [entry for entry in entries if ipaddress.ip_address(entry['ip']) in network]
+        return sorted(entries, key=lambda entry: ipaddress.ip_address(entry['ip']))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class SSDPListener:
+    """
+    Hört dauerhaft auf SSDP-Ankündigungen (NOTIFY) der Bambu-Drucker und
+    trägt sie in den DiscoveryCache ein.
+
+    Die Drucker senden ihre Ankündigungen per Broadcast an Port 2021 bzw. per
+    Multicast an 239.255.255.250:1990. Ein Scan muss damit im Normalfall
+    nichts mehr senden und nicht mehr warten.
+    """
+
+    def __init__(self, cache: DiscoveryCache, ports=None):
+        self.cache = cache
+        self.ports = Config.SSDP_LISTEN_PORTS if ports is None else ports
+        self.sockets = []
+        self.thread = None
+        self.announcements = 0
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self.sockets = [sock for sock in (self._open(port) for port in self.ports) if sock is not None]
+        if not self.sockets:
+            logger.warning("SSDP listener could not bind any port, passive discovery disabled")
+            return
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._run, name='ssdp-listener', daemon=True)
+        self.thread.start()
+        logger.info(f"SSDP listener started on ports {[sock.getsockname()[1] for sock in self.sockets]}")
+
+    def _open(self, port: int):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if hasattr(socket, 'SO_REUSEPORT'):
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            sock.bind(('', port))
+            try:
+                membership = struct.pack('4s4s', socket.inet_aton(SSDP_MULTICAST_GROUP), socket.inet_aton('0.0.0.0'))
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+            except OSError as e:
+                logger.debug(f"Could not join SSDP multicast group on port {port}: {e}")
+            return sock
+        except OSError as e:
+            logger.warning(f"SSDP listener could not bind port {port}: {e}")
+            sock.close()
+            return None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                readable, _, _ = select.select(self.sockets, [], [], 1.0)
+            except (OSError, ValueError):
+                break
+            for sock in readable:
+                try:
+                    data, addr = sock.recvfrom(4096)
+                    self.handle(data.decode(errors='replace'), addr[0])
+                except Exception as e:
+                    logger.error(f"Error handling SSDP announcement: {e}")
+
+    def handle(self, message: str, ip: str):
+        printer = ssdp_printer_info(message, ip)
+        if printer is None:
+            return
+        self.announcements += 1
+        max_age = _MAX_AGE.search(ssdp_headers(message).get('cache-control', ''))
+        # Ankündigungen gelten mindestens so lange wie die TTL des Caches
+        ttl = max(int(max_age.group(1)), self.cache.ttl) if max_age else None
+        self.cache.add(printer, 'ssdp', ttl)
+
+    def stop(self):
+        self._stop.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+            self.thread = None
+        for sock in self.sockets:
+            sock.close()
+        self.sockets = []
+
+
+# Globale Instanzen
+discovery_cache = DiscoveryCache()
+ssdp_listener = SSDPListener(discovery_cache)
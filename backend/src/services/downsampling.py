@@ -0,0 +1,99 @@
+import numpy as np
+
+# Unterstützte Verfahren für points= in Verlaufsabfragen
+DOWNSAMPLING_METHODS = ('lttb', 'minmax')
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: wählt points Indizes, die den Kurvenverlauf
+    optisch erhalten. Erster und letzter Punkt bleiben immer enthalten.
+
+    y ist eine Reihe oder ein Array (Länge, Reihen). Bei mehreren Reihen zählt
+    die Summe der Dreiecksflächen, jede Reihe auf ihren Wertebereich normiert,
+    so dass alle Reihen zusammen genau points Indizes bekommen.
+
+    Die Durchschnitte aller Buckets werden vorab mit NumPy berechnet. Die Wahl
+    je Bucket hängt vom zuvor gewählten Punkt ab und läuft deshalb als Schleife
+    über die Buckets: O(points) Python-Iterationen, unabhängig von der Datenmenge.
+    """
+    length = len(x)
+    if points >= length:
+        return np.arange(length)
+    if points < 3:
+        return np.array([0, length - 1][:points], dtype=np.int64)
+
+    x = np.asarray(x, dtype=np.float64) - x[0]
+    y = np.asarray(y, dtype=np.float64).reshape(length, -1)
+    span = np.ptp(y, axis=0)
+    y = y / np.where(span > 0, span, 1.0)
+
+    every = (length - 2) / (points - 2)
+    # Bucket-Grenzen: Bucket i umfasst bounds[i]:bounds[i + 1], der Durchschnitt kommt aus Bucket i + 1.
+    # Der letzte Bucket ist nur der letzte Punkt.
+    bounds = np.minimum(np.floor(np.arange(points) * every).astype(np.int64) + 1, length)
+    counts = np.diff(bounds[1:])
+    avg_x = np.add.reduceat(x[:bounds[-1]], bounds[1:-1]) / counts
+    avg_y = np.add.reduceat(y[:bounds[-1]], bounds[1:-1], axis=0) / counts[:, None]
+
+    selected = np.empty(points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = length - 1
+    previous = 0
+    for bucket in range(points - 2):
+        start, end = bounds[bucket], bounds[bucket + 1]
+        # Doppelte Dreiecksfläche aus vorherigem Punkt, Kandidat und Durchschnitt des nächsten Buckets
+        areas = np.abs(
+            (x[previous] - avg_x[bucket]) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end, None]) * (avg_y[bucket] - y[previous])
+        ).sum(axis=1)
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def _minmax_bucket_indices(y: np.ndarray, buckets: int) -> np.ndarray:
+    """Indizes von Minimum und Maximum je Bucket, vektorisiert über eine Sortierung nach (Bucket, Wert)"""
+    length = len(y)
+    bucket_ids = np.arange(length) * buckets // length
+    order = np.lexsort((y, bucket_ids))
+    # Nach der Sortierung ist der erste Eintrag je Bucket das Minimum, der letzte das Maximum
+    starts = np.searchsorted(bucket_ids[order], np.arange(buckets))
+    ends = np.append(starts[1:], length) - 1
+    return np.unique(np.concatenate((order[starts], order[ends])))
+
+
+def minmax_indices(y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Min/Max je Bucket: teilt die Reihe in points // 2 gleich große Buckets und
+    behält pro Bucket den kleinsten und größten Wert. Spitzen gehen so nie verloren.
+    """
+    length = len(y)
+    buckets = points // 2
+    if points >= length or buckets < 1:
+        return np.arange(length)
+    return _minmax_bucket_indices(y, buckets)
+
+
+def downsample_indices(x: np.ndarray, columns: np.ndarray, points: int, method: str = 'lttb') -> np.ndarray:
+    """
+    Gemeinsame Indizes für mehrere Reihen mit derselben Zeitachse, höchstens points.
+
+    LTTB wählt die Punkte für alle Reihen zusammen. Min/Max teilt das Budget auf:
+    points // (2 * Reihen) Buckets, je Bucket Minimum und Maximum jeder Reihe.
+    Reicht das Budget nicht für einen Bucket je Reihe, wird LTTB verwendet.
+    """
+    if method not in DOWNSAMPLING_METHODS:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    if points >= len(x):
+        return np.arange(len(x))
+    if not columns.shape[1]:
+        return np.arange(0)
+
+    buckets = points // (2 * columns.shape[1])
+    if method == 'lttb' or buckets < 1:
+        return lttb_indices(x, columns, points)
+    return np.unique(np.concatenate([
+        _minmax_bucket_indices(columns[:, column].astype(np.float64), buckets)
+        for column in range(columns.shape[1])
+    ]))
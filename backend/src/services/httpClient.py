@@ -0,0 +1,135 @@
+import logging
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from src.config import Config
+from .metrics import HTTP_CLIENT_REQUESTS, HTTP_CLIENT_CONNECTIONS
+from .requestTiming import track_http
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def _host_label(host: str, port) -> str:
+    return f"{host}:{port}"
+
+
+class _CountingHTTPConnection(HTTPConnection):
+    def connect(self):
+        super().connect()
+        HTTP_CLIENT_CONNECTIONS.inc(_host_label(self.host, self.port))
+
+
+class _CountingHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        # Zählt TCP- und TLS-Handshake zusammen als eine neue Verbindung
+        super().connect()
+        HTTP_CLIENT_CONNECTIONS.inc(_host_label(self.host, self.port))
+
+
+class _HTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CountingHTTPConnection
+
+
+class _HTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+
+
+class _PooledAdapter(HTTPAdapter):
+    """
+    HTTPAdapter mit Standard-Timeout, der Aufrufe und neu aufgebaute Verbindungen je
+    Gegenstelle zählt und Aufrufe der laufenden Flask-Anfrage zuordnet
+    """
+
+    def __init__(self, timeout: tuple, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': _HTTPConnectionPool, 'https': _HTTPSConnectionPool}
+
+    def send(self, request, timeout=None, **kwargs):
+        parts = urlsplit(request.url)
+        HTTP_CLIENT_REQUESTS.inc(_host_label(parts.hostname, parts.port or _DEFAULT_PORTS.get(parts.scheme)))
+        # Laufzeit der laufenden Flask-Anfrage zuordnen (für das Slow-Request-Log)
+        with track_http(request.method, request.url) as call:
+            response = super().send(request, timeout=self.timeout if timeout is None else timeout, **kwargs)
+            if call is not None:
+                call['status'] = response.status_code
+            return response
+
+
+class HTTPClient:
+    """
+    Gemeinsamer HTTP-Client für alle ausgehenden Aufrufe (Moonraker, OctoPrint, go2rtc, Telegram).
+
+    Alle Aufrufe laufen über einen HTTPAdapter mit einem Keep-Alive-Pool je
+    Gegenstelle (Host und Port). Wiederholte Aufrufe an denselben Drucker oder
+    an go2rtc verwenden eine offene Verbindung weiter, statt jedes Mal TCP- und
+    TLS-Handshake zu machen. Je Gegenstelle bleiben höchstens pool_size
+    Verbindungen offen, gleichzeitige Aufrufe darüber hinaus bekommen eine
+    zusätzliche Verbindung, die danach geschlossen wird. Pools der am längsten
+    unbenutzten Gegenstellen werden ab max_hosts verworfen.
+
+    Ohne eigenes timeout gilt (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT), damit
+    kein Aufruf an einen hängenden Drucker ewig blockiert.
+
+    Die gemeinsame Session spricht mit vielen fremden Gegenstellen und speichert
+    daher keine Cookies und setzt keine eigenen Header, Header gehören an den
+    einzelnen Aufruf. Integrationen mit Login-Zustand nehmen new_session().
+    """
+
+    def __init__(self, pool_size=None, max_hosts=None, connect_timeout=None, read_timeout=None):
+        self.pool_size = Config.HTTP_POOL_SIZE if pool_size is None else pool_size
+        self.max_hosts = Config.HTTP_POOL_HOSTS if max_hosts is None else max_hosts
+        self.timeout = (
+            Config.HTTP_CONNECT_TIMEOUT if connect_timeout is None else connect_timeout,
+            Config.HTTP_READ_TIMEOUT if read_timeout is None else read_timeout,
+        )
+        self.adapter = _PooledAdapter(self.timeout, pool_connections=self.max_hosts, pool_maxsize=self.pool_size,
+                                      pool_block=False)
+        self.session = self.new_session(cookies=False)
+
+    def new_session(self, cookies: bool = True) -> requests.Session:
+        """
+        Session mit eigenen Headern und Cookies (z.B. Cloud-Login), die sich
+        Verbindungspools, Standard-Timeout und Zähler mit allen anderen Aufrufen teilt.
+        Mit cookies=False werden Cookies weder gespeichert noch gesendet.
+        """
+        session = requests.Session()
+        if not cookies:
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        session.mount('http://', self.adapter)
+        session.mount('https://', self.adapter)
+        return session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request('DELETE', url, **kwargs)
+
+    def pooled_hosts(self) -> int:
+        """Anzahl Gegenstellen mit offenem Verbindungspool"""
+        return len(self.adapter.poolmanager.pools)
+
+    def close(self):
+        self.adapter.close()
+
+
+# Globale Instanz
+http_client = HTTPClient()
@@ -0,0 +1,225 @@
+import bisect
+import math
+import threading
+
+# Standard-Buckets für Latenzen in Sekunden
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _header(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+
+    def remove_series(self, label: str, value):
+        """Entfernt alle Serien, deren Label label den Wert value hat (z.B. eines entfernten Druckers)"""
+        if label not in self.labelnames:
+            return
+        index = self.labelnames.index(label)
+        with self._lock:
+            for labels in [labels for labels in self._values if labels[index] == value]:
+                del self._values[labels]
+
+
+class Counter(_Metric):
+    """Monoton steigender Zähler je Label-Kombination"""
+    metric_type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        # Metriken ohne Labels werden von Anfang an mit 0 exportiert
+        self._values = {} if self.labelnames else {(): 0}
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def remove(self, *labels):
+        with self._lock:
+            self._values.pop(labels, None)
+
+    def value(self, *labels) -> float:
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def render(self) -> list:
+        with self._lock:
+            values = list(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in values
+        ]
+
+
+class Gauge(Counter):
+    """Wert, der steigen und fallen kann"""
+    metric_type = 'gauge'
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+
+class GaugeFunction(_Metric):
+    """Gauge, deren Werte erst beim Abruf über eine Funktion ermittelt werden"""
+    metric_type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def remove_series(self, label: str, value):
+        # Werte kommen beim Abruf aus den Services, die ihre Einträge selbst entfernen
+        pass
+
+    def render(self) -> list:
+        # function liefert {label_tuple: wert}
+        values = self.function() if self.function else {}
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in values.items()
+        ]
+
+
+class CounterFunction(GaugeFunction):
+    """Zähler, dessen Werte beim Abruf aus einem monoton steigenden Zählerstand der Services kommen"""
+    metric_type = 'counter'
+
+
+class Histogram(_Metric):
+    """Verteilung von Messwerten in festen Buckets (kumulativ beim Export)"""
+    metric_type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # labels -> [zähler je bucket..., +Inf, summe]
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [0] * (len(self.buckets) + 2)
+            entry[index] += 1
+            entry[-1] += value
+
+    def render(self) -> list:
+        with self._lock:
+            values = [(labels, list(entry)) for labels, entry in self._values.items()]
+        lines = self._header()
+        for labels, entry in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), entry[:-1]):
+                cumulative += count
+                bucket_label = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, bucket_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(entry[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Sammelt alle Metriken und rendert sie im Prometheus-Textformat"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def gauge_function(self, name, documentation, labelnames=(), function=None) -> GaugeFunction:
+        metric = self._register(GaugeFunction(name, documentation, labelnames))
+        if function is not None:
+            metric.function = function
+        return metric
+
+    def counter_function(self, name, documentation, labelnames=(), function=None) -> CounterFunction:
+        metric = self._register(CounterFunction(name, documentation, labelnames))
+        if function is not None:
+            metric.function = function
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def remove_series(self, label: str, value):
+        """Entfernt die Serien mit label=value aus allen Metriken"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.remove_series(label, value)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Globale Instanz
+metrics = MetricsRegistry()
+
+# Hot-Path-Metriken der Ingest-Pfade, Streams und Routen
+MQTT_MESSAGES = metrics.counter(
+    'bambucam_mqtt_messages_total', 'MQTT messages received', ('backend', 'printer_id'))
+MQTT_PARSE_ERRORS = metrics.counter(
+    'bambucam_mqtt_parse_errors_total', 'MQTT messages that could not be parsed', ('backend', 'printer_id'))
+MQTT_HANDLE_SECONDS = metrics.histogram(
+    'bambucam_mqtt_handle_seconds', 'Time spent in MQTT on_message handlers', ('backend',))
+FFMPEG_RESTARTS = metrics.counter(
+    'bambucam_ffmpeg_restarts_total', 'ffmpeg restarts by the stream monitor', ('printer_id',))
+WEBSOCKET_CLIENTS = metrics.gauge(
+    'bambucam_stream_websocket_clients', 'Connected video WebSocket clients', ())
+MJPEG_CLIENTS = metrics.gauge(
+    'bambucam_mjpeg_proxy_clients', 'Active MJPEG proxy clients', ())
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    'bambucam_http_request_seconds', 'Flask request latency per route', ('method', 'route', 'status'))
+MOONRAKER_POLLS = metrics.counter(
+    'bambucam_moonraker_polls_total', 'Moonraker status polls and subscription updates by result', ('result',))
+MOONRAKER_POLL_SECONDS = metrics.histogram(
+    'bambucam_moonraker_poll_seconds', 'Moonraker status poll latency', ())
+STREAM_FRAGMENTS_DROPPED = metrics.counter(
+    'bambucam_stream_fragments_dropped_total', 'Video fragments skipped for slow WebSocket viewers', ('printer_id',))
+HTTP_CLIENT_REQUESTS = metrics.counter(
+    'bambucam_http_client_requests_total', 'Outgoing HTTP requests through the shared client', ('host',))
+HTTP_CLIENT_CONNECTIONS = metrics.counter(
+    'bambucam_http_client_connections_total', 'New TCP/TLS connections opened by the shared client', ('host',))
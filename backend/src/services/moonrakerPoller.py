@@ -0,0 +1,347 @@
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+import websockets
+from src.config import Config
+from .asyncHttp import AsyncHTTPClient
+from .metrics import MOONRAKER_POLLS, MOONRAKER_POLL_SECONDS
+from .pollPolicy import MAX_BACKOFF_EXPONENT, creality_poll_policy
+from .statusStore import status_store
+
+logger = logging.getLogger(__name__)
+
+MOONRAKER_PORT = 7125
+# Größte akzeptierte WebSocket-Nachricht (Antwort auf das Abo enthält alle Objekte)
+MAX_WS_MESSAGE = 1024 * 1024
+
+# Abgefragte Moonraker-Objekte (None = alle Felder)
+QUERY_OBJECTS = {
+    "extruder": None,
+    "heater_bed": None,
+    "temperature_sensor chamber_temp": None,
+    "print_stats": None,
+    "virtual_sdcard": None
+}
+
+# Status, wenn ein Drucker nicht erreichbar ist
+ERROR_STATUS = {
+    'status': 'error',
+    'temperatures': {'hotend': 0, 'bed': 0, 'chamber': 0},
+    'targets': {'hotend': 0, 'bed': 0},
+    'progress': 0,
+    'state': 'error'
+}
+
+
+def moonraker_status(status: dict) -> dict:
+    """Wandelt das status-Objekt von printer/objects/query in das Creality-Statusformat"""
+    return {
+        'status': 'online',
+        'temperatures': {
+            'hotend': status.get('extruder', {}).get('temperature', 0),
+            'bed': status.get('heater_bed', {}).get('temperature', 0),
+            'chamber': status.get('temperature_sensor chamber_temp', {}).get('temperature', 0)
+        },
+        'targets': {
+            'hotend': status.get('extruder', {}).get('target', 0),
+            'bed': status.get('heater_bed', {}).get('target', 0)
+        },
+        'progress': (status.get('virtual_sdcard', {}).get('progress') or 0) * 100,
+        'state': status.get('print_stats', {}).get('state', 'standby')
+    }
+
+
+class SubscriptionError(Exception):
+    """Moonraker hat printer.objects.subscribe mit einem Fehler beantwortet"""
+
+
+def merge_status(status: dict, changes: dict):
+    """Übernimmt die geänderten Felder aus notify_status_update in den vollständigen Status"""
+    for name, fields in changes.items():
+        status.setdefault(name, {}).update(fields)
+
+
+class _PolledPrinter:
+    __slots__ = ('printer_id', 'ip', 'timeout', 'failures', 'task', 'wake',
+                 'subscribed', 'subscribe_failures', 'subscribe_at')
+
+    def __init__(self, printer_id: str, ip: str, timeout: float):
+        self.printer_id = printer_id
+        self.ip = ip
+        self.timeout = timeout
+        self.failures = 0
+        self.task = None
+        self.wake = None
+        self.subscribed = False
+        self.subscribe_failures = 0
+        self.subscribe_at = 0.0
+
+
+class MoonrakerPoller:
+    """
+    Fragt alle Creality/Moonraker-Drucker aus einem einzigen asyncio Event Loop ab.
+
+    Jeder Drucker ist eine Coroutine. Solange CREALITY_SUBSCRIBE aktiv ist, hält
+    sie eine WebSocket-Verbindung zu Moonraker und abonniert die Objekte per
+    printer.objects.subscribe. Moonraker schickt dann nur noch geänderte Felder
+    (notify_status_update), die in den vollständigen Status eingearbeitet werden.
+
+    Scheitert das Abo oder reißt die Verbindung ab, wird per HTTP abgefragt, bis
+    der nächste Abo-Versuch fällig ist (CREALITY_SUBSCRIBE_RETRY, verdoppelt je
+    Fehlschlag bis CREALITY_SUBSCRIBE_MAX_RETRY). Die HTTP-Abfragen laufen über
+    einen gemeinsamen Keep-Alive-Verbindungspool, höchstens
+    CREALITY_POLL_CONCURRENCY gleichzeitig und jede mit eigenem Timeout je Host.
+    Das Intervall bestimmt die PollPolicy je nach Zustand: schnell beim Drucken
+    oder Heizen und solange ein Client den Drucker ansieht, langsam im Standby.
+    Ein nicht erreichbarer Drucker belegt nur einen Platz bis zu seinem Timeout
+    und wird danach mit exponentiell wachsendem Abstand abgefragt, die übrigen
+    Drucker laufen ungestört weiter.
+
+    Threads und Verbindungen wachsen mit der Nebenläufigkeit bzw. der Anzahl
+    aktiver Abos, nicht mit Threads je Drucker. Neue Status gehen an
+    on_status(printer_id, status_data).
+    """
+
+    def __init__(self, policy=None, concurrency=None, timeout=None, connect_timeout=None, subscribe=None):
+        self.policy = creality_poll_policy if policy is None else policy
+        self.concurrency = Config.CREALITY_POLL_CONCURRENCY if concurrency is None else concurrency
+        self.timeout = Config.CREALITY_POLL_TIMEOUT if timeout is None else timeout
+        self.connect_timeout = Config.CREALITY_CONNECT_TIMEOUT if connect_timeout is None else connect_timeout
+        self.subscribe = Config.CREALITY_SUBSCRIBE if subscribe is None else subscribe
+        self.subscribe_retry = Config.CREALITY_SUBSCRIBE_RETRY
+        self.subscribe_max_retry = Config.CREALITY_SUBSCRIBE_MAX_RETRY
+        self.ping_interval = Config.CREALITY_WS_PING_INTERVAL
+        self.on_status = None
+        self.loop = None
+        self.client = None
+        self._semaphore = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._printers = {}  # printer_id -> _PolledPrinter
+        self.policy.views.add_listener(self._on_view)
+
+    def start(self):
+        """Startet den Event Loop in einem eigenen Thread (einmalig)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run_loop, args=(ready,), name='moonraker-poller', daemon=True)
+            self._thread.start()
+        ready.wait()
+
+    def _run_loop(self, ready: threading.Event):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.client = AsyncHTTPClient(max_idle_per_host=1)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        ready.set()
+        self.loop.run_forever()
+
+    def add(self, printer_id: str, ip: str, timeout: float = None) -> bool:
+        """Nimmt einen Drucker in die Abfrage auf. False, wenn er bereits mit dieser IP abgefragt wird."""
+        self.start()
+        with self._lock:
+            current = self._printers.get(printer_id)
+            if current is not None and current.ip == ip:
+                return False
+            printer = _PolledPrinter(printer_id, ip, timeout or self.timeout)
+            self._printers[printer_id] = printer
+        if current is not None:
+            self.loop.call_soon_threadsafe(self._cancel, current)
+        self.loop.call_soon_threadsafe(self._schedule, printer)
+        logger.info(f"Polling Creality printer {printer_id} at {ip}")
+        return True
+
+    def remove(self, printer_id: str) -> bool:
+        with self._lock:
+            printer = self._printers.pop(printer_id, None)
+        if printer is None:
+            return False
+        self.loop.call_soon_threadsafe(self._cancel, printer)
+        logger.info(f"Stopped polling Creality printer {printer_id}")
+        return True
+
+    def is_polling(self, printer_id: str) -> bool:
+        return printer_id in self._printers
+
+    def printer_count(self) -> int:
+        return len(self._printers)
+
+    def subscribed_count(self) -> int:
+        return sum(1 for printer in list(self._printers.values()) if printer.subscribed)
+
+    def stop(self):
+        """Beendet die Abfrage aller Drucker"""
+        with self._lock:
+            printers = list(self._printers.values())
+            self._printers.clear()
+        for printer in printers:
+            self.loop.call_soon_threadsafe(self._cancel, printer)
+
+    def _on_view(self, printer_id: str):
+        """Ein Client sieht den Drucker an: laufende Wartezeit abbrechen und sofort abfragen"""
+        printer = self._printers.get(printer_id)
+        if printer is not None and self.loop is not None:
+            self.loop.call_soon_threadsafe(self._wake, printer)
+
+    def _wake(self, printer: _PolledPrinter):
+        if printer.wake is not None:
+            printer.wake.set()
+
+    def _schedule(self, printer: _PolledPrinter):
+        printer.wake = asyncio.Event()
+        printer.task = self.loop.create_task(self._run(printer))
+
+    def _cancel(self, printer: _PolledPrinter):
+        if printer.task is not None:
+            printer.task.cancel()
+        self.client.close_host(printer.ip, MOONRAKER_PORT)
+
+    def _next_delay(self, printer: _PolledPrinter) -> float:
+        return self.policy.interval(printer.printer_id, status_store.get_state(printer.printer_id), printer.failures)
+
+    async def _sleep(self, printer: _PolledPrinter, delay: float):
+        """Wartet delay Sekunden oder bis der Drucker geweckt wird"""
+        printer.wake.clear()
+        try:
+            await asyncio.wait_for(printer.wake.wait(), max(0.0, delay))
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self, printer: _PolledPrinter):
+        # Zufälliger Versatz, damit gleichzeitig hinzugefügte Drucker nicht im Gleichschritt abgefragt werden
+        await asyncio.sleep(random.uniform(0, self.policy.active))
+        while self._printers.get(printer.printer_id) is printer:
+            if self.subscribe and self.loop.time() >= printer.subscribe_at:
+                await self._subscribe(printer)
+                continue
+            started = self.loop.time()
+            async with self._semaphore:
+                await self._poll(printer)
+            # Nicht über den nächsten Abo-Versuch hinaus warten
+            next_poll = started + self._next_delay(printer)
+            if self.subscribe:
+                next_poll = min(next_poll, printer.subscribe_at)
+            await self._sleep(printer, next_poll - self.loop.time())
+
+    async def _subscribe(self, printer: _PolledPrinter):
+        """
+        Hält ein Statusabo über die Moonraker-WebSocket, bis die Verbindung endet.
+        Danach wird der nächste Versuch geplant, bis dahin fragt _run per HTTP ab.
+        """
+        url = f"ws://{printer.ip}:{MOONRAKER_PORT}/websocket"
+        request_id = 0
+        status = None
+        established = False
+        reason = 'connection closed'
+
+        def subscribe_request() -> str:
+            nonlocal request_id
+            request_id += 1
+            return json.dumps({'jsonrpc': '2.0', 'method': 'printer.objects.subscribe',
+                               'params': {'objects': QUERY_OBJECTS}, 'id': request_id})
+
+        try:
+            async with websockets.connect(url, open_timeout=printer.timeout, ping_interval=self.ping_interval,
+                                          ping_timeout=self.ping_interval, close_timeout=1,
+                                          max_size=MAX_WS_MESSAGE) as websocket:
+                await websocket.send(subscribe_request())
+                async for message in websocket:
+                    data = json.loads(message)
+                    method = data.get('method')
+                    if method == 'notify_status_update':
+                        if status is not None:
+                            merge_status(status, data['params'][0])
+                            MOONRAKER_POLLS.inc('notify')
+                            self._publish(printer, moonraker_status(status))
+                    elif data.get('id') == request_id:
+                        if 'error' in data:
+                            raise SubscriptionError(data['error'].get('message', 'subscribe failed'))
+                        status = data['result']['status']
+                        if not established:
+                            established = True
+                            printer.subscribed = True
+                            printer.failures = 0
+                            logger.info(f"Subscribed to status of Creality printer {printer.printer_id}")
+                        self._publish(printer, moonraker_status(status))
+                    elif method == 'notify_klippy_ready':
+                        # Nach einem Klipper-Neustart muss das Abo erneuert werden
+                        await websocket.send(subscribe_request())
+        except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException,
+                SubscriptionError, ValueError, KeyError, IndexError, TypeError) as e:
+            reason = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+        finally:
+            printer.subscribed = False
+
+        if self._printers.get(printer.printer_id) is not printer:
+            return
+        # Ein Abo, das stand, wird sofort (mit kleinster Wartezeit) erneuert
+        printer.subscribe_failures = 1 if established else printer.subscribe_failures + 1
+        retry = min(self.subscribe_retry * 2 ** min(printer.subscribe_failures - 1, MAX_BACKOFF_EXPONENT),
+                    self.subscribe_max_retry)
+        printer.subscribe_at = self.loop.time() + retry
+        if established:
+            logger.warning(f"Status subscription of Creality printer {printer.printer_id} ended ({reason}), "
+                           f"polling until reconnect in {retry:.0f}s")
+        elif printer.subscribe_failures == 1:
+            logger.warning(f"Could not subscribe to Creality printer {printer.printer_id} ({reason}), "
+                           f"falling back to polling")
+        else:
+            logger.debug(f"Subscription to Creality printer {printer.printer_id} failed again ({reason}), "
+                         f"next attempt in {retry:.0f}s")
+
+    async def _poll(self, printer: _PolledPrinter):
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(
+                'POST', printer.ip, MOONRAKER_PORT, '/printer/objects/query', {"objects": QUERY_OBJECTS},
+                timeout=printer.timeout, connect_timeout=self.connect_timeout
+            )
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as e:
+            MOONRAKER_POLLS.inc('error')
+            self._failed(printer, f"{type(e).__name__}: {e}" if str(e) else type(e).__name__)
+            self._publish(printer, ERROR_STATUS)
+            return
+        finally:
+            MOONRAKER_POLL_SECONDS.observe(time.perf_counter() - started)
+
+        if not response.ok:
+            MOONRAKER_POLLS.inc('http_error')
+            self._failed(printer, f"HTTP {response.status}")
+            return
+        try:
+            status = response.json().get('result', {}).get('status', {})
+        except ValueError as e:
+            MOONRAKER_POLLS.inc('http_error')
+            self._failed(printer, f"invalid JSON: {e}")
+            return
+
+        MOONRAKER_POLLS.inc('ok')
+        if printer.failures:
+            logger.info(f"Creality printer {printer.printer_id} reachable again after {printer.failures} failed polls")
+            printer.failures = 0
+        self._publish(printer, moonraker_status(status))
+
+    def _failed(self, printer: _PolledPrinter, reason: str):
+        printer.failures += 1
+        # Nur den ersten Fehler einer Serie laut melden, danach wartet der Drucker ohnehin länger
+        if printer.failures == 1:
+            logger.warning(f"Error polling Creality printer {printer.printer_id} at {printer.ip}: {reason}")
+        else:
+            logger.debug(f"Error polling Creality printer {printer.printer_id} ({printer.failures}x): {reason}")
+
+    def _publish(self, printer: _PolledPrinter, status_data: dict):
+        if self.on_status is None or self._printers.get(printer.printer_id) is not printer:
+            return
+        try:
+            self.on_status(printer.printer_id, status_data)
+        except Exception as e:
+            logger.error(f"Error handling status of Creality printer {printer.printer_id}: {e}", exc_info=True)
+
+
+# Globale Instanz
+moonraker_poller = MoonrakerPoller()
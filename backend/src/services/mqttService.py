@@ -1,11 +1,19 @@
 import paho.mqtt.client as mqtt
 import json
 import logging
+import math
 import ssl
 from datetime import datetime
 from .notificationService import send_printer_notification
+from .printerRegistry import printer_registry
+from .statusEvents import status_events
+from .printerState import PrinterState, offline_status
+from .telemetryHistory import telemetry_history
+from .metrics import MQTT_MESSAGES, MQTT_PARSE_ERRORS, MQTT_HANDLE_SECONDS
+from .pollPolicy import MAX_BACKOFF_EXPONENT, bambu_pushall_policy
 from pathlib import Path
 import os
+import threading
 import time
 
 logger = logging.getLogger(__name__)
@@ -16,11 +24,32 @@ DISCOVERY_PORT = 1990
 SSDP_PORT = 2021
 RTSP_PORT = 322
 
+# Felder eines Reports -> (PrinterState-Feld, Typ). P1/A1 senden nur geänderte Felder,
+# fehlende Felder behalten daher ihren bisherigen Wert.
+REPORT_FIELDS = {
+    'gcode_state': ('status', str),
+    'nozzle_temper': ('hotend', float),
+    'bed_temper': ('bed', float),
+    'chamber_temper': ('chamber', float),
+    'nozzle_target_temper': ('target_hotend', float),
+    'bed_target_temper': ('target_bed', float),
+    'mc_percent': ('progress', float),
+    'mc_remaining_time': ('remaining_time', int),
+}
+
 class MQTTService:
     def __init__(self):
         self.clients = {}
-        self.printer_data = {}
+        self.states = {}  # printer_id -> PrinterState
         self.stored_printers = {}
+        self.printer_serials = {}  # printer_id -> Seriennummer aus dem Topic
+        # pushall-Planung: printer_id -> {'due', 'sent', 'failures'} (monotonic), letzter Report je Drucker
+        self.pushall_policy = bambu_pushall_policy
+        self._pushall = {}
+        self._last_report = {}
+        self._pushall_lock = threading.Lock()
+        self._pushall_thread = None
+        self.pushall_policy.views.add_listener(self._on_view)
 
     def connect_printer(self, printer_id: str, ip: str, access_code: str):
         """Verbindet einen Bambulab Drucker über MQTT"""
@@ -64,61 +93,8 @@ class MQTTService:
                     ]
                     client.subscribe(topics)
                     logger.info(f"Subscribed to topics: {[t[0] for t in topics]}")
-
-            def on_message(client, userdata, msg):
-                try:
-                    data = json.loads(msg.payload)
-                    serial = msg.topic.split('/')[1]  # Format: device/SERIAL/report
-                    
-                    # Speichere die Seriennummer beim ersten Empfang
-                    if printer_id not in self.stored_printers:
-                        from src.services import getPrinters
-                        for printer in getPrinters():
-                            if printer['id'] == printer_id:
-                                printer['serial'] = serial
-                                # Speichere den aktualisierten Drucker
-                                printer_file = os.path.join('/app/data/printers', f"{printer_id}.json")
-                                with open(printer_file, 'w') as f:
-                                    json.dump(printer, f, indent=2)
-                                break
-                    
-                    if 'print' in data:
-                        print_data = data['print']
-                        status_data = {
-                            'status': print_data.get('gcode_state', 'unknown'),
-                            'temperatures': {
-                                'nozzle': float(print_data.get('nozzle_temper', 0)),
-                                'bed': float(print_data.get('bed_temper', 0)),
-                                'chamber': float(print_data.get('chamber_temper', 0))
-                            },
-                            'targets': {
-                                'nozzle': float(print_data.get('nozzle_target_temper', 0)),
-                                'bed': float(print_data.get('bed_target_temper', 0))
-                            },
-                            'progress': float(print_data.get('mc_percent', 0)),
-                            'remaining_time': int(print_data.get('mc_remaining_time', 0))
-                        }
-                        
-                        # Cache die Daten
-                        self.printer_data[printer_id] = status_data
-                        logger.debug(f"Updated printer data: {self.printer_data}")
-                        
-                        # Update stored_printers Status
-                        if printer_id in self.stored_printers:
-                            self.stored_printers[printer_id].update({
-                                'status': status_data['status'],
-                                'temperatures': status_data['temperatures'],
-                                'targets': status_data['targets'],
-                                'progress': status_data['progress'],
-                                'remaining_time': status_data['remaining_time'],
-                                'last_update': datetime.now().timestamp()
-                            })
-                            
-                            # Sende Benachrichtigung bei Statusänderungen
-                            self._check_status_change(printer_id, data)
-                
-                except Exception as e:
-                    logger.error(f"Error processing MQTT message: {e}", exc_info=True)
+                    # Vollständigen Status anfordern, sobald die Seriennummer bekannt ist
+                    self._schedule_pushall(printer_id)
 
             # Zusätzliche Debug-Callbacks
             def on_disconnect(client, userdata, rc):
@@ -128,7 +104,7 @@ class MQTTService:
                 logger.info(f"Successfully subscribed with QoS: {granted_qos}")
 
             client.on_connect = on_connect
-            client.on_message = on_message
+            client.on_message = lambda client, userdata, msg: self._on_message(client, userdata, msg, printer_id)
             client.on_disconnect = on_disconnect
             client.on_subscribe = on_subscribe
             
@@ -143,38 +119,182 @@ class MQTTService:
             logger.error(f"Error connecting MQTT for printer {printer_id}: {e}", exc_info=True)
             raise
 
+    def _on_message(self, client, userdata, msg, printer_id):
+        """Verarbeitet einen Report eines Bambulab Druckers"""
+        started = time.perf_counter()
+        MQTT_MESSAGES.inc('bambulab', printer_id)
+        try:
+            data = json.loads(msg.payload)
+            serial = msg.topic.split('/')[1]  # Format: device/SERIAL/report
+
+            # Speichere die Seriennummer nur beim ersten Empfang oder bei Änderung
+            if self.printer_serials.get(printer_id) != serial:
+                self._remember_serial(printer_id, serial)
+            self._last_report[printer_id] = time.monotonic()
+
+            if 'print' in data:
+                print_data = data['print']
+                state = self.states.get(printer_id)
+                if state is None:
+                    # Zustand bis zum ersten gcode_state (spätestens mit der pushall-Antwort) unbekannt
+                    state = self.states[printer_id] = PrinterState(printer_id, 'BAMBULAB', status='unknown')
+
+                changed = state.update(**{
+                    field: convert(print_data[key])
+                    for key, (field, convert) in REPORT_FIELDS.items() if key in print_data
+                })
+
+                # Erste Nachricht zählt als Änderung, auch wenn sie den Standardwerten entspricht
+                if changed or state.version == 0:
+                    status_data = state.snapshot()
+                    logger.debug(f"Updated printer data for {printer_id}: {status_data}")
+
+                    # Push an verbundene Clients
+                    status_events.publish(printer_id, status_data)
+                    telemetry_history.record(printer_id, state)
+
+                # Update stored_printers Status
+                if printer_id in self.stored_printers:
+                    status_data = state.snapshot()
+                    self.stored_printers[printer_id].update({
+                        'status': status_data['status'],
+                        'temperatures': status_data['temperatures'],
+                        'targets': status_data['targets'],
+                        'progress': status_data['progress'],
+                        'remaining_time': status_data['remaining_time'],
+                        'last_update': datetime.now().timestamp()
+                    })
+
+                    # Sende Benachrichtigung bei Statusänderungen
+                    self._check_status_change(printer_id, data)
+
+        except ValueError as e:
+            # Ungültiges JSON oder nicht konvertierbare Werte
+            MQTT_PARSE_ERRORS.inc('bambulab', printer_id)
+            logger.error(f"Error parsing MQTT message: {e}")
+        except Exception as e:
+            logger.error(f"Error processing MQTT message: {e}", exc_info=True)
+        finally:
+            MQTT_HANDLE_SECONDS.observe(time.perf_counter() - started, 'bambulab')
+
+    def request_pushall(self, printer_id: str) -> bool:
+        """Fordert den vollständigen Status an (Antwort kommt als normaler Report)"""
+        client = self.clients.get(printer_id)
+        serial = self.printer_serials.get(printer_id) or (printer_registry.get(printer_id) or {}).get('serial')
+        if client is None or not serial or not client.is_connected():
+            return False
+        message = {
+            "pushing": {
+                "sequence_id": str(int(time.time())),
+                "command": "pushall",
+                "version": 1,
+                "push_target": 1
+            }
+        }
+        result = client.publish(f"device/{serial}/request", json.dumps(message))
+        if result.rc != mqtt.MQTT_ERR_SUCCESS:
+            logger.warning(f"Failed to request pushall from printer {printer_id}: {result.rc}")
+            return False
+        logger.debug(f"Requested pushall from printer {printer_id}")
+        return True
+
+    def _schedule_pushall(self, printer_id: str):
+        """Nach jedem (Re-)Connect sofort ein pushall, danach nach der PollPolicy"""
+        with self._pushall_lock:
+            self._pushall[printer_id] = {'due': 0, 'sent': None, 'failures': 0}
+        self._ensure_pushall_thread()
+
+    def _on_view(self, printer_id: str):
+        """Ein Client sieht den Drucker an: pushall vorziehen, falls der letzte zu alt ist"""
+        with self._pushall_lock:
+            entry = self._pushall.get(printer_id)
+            if entry is not None and entry['sent'] is not None and self.pushall_policy.viewed:
+                entry['due'] = min(entry['due'], entry['sent'] + self.pushall_policy.viewed)
+
+    def _ensure_pushall_thread(self):
+        if self._pushall_thread is not None:
+            return
+        with self._pushall_lock:
+            if self._pushall_thread is not None:
+                return
+            self._pushall_thread = threading.Thread(target=self._pushall_loop, name='bambu-pushall', daemon=True)
+            self._pushall_thread.start()
+
+    def _pushall_loop(self):
+        """
+        Fordert pushall in den Abständen der PollPolicy an. Standardmäßig nur alle
+        PUSHALL_INTERVAL_VIEWED Sekunden, solange ein Client zusieht (P1-Drucker
+        reagieren auf häufige pushall-Anfragen träge), sonst nur beim Connect.
+        Kam seit dem letzten pushall kein einziger Report, wächst der Abstand exponentiell.
+        """
+        logger.info("Starting Bambu pushall scheduler")
+        while True:
+            time.sleep(1.0)
+            try:
+                self._refresh_due()
+            except Exception as e:
+                logger.error(f"Error in pushall scheduler: {e}", exc_info=True)
+
+    def _refresh_due(self):
+        now = time.monotonic()
+        with self._pushall_lock:
+            due = [printer_id for printer_id, entry in self._pushall.items() if entry['due'] <= now]
+        for printer_id in due:
+            with self._pushall_lock:
+                entry = self._pushall.get(printer_id)
+            if entry is None:
+                continue
+            if entry['sent'] is not None and math.isinf(self.pushall_policy.interval(printer_id, self.states.get(printer_id))):
+                # In diesem Zustand kein periodisches pushall, erst ein Zuschauer zieht es wieder vor
+                entry['due'] = math.inf
+                continue
+            if not self.request_pushall(printer_id):
+                # Nicht verbunden oder Seriennummer noch unbekannt: beim nächsten Durchlauf erneut
+                continue
+            if entry['sent'] is not None and self._last_report.get(printer_id, 0) < entry['sent']:
+                entry['failures'] = min(entry['failures'] + 1, MAX_BACKOFF_EXPONENT)
+            else:
+                entry['failures'] = 0
+            entry['sent'] = now
+            entry['due'] = now + self.pushall_policy.interval(printer_id, self.states.get(printer_id), entry['failures'])
+
+    def _remember_serial(self, printer_id: str, serial: str):
+        """Merkt sich die Seriennummer und persistiert sie nur, wenn sie neu ist"""
+        self.printer_serials[printer_id] = serial
+        self.persist_serial(printer_id)
+
+    def persist_serial(self, printer_id: str):
+        """
+        Speichert die aus dem Topic gelernte Seriennummer im Drucker-Eintrag.
+        Drucker werden beim Hinzufügen erst nach dem MQTT-Connect gespeichert,
+        dann ruft printerService das nach dem Speichern erneut auf.
+        """
+        serial = self.printer_serials.get(printer_id)
+        try:
+            if not serial or not printer_registry.contains(printer_id):
+                return
+            if printer_registry.update(printer_id, {'serial': serial}):
+                logger.info(f"Stored serial {serial} for printer {printer_id}")
+        except Exception as e:
+            logger.error(f"Error storing serial for printer {printer_id}: {e}")
+
     def get_printer_status(self, printer_id: str) -> dict:
         """Holt den aktuellen Status eines Druckers"""
         try:
-            status_data = self.printer_data.get(printer_id, {})
-            logger.debug(f"Getting status for {printer_id}: {status_data}")
-            
-            if status_data:
-                return {
-                    'status': status_data['status'],
-                    'temperatures': status_data['temperatures'],
-                    'targets': status_data['targets'],
-                    'progress': status_data['progress'],
-                    'remaining_time': status_data['remaining_time']
-                }
+            state = self.states.get(printer_id)
+            if state is not None:
+                return state.snapshot()
             
             # Fallback wenn keine Daten vorhanden
-            return {
-                'status': 'offline',
-                'temperatures': {'hotend': 0, 'bed': 0, 'chamber': 0},
-                'targets': {'hotend': 0, 'bed': 0},
-                'progress': 0,
-                'remaining_time': 0
-            }
+            return offline_status('BAMBULAB')
         except Exception as e:
             logger.error(f"Error getting printer status: {e}", exc_info=True)
-            return {
-                'status': 'offline',
-                'temperatures': {'hotend': 0, 'bed': 0, 'chamber': 0},
-                'targets': {'hotend': 0, 'bed': 0},
-                'progress': 0,
-                'remaining_time': 0
-            }
+            return offline_status('BAMBULAB')
+
+    def is_connected(self, printer_id: str) -> bool:
+        """Ob die MQTT-Verbindung zum Drucker steht (ein toter Drucker fällt spätestens mit dem Keepalive auf)"""
+        client = self.clients.get(printer_id)
+        return client is not None and client.is_connected()
 
     def disconnect_printer(self, printer_id: str):
         """Trennt die MQTT Verbindung eines Druckers"""
@@ -182,10 +302,13 @@ class MQTTService:
             try:
                 self.clients[printer_id].disconnect()
                 del self.clients[printer_id]
-                if printer_id in self.printer_data:
-                    del self.printer_data[printer_id]
+                self.states.pop(printer_id, None)
                 if printer_id in self.stored_printers:
                     del self.stored_printers[printer_id]
+                self.printer_serials.pop(printer_id, None)
+                self._last_report.pop(printer_id, None)
+                with self._pushall_lock:
+                    self._pushall.pop(printer_id, None)
             except Exception as e:
                 logger.error(f"Error disconnecting printer {printer_id}: {e}")
 
@@ -238,7 +361,8 @@ class MQTTService:
                 
             # Sende M112 Notfall-Stopp-Befehl
             # Für Bambu Lab müssen wir den Befehl im richtigen Format senden
-            command_topic = f"device/{printer_id}/request"
+            serial = self.printer_serials.get(printer_id, printer_id)
+            command_topic = f"device/{serial}/request"
             command = {
                 "print": {
                     "sequence_id": str(int(time.time())),
@@ -1,7 +1,8 @@
+import asyncio
 import socket
-import threading
-import queue
 import json
+import queue
+import threading
 import requests
 import logging
 import uuid
@@ -9,6 +10,9 @@ import time
 from urllib3.exceptions import InsecureRequestWarning
 import ipaddress
 import paho.mqtt.client as mqtt
+from src.config import Config
+from .asyncHttp import AsyncHTTPClient
+from .discoveryCache import discovery_cache, ssdp_printer_info
 
 # Warnungen für selbst-signierte Zertifikate unterdrücken
 requests.packages.urllib3.disable_warnings(category=InsecureRequestWarning)
@@ -30,39 +34,13 @@ def test_lan_mode(ip):
 
 def parse_printer_info(response, ip):
     """Extrahiert detaillierte Drucker-Informationen aus der SSDP-Antwort"""
-    printer_info = {
-        'id': str(uuid.uuid4()),
-        'ip': ip,
-        'type': 'BAMBULAB',
-        'status': 'online',
-        'mode': 'unknown',
-        'serial': '',
-        'name': f'Printer {ip}',
-        'model': 'X1C',
-        'version': '',
-        'lan_mode_enabled': False,
-        'access_code': ''
-    }
+    printer_info = ssdp_printer_info(response, ip)
     
     try:
         # Check LAN mode using RTSP port
         lan_mode_available = test_lan_mode(ip)
         printer_info['lan_mode_enabled'] = lan_mode_available
 
-        # Parse SSDP response for additional info
-        for line in response.split('\r\n'):
-            if 'DevName.bambu.com:' in line:
-                printer_info['name'] = line.split(':', 1)[1].strip()
-            elif 'DevModel.bambu.com:' in line:
-                printer_info['model'] = line.split(':', 1)[1].strip()
-            elif 'DevVersion.bambu.com:' in line:
-                printer_info['version'] = line.split(':', 1)[1].strip()
-            elif 'DevConnect.bambu.com:' in line:
-                connect_mode = line.split(':', 1)[1].strip().lower()
-                printer_info['mode'] = connect_mode  # Use the actual mode from the header
-            elif 'USN:' in line:
-                printer_info['serial'] = line.split(':', 1)[1].strip()
-
         # If DevConnect header wasn't found, fall back to the port test
         if printer_info['mode'] == 'unknown':
             printer_info['mode'] = 'lan' if lan_mode_available else 'cloud'
@@ -74,25 +52,221 @@ def parse_printer_info(response, ip):
         logger.error(f"Error parsing printer info for {ip}: {e}")
         return printer_info
 
-def scanNetwork(network_range=None):
-    """Scannt das Netzwerk nach Bambu Lab Druckern"""
+# Bedeutung der gescannten Ports
+BAMBU_MQTT_PORT = 8883  # MQTT über TLS, allein nicht eindeutig (z.B. Mosquitto neben Home Assistant)
+# Weitere Dienste eines Bambu-Druckers: 990 FTPS, 322 RTSPS-Kamera (X1), 6000 Kamera (P1/A1)
+BAMBU_SERVICE_PORTS = {990, 322, 6000}
+BAMBU_CAMERA_PORTS = {322, 6000}  # nur im LAN-Modus offen
+MOONRAKER_PORT = 7125  # Creality/Klipper
+OCTOPRINT_PORT = 80
+# Mindestabstand zwischen zwei Fortschritts-Events des Port-Scans in Sekunden
+PROGRESS_INTERVAL = 0.25
+
+def _emit(on_event, event: dict):
+    if on_event is None:
+        return
+    try:
+        on_event(event)
+    except Exception as e:
+        logger.error(f"Error in scan event handler: {e}")
+
+async def _probe(ip: str, port: int, timeout: float) -> bool:
+    """Ob ein TCP-Verbindungsaufbau innerhalb von timeout gelingt"""
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+async def _identify(client: AsyncHTTPClient, ip: str, ports: set, timeout: float):
+    """Ordnet einen Host anhand seiner offenen Ports einem Druckertyp zu, None wenn keiner passt"""
+    printer_info = {
+        'id': str(uuid.uuid4()),
+        'ip': ip,
+        'status': 'online',
+        'mode': 'lan',
+        'serial': '',
+        'name': f'Printer {ip}',
+        'model': '',
+        'version': '',
+        'lan_mode_enabled': False,
+        'access_code': '',
+        'ports': sorted(ports)
+    }
+
+    if BAMBU_MQTT_PORT in ports and ports & BAMBU_SERVICE_PORTS:
+        lan_mode = bool(ports & BAMBU_CAMERA_PORTS)
+        printer_info.update(type='BAMBULAB', model='X1C', lan_mode_enabled=lan_mode,
+                            mode='lan' if lan_mode else 'cloud')
+        return printer_info
+
+    if MOONRAKER_PORT in ports:
+        printer_info['type'] = 'CREALITY'
+        try:
+            response = await client.request('GET', ip, MOONRAKER_PORT, '/printer/info', timeout=timeout)
+            if response.ok:
+                result = response.json().get('result', {})
+                printer_info['name'] = result.get('hostname') or printer_info['name']
+                printer_info['version'] = result.get('software_version', '')
+        except (OSError, asyncio.TimeoutError, ValueError) as e:
+            logger.debug(f"Moonraker info from {ip} failed: {e}")
+        return printer_info
+
+    if OCTOPRINT_PORT in ports:
+        # Port 80 allein kann jeder Webserver sein, OctoPrint nennt sich auf der Startseite
+        try:
+            response = await client.request('GET', ip, OCTOPRINT_PORT, '/', timeout=timeout)
+            if b'octoprint' in response.body[:65536].lower():
+                printer_info['type'] = 'OCTOPRINT'
+                return printer_info
+        except (OSError, asyncio.TimeoutError) as e:
+            logger.debug(f"OctoPrint check on {ip} failed: {e}")
+    return None
+
+def _host_count(network) -> int:
+    return network.num_addresses - 2 if network.prefixlen < 31 else network.num_addresses
+
+async def _scan_hosts(network, ports: list, concurrency: int, timeout: float, on_event=None, cancel=None) -> list:
+    # Die Hosts werden erst beim Abarbeiten erzeugt, ein /16 legt also keine 65k Aufgaben an
+    probes = ((str(ip), port) for ip in network.hosts() for port in ports)
+    total = _host_count(network)
+    remaining = {}  # ip -> noch ausstehende Proben
+    open_ports = {}  # ip -> offene Ports
+    identifying = []
+    printers = []
+    probed = 0
+    reported_at = 0.0
+    client = AsyncHTTPClient(max_idle_per_host=0)
+
+    def report():
+        nonlocal reported_at
+        reported_at = time.monotonic()
+        _emit(on_event, {'type': 'progress', 'phase': 'scan', 'probed': probed, 'total': total})
+
+    async def identify(ip, found):
+        printer = await _identify(client, ip, found, timeout * 2)
+        if printer is not None:
+            printers.append(printer)
+            logger.info(f"Found printer via port scan: {printer}")
+            _emit(on_event, {'type': 'printer', 'source': 'scan', 'printer': printer})
+
+    def host_done(ip):
+        nonlocal probed
+        probed += 1
+        found = open_ports.pop(ip, None)
+        if found:
+            # Erkennung sofort starten, damit der Drucker nicht erst nach dem ganzen Scan gemeldet wird
+            identifying.append(asyncio.create_task(identify(ip, found)))
+        if time.monotonic() - reported_at >= PROGRESS_INTERVAL:
+            report()
+
+    async def worker():
+        for ip, port in probes:
+            if cancel is not None and cancel.is_set():
+                return
+            if await _probe(ip, port, timeout):
+                open_ports.setdefault(ip, set()).add(port)
+            left = remaining.get(ip, len(ports)) - 1
+            if left:
+                remaining[ip] = left
+            else:
+                remaining.pop(ip, None)
+                host_done(ip)
+
+    try:
+        # Feste Anzahl Worker begrenzt die gleichzeitigen Verbindungsversuche,
+        # gather kehrt erst zurück, wenn jede Probe beantwortet oder abgelaufen ist
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+        await asyncio.gather(*identifying)
+    finally:
+        client.close()
+    report()
+    return sorted(printers, key=lambda printer: ipaddress.ip_address(printer['ip']))
+
+def scan_hosts(network_range, ports=None, concurrency=None, timeout=None, on_event=None, cancel=None) -> list:
+    """
+    Scannt alle Hosts eines Bereichs (bis /SCAN_MIN_PREFIX) in einem Durchlauf
+    auf die Drucker-Ports und liefert die erkannten Drucker sortiert nach IP.
+
+    on_event(event) bekommt jeden Drucker, sobald er erkannt ist
+    ({'type': 'printer', ...}), und höchstens alle PROGRESS_INTERVAL Sekunden
+    den Fortschritt ({'type': 'progress', 'probed': ..., 'total': ...}).
+
+    Läuft in einem eigenen Event Loop mit höchstens concurrency gleichzeitigen
+    Verbindungsversuchen, jeder mit eigenem Timeout. Die Laufzeit ist damit
+    durch (Hosts * Ports / concurrency) * timeout begrenzt. Ein gesetztes
+    cancel (threading.Event) beendet den Scan nach den laufenden Proben.
+    """
+    network = parse_network_range(str(network_range))
+    ports = Config.SCAN_PORTS if ports is None else ports
+    concurrency = Config.SCAN_CONCURRENCY if concurrency is None else concurrency
+    timeout = Config.SCAN_CONNECT_TIMEOUT if timeout is None else timeout
+
+    started = time.monotonic()
+    printers = asyncio.run(_scan_hosts(network, ports, concurrency, timeout, on_event, cancel))
+    logger.info(f"Port scan of {network} ({network.num_addresses} addresses, ports {ports}) "
+                f"took {time.monotonic() - started:.1f}s, found {len(printers)} printers")
+    return printers
+
+def local_network_range() -> str:
+    """/24 des lokalen Netzes, über das die Default-Route führt"""
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        s.connect(('8.8.8.8', 80))
+        local_ip = s.getsockname()[0]
+        logger.info(f"Local IP: {local_ip}")
+        return f"{'.'.join(local_ip.split('.')[:3])}.0/24"
+    except Exception as e:
+        logger.error(f"Error getting local IP: {e}")
+        return "192.168.1.0/24"  # Fallback
+    finally:
+        s.close()
+
+def parse_network_range(network_range: str):
+    """Prüft einen Bereich wie 192.168.0.0/22. Wirft ValueError bei ungültigen oder zu großen Netzen."""
+    network = ipaddress.ip_network(network_range.strip(), strict=False)
+    if network.version != 4:
+        raise ValueError(f"Only IPv4 ranges can be scanned: {network_range}")
+    if network.prefixlen < Config.SCAN_MIN_PREFIX:
+        raise ValueError(f"Network {network} is larger than /{Config.SCAN_MIN_PREFIX}")
+    return network
+
+def scanNetwork(network_range=None, on_event=None, refresh=False, cancel=None):
+    """
+    Scannt das Netzwerk nach Bambu Lab Druckern
+
+    Solange der Discovery-Cache (passive SSDP-Ankündigungen und frühere Scans)
+    aktuelle Drucker im Bereich kennt, kommt die Antwort sofort aus dem Cache.
+    Erst wenn er leer bzw. abgelaufen ist oder refresh gesetzt ist, wird aktiv
+    gesucht. Die Ergebnisse landen wieder im Cache.
+
+    on_event(event) wird für jeden gefundenen Drucker sofort aufgerufen, dazu
+    mit Phasenwechseln ({'type': 'phase', 'phase': 'cache' | 'ssdp' | 'scan'}) und dem
+    Fortschritt des Port-Scans (siehe scan_hosts). Ein gesetztes cancel
+    (threading.Event) bricht die Suche ab, geliefert wird das bis dahin Gefundene.
+    """
     try:
         # Get local IP and network if not provided
         if not network_range:
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            try:
-                s.connect(('8.8.8.8', 80))
-                local_ip = s.getsockname()[0]
-                logger.info(f"Local IP: {local_ip}")
-                network_range = f"{'.'.join(local_ip.split('.')[:3])}.0/24"
-            except Exception as e:
-                logger.error(f"Error getting local IP: {e}")
-                network_range = "192.168.1.0/24"  # Fallback
-            finally:
-                s.close()
-                
+            network_range = local_network_range()
+
+        if not refresh:
+            cached = discovery_cache.printers(parse_network_range(network_range))
+            if cached:
+                logger.info(f"Answering scan of {network_range} from discovery cache ({len(cached)} printers)")
+                _emit(on_event, {'type': 'phase', 'phase': 'cache'})
+                for printer in cached:
+                    _emit(on_event, {'type': 'printer', 'source': 'cache', 'printer': printer})
+                return cached
+
         logger.info(f"Starting network scan on {network_range}")
         found_printers = []
+        _emit(on_event, {'type': 'phase', 'phase': 'ssdp'})
         
         # SSDP Discovery
         ssdp_request = (
@@ -108,7 +282,30 @@ def scanNetwork(network_range=None):
         sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        sock.settimeout(2)
+
+        def receive(until):
+            """Sammelt SSDP-Antworten bis zum Zeitpunkt until"""
+            while True:
+                remaining = until - time.time()
+                if remaining <= 0 or cancel is not None and cancel.is_set():
+                    return
+                sock.settimeout(min(remaining, 0.2))
+                try:
+                    data, addr = sock.recvfrom(4096)
+                    response = data.decode()
+                    logger.debug(f"Received from {addr}: {response}")
+
+                    if 'bambulab' in response.lower():
+                        if not any(p['ip'] == addr[0] for p in found_printers):
+                            printer_info = discovery_cache.add(parse_printer_info(response, addr[0]), 'ssdp')
+                            found_printers.append(printer_info)
+                            logger.info(f"Found printer via SSDP: {printer_info}")
+                            _emit(on_event, {'type': 'printer', 'source': 'ssdp', 'printer': printer_info})
+
+                except socket.timeout:
+                    continue
+                except Exception as e:
+                    logger.error(f"Error receiving SSDP response: {e}")
 
         try:
             # Bind to all interfaces
@@ -123,58 +320,131 @@ def scanNetwork(network_range=None):
                     for _ in range(3):
                         sock.sendto(ssdp_request, ('239.255.255.250', port))
                         sock.sendto(ssdp_request, ('255.255.255.255', port))
-                        time.sleep(0.2)
+                        # Antworten schon zwischen den Anfragen auswerten statt erst danach
+                        receive(time.time() + 0.2)
                 except Exception as e:
                     logger.error(f"Error sending to port {port}: {e}")
 
             # Sammle SSDP Antworten
-            start_time = time.time()
-            while time.time() - start_time < 5:
-                try:
-                    data, addr = sock.recvfrom(4096)
-                    response = data.decode()
-                    logger.debug(f"Received from {addr}: {response}")
-                    
-                    if 'bambulab' in response.lower():
-                        printer_info = parse_printer_info(response, addr[0])
-                        if not any(p['ip'] == addr[0] for p in found_printers):
-                            found_printers.append(printer_info)
-                            logger.info(f"Found printer via SSDP: {printer_info}")
-                        
-                except socket.timeout:
-                    continue
-                except Exception as e:
-                    logger.error(f"Error receiving SSDP response: {e}")
+            receive(time.time() + 5)
 
         finally:
             sock.close()
 
-        # HTTP Scan als Backup
-        if not found_printers:
-            logger.info("No printers found via SSDP, trying HTTP scan...")
-            result_queue = queue.Queue()
-            threads = []
-            
-            network = ipaddress.ip_network(network_range)
-            logger.info(f"Scanning {len(list(network.hosts()))} hosts...")
-            
-            for ip in network.hosts():
-                ip_str = str(ip)
-                thread = threading.Thread(target=scan_printer, args=(ip_str, 8989, result_queue))
-                thread.daemon = True
-                threads.append(thread)
-                thread.start()
-            
-            # Wait for all threads with timeout
-            for thread in threads:
-                thread.join(timeout=0.1)
-            
-            while not result_queue.empty():
-                found_printers.append(result_queue.get())
+        # Port-Scan als Backup
+        if not found_printers and not (cancel is not None and cancel.is_set()):
+            logger.info("No printers found via SSDP, trying port scan...")
+            _emit(on_event, {'type': 'phase', 'phase': 'scan'})
+            found_printers = [discovery_cache.add(printer, 'scan')
+                              for printer in scan_hosts(network_range, on_event=on_event, cancel=cancel)]
 
         logger.info(f"Scan complete. Found {len(found_printers)} printers")
         return found_printers
 
     except Exception as e:
         logger.error(f"Error during network scan: {e}")
-        return [] 
\ No newline at end of file
+        return [] 
+
+
+class SharedScan:
+    """
+    Ein laufender Scan, dem sich mehrere Clients anschließen können.
+
+    Neue Clients bekommen die bisherigen Events (Phasen, Drucker und den
+    letzten Fortschritt) nachgeliefert, danach die laufenden. Verlässt der
+    letzte Client den Scan, wird er abgebrochen.
+    """
+
+    def __init__(self, network_range: str, on_finish=None):
+        self.network_range = network_range
+        self.cancel = threading.Event()
+        self.finished = False
+        self._events = []  # bisherige Events ohne Fortschritt
+        self._progress = None
+        self._queues = set()
+        self._lock = threading.Lock()
+        self._on_finish = on_finish
+
+    def start(self, refresh: bool = False):
+        threading.Thread(target=self._run, args=(refresh,), name='network-scan', daemon=True).start()
+
+    def _run(self, refresh: bool):
+        try:
+            printers = scanNetwork(self.network_range, on_event=self.publish, refresh=refresh, cancel=self.cancel)
+            self.publish({'type': 'done', 'count': len(printers)})
+        finally:
+            with self._lock:
+                self.finished = True
+                queues = list(self._queues)
+                self._queues.clear()
+            for events in queues:
+                events.put(None)
+            if self._on_finish is not None:
+                self._on_finish(self)
+
+    def publish(self, event: dict):
+        with self._lock:
+            if event['type'] == 'progress':
+                self._progress = event
+            else:
+                self._events.append(event)
+            queues = list(self._queues)
+        for events in queues:
+            events.put(event)
+
+    def join(self) -> queue.Queue:
+        """Queue mit allen Events des Scans, None markiert das Ende"""
+        events = queue.Queue()
+        with self._lock:
+            for event in self._events + ([self._progress] if self._progress else []):
+                events.put(event)
+            if self.finished:
+                events.put(None)
+            else:
+                self._queues.add(events)
+        return events
+
+    def leave(self, events: queue.Queue):
+        with self._lock:
+            self._queues.discard(events)
+            abandoned = not self._queues and not self.finished
+        if abandoned:
+            logger.info(f"Scan of {self.network_range} has no clients left, cancelling")
+            self.cancel.set()
+
+
+class ScanCoordinator:
+    """
+    Lässt höchstens einen Scan gleichzeitig laufen. Weitere Anfragen für
+    denselben Bereich schließen sich ihm an, andere Bereiche müssen warten.
+    """
+
+    def __init__(self):
+        self._current = None
+        self._lock = threading.Lock()
+
+    def join(self, network_range=None, refresh: bool = False):
+        """(SharedScan, Queue) oder None, wenn gerade ein anderer Bereich gescannt wird"""
+        network_range = str(parse_network_range(network_range or local_network_range()))
+        with self._lock:
+            scan = self._current
+            if scan is not None and scan.cancel.is_set():
+                # Abgebrochen, endet mit den laufenden Proben: nicht mehr anschließen
+                scan = None
+            if scan is not None and scan.network_range != network_range:
+                return None
+            if scan is None:
+                scan = self._current = SharedScan(network_range, on_finish=self._finished)
+                events = scan.join()
+                scan.start(refresh)
+                return scan, events
+        return scan, scan.join()
+
+    def _finished(self, scan: SharedScan):
+        with self._lock:
+            if self._current is scan:
+                self._current = None
+
+
+# Globale Instanz
+scan_coordinator = ScanCoordinator()
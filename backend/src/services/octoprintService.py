@@ -1,19 +1,20 @@
 import paho.mqtt.client as mqtt
 import json
 import logging
+import time
 from typing import Dict, Any, Optional, Callable
 from datetime import datetime
 import os
 from pathlib import Path
-import requests
+from .httpClient import http_client
+from .printerRegistry import printer_registry
+from .statusEvents import status_events
+from .printerState import PrinterState
+from .telemetryHistory import telemetry_history
+from .metrics import MQTT_MESSAGES, MQTT_PARSE_ERRORS, MQTT_HANDLE_SECONDS
 
 logger = logging.getLogger(__name__)
 
-# Definiere Basis-Verzeichnis für Drucker-Dateien
-BASE_DIR = Path(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-DATA_DIR = BASE_DIR / 'data'
-PRINTERS_DIR = DATA_DIR / 'printers'
-
 class OctoPrintService:
     def __init__(self):
         self.printers: Dict[str, Dict[str, Any]] = {}
@@ -32,15 +33,7 @@ class OctoPrintService:
                 'broker': printer_data.get('mqttBroker', printer_data.get('mqtt', {}).get('broker', 'localhost')),
                 'port': int(printer_data.get('mqttPort', printer_data.get('mqtt', {}).get('port', 1883)))
             },
-            'status': {
-                'temperatures': {
-                    'hotend': 0,
-                    'bed': 0,
-                    'chamber': 0
-                },
-                'progress': 0,
-                'status': 'connecting'
-            }
+            'state': PrinterState(printer_id, 'OCTOPRINT', name=printer_data['name'], status='connecting')
         }
         
         # Verbinde MQTT
@@ -74,8 +67,7 @@ class OctoPrintService:
         except Exception as e:
             logger.error(f"Error connecting to MQTT for OctoPrint printer {printer_id}: {e}", exc_info=True)
             # Status auf offline setzen
-            if printer_id in self.printers and 'status' in self.printers[printer_id]:
-                self.printers[printer_id]['status']['status'] = 'offline'
+            self._set_status(printer_id, status='offline')
     
     def _on_connect(self, client, userdata, flags, rc, printer_id):
         """Callback wenn MQTT verbunden ist"""
@@ -87,23 +79,42 @@ class OctoPrintService:
             client.subscribe("octoPrint/event/#")
             
             # Status auf verbunden setzen
-            if printer_id in self.printers and 'status' in self.printers[printer_id]:
-                self.printers[printer_id]['status']['status'] = 'ready'
+            self._set_status(printer_id, status='ready')
         else:
             logger.error(f"Failed to connect to MQTT broker for OctoPrint printer {printer_id}, rc={rc}")
             # Status auf offline setzen
-            if printer_id in self.printers and 'status' in self.printers[printer_id]:
-                self.printers[printer_id]['status']['status'] = 'offline'
+            self._set_status(printer_id, status='offline')
     
     def _on_disconnect(self, client, userdata, rc, printer_id):
         """Callback wenn MQTT getrennt wird"""
         logger.warning(f"Disconnected from MQTT broker for OctoPrint printer {printer_id}, rc={rc}")
         # Status auf offline setzen
-        if printer_id in self.printers and 'status' in self.printers[printer_id]:
-            self.printers[printer_id]['status']['status'] = 'offline'
+        self._set_status(printer_id, status='offline')
+    
+    def _set_status(self, printer_id: str, **fields):
+        """
+        Aktualisiert den Live-Status. Nur bei Änderungen werden Callbacks aufgerufen
+        und der Status an verbundene Clients gepusht.
+        """
+        printer = self.printers.get(printer_id)
+        if not printer or 'state' not in printer:
+            return
+        state = printer['state']
+        if not state.update(**fields):
+            return
+        status = state.snapshot()
+        logger.debug(f"Updated printer status: {status}")
+        
+        # Callback aufrufen, wenn vorhanden
+        if printer_id in self.status_callbacks:
+            self.status_callbacks[printer_id](status)
+        status_events.publish(printer_id, status)
+        telemetry_history.record(printer_id, state)
     
     def _on_message(self, client, userdata, msg, printer_id):
         """Callback für MQTT Nachrichten"""
+        started = time.perf_counter()
+        MQTT_MESSAGES.inc('octoprint', printer_id)
         try:
             logger.debug(f"Received MQTT message on topic {msg.topic}")
             
@@ -122,6 +133,7 @@ class OctoPrintService:
                     elif "temperature" in payload_json:
                         temperature = float(payload_json["temperature"])
                     else:
+                        MQTT_PARSE_ERRORS.inc('octoprint', printer_id)
                         logger.warning(f"Unbekanntes Temperaturformat: {payload_str}")
                         return
                         
@@ -130,26 +142,15 @@ class OctoPrintService:
                     try:
                         temperature = float(payload_str)
                     except ValueError:
+                        MQTT_PARSE_ERRORS.inc('octoprint', printer_id)
                         logger.warning(f"Konnte Temperatur nicht parsen: {payload_str}")
                         return
                 
-                if printer_id in self.printers and 'status' in self.printers[printer_id]:
-                    if sensor == "tool0":
-                        self.printers[printer_id]['status']['temperatures']['hotend'] = temperature
-                    elif sensor == "bed":
-                        self.printers[printer_id]['status']['temperatures']['bed'] = temperature
-                    elif sensor == "chamber":
-                        self.printers[printer_id]['status']['temperatures']['chamber'] = temperature
-                    
-                    # Status aktualisieren
-                    self.printers[printer_id]['status']['status'] = 'ready'
-                    
-                    # Debug-Ausgabe des aktualisierten Status
-                    logger.debug(f"Updated printer status: {self.printers[printer_id]['status']}")
-                    
-                    # Callback aufrufen, wenn vorhanden
-                    if printer_id in self.status_callbacks:
-                        self.status_callbacks[printer_id](self.printers[printer_id]['status'])
+                sensor_fields = {"tool0": 'hotend', "bed": 'bed', "chamber": 'chamber'}
+                fields = {'status': 'ready'}
+                if sensor in sensor_fields:
+                    fields[sensor_fields[sensor]] = temperature
+                self._set_status(printer_id, **fields)
             
             # Fortschritt verarbeiten
             elif msg.topic == "octoPrint/progress":
@@ -171,42 +172,34 @@ class OctoPrintService:
                         # Fallback: Versuche, die Nachricht direkt als Float zu konvertieren
                         progress = float(payload_str)
                     except ValueError:
+                        MQTT_PARSE_ERRORS.inc('octoprint', printer_id)
                         logger.warning(f"Konnte Fortschritt nicht parsen: {payload_str}")
                         return
                 
-                if printer_id in self.printers and 'status' in self.printers[printer_id]:
-                    self.printers[printer_id]['status']['progress'] = progress
-                    
-                    # Status auf Drucken setzen, wenn Fortschritt > 0
-                    if progress > 0:
-                        self.printers[printer_id]['status']['status'] = 'printing'
-                    
-                    # Callback aufrufen, wenn vorhanden
-                    if printer_id in self.status_callbacks:
-                        self.status_callbacks[printer_id](self.printers[printer_id]['status'])
+                fields = {'progress': progress}
+                # Status auf Drucken setzen, wenn Fortschritt > 0
+                if progress > 0:
+                    fields['status'] = 'printing'
+                self._set_status(printer_id, **fields)
             
             # Event-Updates verarbeiten
             elif msg.topic.startswith("octoPrint/event/"):
                 event_type = msg.topic.split("/")[-1]
                 
-                if printer_id in self.printers and 'status' in self.printers[printer_id]:
-                    if event_type == "PrintStarted":
-                        self.printers[printer_id]['status']['status'] = 'printing'
-                    elif event_type == "PrintDone":
-                        self.printers[printer_id]['status']['status'] = 'completed'
-                    elif event_type == "PrintFailed":
-                        self.printers[printer_id]['status']['status'] = 'failed'
-                    elif event_type == "PrintPaused":
-                        self.printers[printer_id]['status']['status'] = 'paused'
-                    elif event_type == "PrintResumed":
-                        self.printers[printer_id]['status']['status'] = 'printing'
-                    
-                    # Callback aufrufen, wenn vorhanden
-                    if printer_id in self.status_callbacks:
-                        self.status_callbacks[printer_id](self.printers[printer_id]['status'])
+                event_status = {
+                    "PrintStarted": 'printing',
+                    "PrintDone": 'completed',
+                    "PrintFailed": 'failed',
+                    "PrintPaused": 'paused',
+                    "PrintResumed": 'printing'
+                }
+                if event_type in event_status:
+                    self._set_status(printer_id, status=event_status[event_type])
             
         except Exception as e:
             logger.error(f"Error processing MQTT message: {e}", exc_info=True)
+        finally:
+            MQTT_HANDLE_SECONDS.observe(time.perf_counter() - started, 'octoprint')
     
     def remove_printer(self, printer_id: str):
         """Entfernt einen OctoPrint Drucker"""
@@ -227,29 +220,10 @@ class OctoPrintService:
     
     def get_printer_status(self, printer_id: str) -> Optional[Dict[str, Any]]:
         """Holt den aktuellen Status eines OctoPrint Druckers"""
-        printer_data = self.printers.get(printer_id, {})
-        status = printer_data.get('status')
-        if status:
-            # Format the status to match the expected frontend format
-            hotend_temp = status['temperatures']['hotend']
-            return {
-                'id': printer_id,
-                'name': printer_data.get('name', ''),
-                'temps': {
-                    'hotend': hotend_temp,
-                    'nozzle': hotend_temp,  # Add nozzle property for frontend compatibility
-                    'bed': status['temperatures']['bed'],
-                    'chamber': status['temperatures']['chamber']
-                },
-                'temperatures': {  # Add temperatures property for frontend compatibility
-                    'hotend': hotend_temp,
-                    'nozzle': hotend_temp,
-                    'bed': status['temperatures']['bed'],
-                    'chamber': status['temperatures']['chamber']
-                },
-                'status': status['status'],
-                'progress': status['progress']
-            }
+        state = self.printers.get(printer_id, {}).get('state')
+        if state:
+            # Im Format, das das Frontend erwartet (temps und temperatures, hotend und nozzle)
+            return state.snapshot()
         return None
     
     def set_status_callback(self, printer_id: str, callback: Callable):
@@ -284,36 +258,22 @@ class OctoPrintService:
         """Lädt alle gespeicherten OctoPrint-Drucker und stellt MQTT-Verbindungen her"""
         logger.info("Initializing OctoPrint service from stored printers")
         try:
-            # Stelle sicher, dass das Verzeichnis existiert
-            if not os.path.exists(PRINTERS_DIR):
-                logger.warning(f"Printers directory {PRINTERS_DIR} does not exist")
-                return
-                
             # Zähle gefundene OctoPrint-Drucker
             octoprint_count = 0
             
-            # Durchlaufe alle Drucker-Dateien
-            for printer_file in os.listdir(PRINTERS_DIR):
-                if printer_file.endswith('.json'):
-                    try:
-                        with open(os.path.join(PRINTERS_DIR, printer_file), 'r') as f:
-                            printer_data = json.load(f)
-                            
-                            # Prüfe, ob es ein OctoPrint-Drucker ist
-                            if printer_data.get('type') == 'OCTOPRINT':
-                                printer_id = printer_data.get('id')
-                                if not printer_id:
-                                    # Verwende Dateinamen ohne .json als ID
-                                    printer_id = printer_file.replace('.json', '')
-                                    printer_data['id'] = printer_id
-                                
-                                logger.info(f"Found OctoPrint printer: {printer_data.get('name')} (ID: {printer_id})")
-                                
-                                # Füge Drucker hinzu und verbinde MQTT
-                                self.add_printer(printer_data)
-                                octoprint_count += 1
-                    except Exception as e:
-                        logger.error(f"Error loading printer from {printer_file}: {e}", exc_info=True)
+            # Durchlaufe alle Drucker aus der Registry
+            for printer_data in printer_registry.get_all():
+                try:
+                    # Prüfe, ob es ein OctoPrint-Drucker ist
+                    if printer_data.get('type') == 'OCTOPRINT':
+                        printer_id = printer_data['id']
+                        logger.info(f"Found OctoPrint printer: {printer_data.get('name')} (ID: {printer_id})")
+                        
+                        # Füge Drucker hinzu und verbinde MQTT
+                        self.add_printer(printer_data)
+                        octoprint_count += 1
+                except Exception as e:
+                    logger.error(f"Error loading printer {printer_data.get('id')}: {e}", exc_info=True)
             
             logger.info(f"Initialized {octoprint_count} OctoPrint printers")
             
@@ -384,7 +344,7 @@ class OctoPrintService:
                     
                     logger.info(f"Sending emergency stop command to OctoPrint printer {printer_id} via REST API")
                     
-                    response = requests.post(api_url, json=payload, headers=headers, timeout=5)
+                    response = http_client.post(api_url, json=payload, headers=headers, timeout=5)
                     
                     if response.status_code == 204 or response.status_code == 200:
                         logger.info(f"Emergency stop command sent successfully to OctoPrint printer {printer_id} via REST API")
@@ -397,12 +357,7 @@ class OctoPrintService:
             # Update printer status if successful
             if success:
                 # Aktualisiere den Status des Druckers
-                if 'status' in self.printers[printer_id]:
-                    self.printers[printer_id]['status']['status'] = 'stopped'
-                    
-                    # Callback aufrufen, wenn vorhanden
-                    if printer_id in self.status_callbacks:
-                        self.status_callbacks[printer_id](self.printers[printer_id]['status'])
+                self._set_status(printer_id, status='stopped')
                 
                 return True
             else:
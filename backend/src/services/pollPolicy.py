@@ -0,0 +1,131 @@
+import logging
+import math
+import threading
+import time
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Zustände (Creality print_stats.state bzw. Bambu gcode_state, klein geschrieben), in denen sich viel ändert
+ACTIVE_STATES = {'printing', 'paused', 'prepare', 'running', 'pause', 'slicing', 'init'}
+# Größter Exponent für den Backoff; mehr Fehlschläge ändern am (gedeckelten) Intervall nichts mehr
+# und 2 ** failures würde bei langen Ausfällen als float überlaufen
+MAX_BACKOFF_EXPONENT = 16
+
+
+class ViewTracker:
+    """
+    Merkt sich, welche Drucker gerade von einem Client angesehen werden.
+
+    Kurze Zugriffe (Status-Abfrage) zählen per touch() für VIEW_HOLD Sekunden,
+    laufende Streams halten den Drucker per open()/close() dauerhaft als angesehen.
+    Listener werden aufgerufen, sobald ein Drucker neu angesehen wird, damit
+    Poller nicht bis zum Ende ihres (langen) Idle-Intervalls warten.
+    """
+
+    def __init__(self, hold=None):
+        self.hold = Config.POLL_VIEW_HOLD if hold is None else hold
+        self._lock = threading.Lock()
+        self._until = {}  # printer_id -> monotonic Zeitpunkt, bis zu dem der Drucker als angesehen gilt
+        self._open = {}  # printer_id -> Anzahl laufender Streams
+        self._listeners = []
+
+    def add_listener(self, listener):
+        """listener(printer_id) wird im aufrufenden Thread ausgeführt und darf nicht blockieren"""
+        self._listeners.append(listener)
+
+    def touch(self, printer_id: str):
+        now = time.monotonic()
+        with self._lock:
+            started = not self._is_viewed(printer_id, now)
+            self._until[printer_id] = now + self.hold
+        if started:
+            self._notify(printer_id)
+
+    def open(self, printer_id: str):
+        now = time.monotonic()
+        with self._lock:
+            started = not self._is_viewed(printer_id, now)
+            self._open[printer_id] = self._open.get(printer_id, 0) + 1
+        if started:
+            self._notify(printer_id)
+
+    def close(self, printer_id: str):
+        """Beendet einen Stream, der Drucker bleibt noch VIEW_HOLD Sekunden angesehen"""
+        with self._lock:
+            count = self._open.get(printer_id, 0) - 1
+            if count > 0:
+                self._open[printer_id] = count
+            else:
+                self._open.pop(printer_id, None)
+            self._until[printer_id] = time.monotonic() + self.hold
+
+    def is_viewed(self, printer_id: str) -> bool:
+        with self._lock:
+            return self._is_viewed(printer_id, time.monotonic())
+
+    def _is_viewed(self, printer_id: str, now: float) -> bool:
+        return self._open.get(printer_id, 0) > 0 or self._until.get(printer_id, 0) > now
+
+    def forget(self, printer_id: str):
+        with self._lock:
+            self._until.pop(printer_id, None)
+            self._open.pop(printer_id, None)
+
+    def _notify(self, printer_id: str):
+        for listener in self._listeners:
+            try:
+                listener(printer_id)
+            except Exception as e:
+                logger.error(f"Error in view listener: {e}")
+
+
+class PollPolicy:
+    """
+    Abfrageintervall eines Druckers abhängig von Zustand und Aktivität:
+
+    - nicht erreichbar: active * 2^Fehlschläge, höchstens max_backoff
+    - angesehen (Status-Abfrage, Stream): viewed
+    - druckt, pausiert, bereitet vor oder heizt (Solltemperatur > 0): active
+    - sonst (Standby, fertig, abgebrochen): idle
+
+    Ein Intervall von 0 schaltet die Abfrage in diesem Fall ab (math.inf).
+    """
+
+    def __init__(self, active: float, idle: float, viewed: float, max_backoff: float, views: ViewTracker):
+        self.active = active
+        self.idle = idle
+        self.viewed = viewed
+        self.max_backoff = max_backoff
+        self.views = views
+
+    @staticmethod
+    def is_active(state) -> bool:
+        """Ob ein PrinterState druckt oder heizt"""
+        if state is None:
+            return False
+        if (state.state or '').lower() in ACTIVE_STATES or (state.status or '').lower() in ACTIVE_STATES:
+            return True
+        return state.target_hotend > 0 or state.target_bed > 0
+
+    def interval(self, printer_id: str, state=None, failures: int = 0) -> float:
+        interval = self.active if self.is_active(state) else self.idle
+        if self.viewed and self.views.is_viewed(printer_id):
+            interval = min(interval, self.viewed) if interval else self.viewed
+        if not interval:
+            return math.inf
+        if failures:
+            base = self.active or interval
+            return min(base * 2 ** min(failures, MAX_BACKOFF_EXPONENT), max(self.max_backoff, base))
+        return interval
+
+
+# Globale Instanzen
+printer_views = ViewTracker()
+# Moonraker-Abfragen (HTTP-Polling der Creality-Drucker)
+creality_poll_policy = PollPolicy(Config.POLL_INTERVAL_ACTIVE, Config.POLL_INTERVAL_IDLE, Config.POLL_INTERVAL_VIEWED,
+                                  Config.POLL_MAX_BACKOFF, printer_views)
+# pushall-Anfragen an lokale Bambu-Drucker (vollständiger Status, teuer für den Drucker,
+# standardmäßig nur während ein Client zusieht)
+bambu_pushall_policy = PollPolicy(Config.PUSHALL_INTERVAL_ACTIVE, Config.PUSHALL_INTERVAL_IDLE,
+                                  Config.PUSHALL_INTERVAL_VIEWED, Config.PUSHALL_MAX_BACKOFF, printer_views)
@@ -0,0 +1,84 @@
+import logging
+import socket
+import ssl
+
+logger = logging.getLogger(__name__)
+
+# OID 2.5.4.3 (commonName), DER-kodiert
+_COMMON_NAME_OID = bytes([0x55, 0x04, 0x03])
+_SEQUENCE = 0x30
+_SET = 0x31
+_OID = 0x06
+_VERSION = 0xA0  # [0] EXPLICIT Version im TBSCertificate
+
+
+def _tlv(data: bytes, offset: int):
+    """Liest ein DER-Element ab offset und gibt (tag, Beginn, Ende des Inhalts) zurück"""
+    if offset + 2 > len(data):
+        raise ValueError("truncated DER element")
+    tag, length = data[offset], data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        count = length & 0x7F
+        if count == 0 or count > 4 or offset + count > len(data):
+            raise ValueError("unsupported DER length")
+        length = int.from_bytes(data[offset:offset + count], 'big')
+        offset += count
+    if offset + length > len(data):
+        raise ValueError("truncated DER element")
+    return tag, offset, offset + length
+
+
+def _children(data: bytes, start: int, end: int):
+    while start < end:
+        tag, content, start = _tlv(data, start)
+        yield tag, content, start
+
+
+def subject_common_name(der: bytes):
+    """
+    CN aus dem Subject eines DER-kodierten X.509-Zertifikats, ohne Prüfung der Signatur.
+    None, wenn das Subject keinen CN hat.
+    """
+    tag, start, end = _tlv(der, 0)
+    if tag != _SEQUENCE:
+        raise ValueError("not a certificate")
+    tag, start, end = _tlv(der, start)  # TBSCertificate
+    if tag != _SEQUENCE:
+        raise ValueError("not a certificate")
+    fields = [(tag, content, field_end) for tag, content, field_end in _children(der, start, end)
+              if tag != _VERSION]
+    # serialNumber, signature, issuer, validity, subject
+    if len(fields) < 5 or fields[4][0] != _SEQUENCE:
+        raise ValueError("certificate without subject")
+    _, start, end = fields[4]
+    for tag, rdn_start, rdn_end in _children(der, start, end):
+        if tag != _SET:
+            continue
+        for tag, attr_start, attr_end in _children(der, rdn_start, rdn_end):
+            if tag != _SEQUENCE:
+                continue
+            attribute = list(_children(der, attr_start, attr_end))
+            if len(attribute) == 2 and attribute[0][0] == _OID and der[attribute[0][1]:attribute[0][2]] == _COMMON_NAME_OID:
+                _, value_start, value_end = attribute[1]
+                return der[value_start:value_end].decode('utf-8', errors='replace')
+    return None
+
+
+def printer_certificate_serial(ip: str, port: int = 8883, timeout: float = 3.0):
+    """
+    Seriennummer, die ein Bambu-Drucker als CN seines TLS-Zertifikats am MQTT-Port
+    ausweist. Die Drucker verwenden selbstsignierte Zertifikate, daher wird die
+    Kette nicht geprüft. None, wenn unter der Adresse kein Zertifikat zu bekommen ist.
+    """
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    try:
+        with socket.create_connection((ip, port), timeout=timeout) as sock:
+            with context.wrap_socket(sock) as tls:
+                der = tls.getpeercert(binary_form=True)
+        return subject_common_name(der) if der else None
+    except (OSError, ValueError) as e:
+        logger.debug(f"Could not read certificate from {ip}:{port}: {e}")
+        return None
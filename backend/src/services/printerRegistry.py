@@ -0,0 +1,205 @@
+import copy
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from src.config import Config
+from .requestTiming import track_disk
+
+logger = logging.getLogger(__name__)
+
+# Startport für RTSP-Ports, wenn noch keine Drucker existieren
+BASE_PRINTER_PORT = 8554
+
+
+class ReadWriteLock:
+    """
+    Lock mit beliebig vielen gleichzeitigen Lesern und einem exklusiven Schreiber.
+    Wartende Schreiber haben Vorrang, damit sie bei ständigem Polling nicht verhungern.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+def write_json_atomic(path, data: dict):
+    """Schreibt JSON in eine temporäre Datei und ersetzt das Ziel per rename"""
+    temp_path = f"{path}.tmp"
+    with track_disk(f"write {os.path.basename(path)}"):
+        with open(temp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_path, path)
+
+
+class PrinterRegistry:
+    """
+    Prozessweiter In-Memory-Cache aller Drucker-Konfigurationen.
+
+    Die JSON-Dateien in data/printers werden einmal beim Start geladen, Lesezugriffe
+    werden danach aus dem Speicher bedient. Änderungen werden direkt auf die Platte
+    durchgeschrieben, aber nur wenn sich der Inhalt tatsächlich geändert hat.
+    """
+
+    def __init__(self, printers_dir=None):
+        self.printers_dir = Path(printers_dir or Config.PRINTERS_DIR)
+        self._printers = {}
+        self._lock = ReadWriteLock()
+        # Serialisiert Schreibvorgänge auf die Platte, ohne Leser zu blockieren
+        self._write_mutex = threading.Lock()
+        self._loaded = False
+
+    def load(self):
+        """Lädt alle Drucker aus den einzelnen JSON-Dateien in den Speicher"""
+        os.makedirs(self.printers_dir, exist_ok=True)
+        logger.info(f"Loading printers from directory: {self.printers_dir}")
+
+        printers = {}
+        for printer_file in os.listdir(self.printers_dir):
+            if not printer_file.endswith('.json'):
+                continue
+            file_path = self.printers_dir / printer_file
+            try:
+                with track_disk(f"read {printer_file}"), open(file_path, 'r') as f:
+                    printer = json.load(f)
+                # Verwende Dateinamen ohne .json als ID, falls keine gespeichert ist
+                printer_id = printer.get('id') or printer_file[:-len('.json')]
+                printer['id'] = printer_id
+                printers[printer_id] = printer
+                logger.debug(f"Loaded printer: {printer.get('name')} from {file_path}")
+            except Exception as e:
+                logger.error(f"Error loading printer from {file_path}: {e}")
+
+        with self._lock.write():
+            self._printers = printers
+            self._loaded = True
+
+        logger.info(f"Successfully loaded {len(printers)} printers")
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            with self._write_mutex:
+                if not self._loaded:
+                    self.load()
+
+    def get_all(self) -> list:
+        """Liefert Kopien aller Drucker"""
+        self._ensure_loaded()
+        with self._lock.read():
+            return [copy.deepcopy(printer) for printer in self._printers.values()]
+
+    def get(self, printer_id: str):
+        """Liefert eine Kopie eines Druckers oder None"""
+        self._ensure_loaded()
+        with self._lock.read():
+            printer = self._printers.get(printer_id)
+            return copy.deepcopy(printer) if printer is not None else None
+
+    def contains(self, printer_id: str) -> bool:
+        self._ensure_loaded()
+        with self._lock.read():
+            return printer_id in self._printers
+
+    def ids_where(self, key: str, value) -> list:
+        """IDs aller Drucker, bei denen das Feld key den Wert value hat (ohne Kopien)"""
+        self._ensure_loaded()
+        with self._lock.read():
+            return [printer_id for printer_id, printer in self._printers.items() if printer.get(key) == value]
+
+    def next_port(self) -> int:
+        """Nächster freier Port: höchster vergebener Port + 1"""
+        self._ensure_loaded()
+        with self._lock.read():
+            used_ports = [printer.get('port', 0) for printer in self._printers.values()]
+        if not used_ports:
+            return BASE_PRINTER_PORT
+        return max(used_ports) + 1
+
+    def save(self, printer: dict) -> bool:
+        """
+        Speichert einen Drucker (neu oder vollständig ersetzt).
+        Gibt True zurück, wenn auf die Platte geschrieben wurde.
+        """
+        self._ensure_loaded()
+        printer_id = printer['id']
+        with self._write_mutex:
+            with self._lock.read():
+                unchanged = self._printers.get(printer_id) == printer
+            if unchanged:
+                return False
+            return self._write(printer_id, copy.deepcopy(printer))
+
+    def update(self, printer_id: str, fields: dict) -> bool:
+        """
+        Führt Felder in einen bestehenden Drucker zusammen.
+        Gibt True zurück, wenn sich etwas geändert hat und geschrieben wurde.
+        """
+        self._ensure_loaded()
+        with self._write_mutex:
+            with self._lock.read():
+                current = self._printers.get(printer_id)
+                if current is None:
+                    return False
+                if all(key in current and current[key] == value for key, value in fields.items()):
+                    return False
+                merged = copy.deepcopy(current)
+            merged.update(copy.deepcopy(fields))
+            return self._write(printer_id, merged)
+
+    def remove(self, printer_id: str) -> bool:
+        """Entfernt einen Drucker aus Speicher und Dateisystem"""
+        self._ensure_loaded()
+        with self._write_mutex:
+            with self._lock.write():
+                existed = self._printers.pop(printer_id, None) is not None
+            try:
+                os.remove(self.printers_dir / f"{printer_id}.json")
+            except FileNotFoundError:
+                pass
+            return existed
+
+    def _write(self, printer_id: str, printer: dict) -> bool:
+        """Schreibt durch auf die Platte und tauscht danach den Eintrag im Speicher aus"""
+        os.makedirs(self.printers_dir, exist_ok=True)
+        write_json_atomic(self.printers_dir / f"{printer_id}.json", printer)
+        with self._lock.write():
+            self._printers[printer_id] = printer
+        logger.debug(f"Persisted printer {printer_id}")
+        return True
+
+
+# Globale Instanz
+printer_registry = PrinterRegistry()
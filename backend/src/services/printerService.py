@@ -4,7 +4,6 @@ import logging
 import asyncio
 import os
 from datetime import datetime
-import requests
 from pathlib import Path
 import time
 import uuid
@@ -12,16 +11,27 @@ import paho.mqtt.client as mqtt
 import bambulabs_api as bl
 import ssl
 from src.printer_types import PRINTER_CONFIGS
-import threading
 import struct
 import queue
 from .networkScanner import scanNetwork
 from .mqttService import mqtt_service
+from .requestTiming import track_disk
+from .metrics import metrics
+from .httpClient import http_client
 from .octoprintService import octoprint_service
+from .moonrakerPoller import moonraker_poller
+from .pollPolicy import printer_views
+from .discoveryCache import discovery_cache
+from .printerCertificate import printer_certificate_serial
+from .printerRegistry import printer_registry
+from .statusStore import status_store
+from .statusEvents import status_events
+from .telemetryHistory import telemetry_history
 import yaml
 import subprocess
 from src.config import Config
 import signal
+from urllib.parse import urlsplit, urlunsplit
 
 # Logger konfigurieren
 logger = logging.getLogger(__name__)
@@ -48,49 +58,36 @@ os.makedirs(STREAMS_DIR, exist_ok=True)
 # Ändere die Konfiguration am Anfang der Datei
 PRINTERS_FILE = Path(os.getenv('PRINTERS_FILE', 'printers.json'))
 
+def _replace_host(url: str, old_host: str, host: str) -> str:
+    """Tauscht den Host einer URL (inkl. Zugangsdaten und Port), andere URLs bleiben unverändert"""
+    parts = urlsplit(url)
+    if parts.hostname != old_host:
+        return url
+    userinfo, at, hostport = parts.netloc.rpartition('@')
+    return urlunsplit(parts._replace(netloc=f"{userinfo}{at}{hostport.replace(old_host, host, 1)}"))
+
 def getNextPort() -> int:
     """
     Findet den nächsten freien Port für einen neuen Drucker.
     Startet bei 8554 und erhöht um 1 bis ein freier Port gefunden wird.
     """
-    try:
-        used_ports = []
-        
-        # Durchsuche alle Drucker-Dateien
-        for printer_file in os.listdir(PRINTERS_DIR):
-            if printer_file.endswith('.json'):
-                with open(os.path.join(PRINTERS_DIR, printer_file), 'r') as f:
-                    printer = json.load(f)
-                    used_ports.append(printer.get('port', 0))
-                    
-        if not used_ports:
-            return 8554  # Startport wenn keine Drucker existieren
-        return max(used_ports) + 1
-    except FileNotFoundError:
-        return 8554  # Startport wenn Verzeichnis nicht existiert
-    except json.JSONDecodeError:
-        return 8554  # Startport wenn JSON ungültig
+    return printer_registry.next_port()
 
 class PrinterService:
     def __init__(self):
         self.mqtt_clients = {}
-        self.printer_data = {}
-        self.polling_threads = {}
-        self.file_locks = {}
+        self.creality_poller = moonraker_poller
+        self.creality_poller.on_status = self.update_printer_status
         self.go2rtc_config_path = Config.GO2RTC_CONFIG
         self.mqtt_service = mqtt_service
         self.octoprint_service = octoprint_service
         self.host_ip = self._get_host_ip()
         # API-URL ohne base_path, da die API direkt auf Port 1984 läuft
         self.go2rtc_api_url = f"http://{self.host_ip}:1984"
+        if Config.DISCOVERY_REMATCH:
+            discovery_cache.add_listener(self._on_discovered)
         logger.info(f"Initialized PrinterService with go2rtc config path: {self.go2rtc_config_path}")
 
-    def get_file_lock(self, printer_id):
-        """Holt oder erstellt einen Lock für einen Drucker"""
-        if printer_id not in self.file_locks:
-            self.file_locks[printer_id] = threading.Lock()
-        return self.file_locks[printer_id]
-
     def connect_mqtt(self, printer_id, ip):
         """Erstellt eine persistente MQTT Verbindung"""
         try:
@@ -143,9 +140,6 @@ class PrinterService:
                         'state': data.get('print', {}).get('gcode_state', 'unknown')
                     }
                     
-                    # Cache die Daten
-                    self.printer_data[printer_id] = status_data
-                    
                     # Update Drucker Status
                     self.update_printer_status(printer_id, status_data)
                     
@@ -198,7 +192,7 @@ class PrinterService:
             
             elif printer['type'] == 'CREALITY':
                 # Moonraker API Abfrage
-                response = requests.get(f"http://{printer['ip']}:7125/printer/objects/query?heater_bed&extruder&temperature_sensor%20chamber_temp", timeout=5)
+                response = http_client.get(f"http://{printer['ip']}:7125/printer/objects/query?heater_bed&extruder&temperature_sensor%20chamber_temp", timeout=5)
                 if response.status_code == 200:
                     data = response.json()
                     logger.debug(f"Moonraker response: {data}")
@@ -229,19 +223,63 @@ class PrinterService:
                 'remaining_time': 0
             }
 
+    def _on_discovered(self, entry: dict, previous_ip):
+        """Stellt gespeicherte Drucker mit der Seriennummer eines gesichteten Druckers auf dessen IP um"""
+        serial = entry.get('serial')
+        if not serial:
+            return
+        for printer_id in printer_registry.ids_where('serial', serial):
+            printer = printer_registry.get(printer_id)
+            if printer and printer.get('ip') != entry['ip']:
+                self.relocate_printer(printer_id, entry['ip'])
+
+    def relocate_printer(self, printer_id: str, ip: str) -> bool:
+        """
+        Übernimmt eine neue IP (z.B. nach einem DHCP-Wechsel) und verbindet den Drucker neu.
+        Ein Drucker, der unter seiner alten IP noch per MQTT verbunden ist, wird nicht
+        umgestellt. Die neue Adresse muss außerdem ein TLS-Zertifikat mit der
+        Seriennummer als CN vorweisen, damit eine gefälschte Ankündigung die
+        Verbindung (und den Access Code) nicht umlenkt.
+        """
+        printer = printer_registry.get(printer_id)
+        if not printer or printer.get('type') != 'BAMBULAB':
+            return False
+        if self.mqtt_service.is_connected(printer_id):
+            logger.debug(f"Printer {printer_id} still connected at {printer.get('ip')}, ignoring announcement from {ip}")
+            return False
+        certificate_serial = printer_certificate_serial(ip, MQTT_PORT)
+        if not printer.get('serial') or certificate_serial != printer['serial']:
+            logger.warning(f"Not moving printer {printer_id} to {ip}: certificate CN {certificate_serial!r} "
+                           f"does not match serial {printer.get('serial')!r}")
+            return False
+
+        old_ip = printer.get('ip')
+        fields = {'ip': ip}
+        if printer.get('streamUrl') and old_ip:
+            fields['streamUrl'] = _replace_host(printer['streamUrl'], old_ip, ip)
+        logger.info(f"Printer {printer_id} ({printer.get('serial')}) moved from {old_ip} to {ip}")
+        printer_registry.update(printer_id, fields)
+
+        self.mqtt_service.disconnect_printer(printer_id)
+        try:
+            self.mqtt_service.connect_printer(printer_id, ip, printer.get('accessCode', ''))
+        except Exception as e:
+            logger.error(f"Error reconnecting printer {printer_id} at {ip}: {e}")
+        return True
+
     def cleanup(self, printer_id=None):
-        """Beendet MQTT Verbindungen"""
+        """Beendet MQTT Verbindungen und das Creality-Polling"""
         if printer_id:
             if printer_id in self.mqtt_clients:
                 self.mqtt_clients[printer_id].disconnect()
                 del self.mqtt_clients[printer_id]
-                del self.printer_data[printer_id]
+            self.creality_poller.remove(printer_id)
         else:
             # Cleanup alle Verbindungen
             for client in self.mqtt_clients.values():
                 client.disconnect()
             self.mqtt_clients.clear()
-            self.printer_data.clear()
+            self.creality_poller.stop()
 
     def connect_printer(self, printer_id: str, printer_type: str, ip: str):
         """Verbindet einen Drucker basierend auf seinem Typ"""
@@ -271,134 +309,38 @@ class PrinterService:
     def update_printer_status(self, printer_id: str, status_data: dict) -> None:
         """Aktualisiert den Status eines Druckers."""
         try:
-            printer_file = os.path.join(PRINTERS_DIR, f"{printer_id}.json")
-            
-            # Hole Lock für diesen Drucker
-            lock = self.get_file_lock(printer_id)
-            
-            with lock:  # Thread-sicheres Lesen/Schreiben
-                if not os.path.exists(printer_file) or os.path.getsize(printer_file) == 0:
-                    logger.debug(f"Skipping status update for removed printer: {printer_id}")
-                    return
-                    
-                try:
-                    with open(printer_file, 'r') as f:
-                        printer_data = json.load(f)
-                except json.JSONDecodeError:
-                    logger.error(f"Invalid JSON in printer file: {printer_file}")
-                    return
-                    
-                # Update alle Status-Felder
-                printer_data.update({
-                    'status': status_data.get('status', printer_data.get('status')),
-                    'temperatures': status_data.get('temperatures', printer_data.get('temperatures', {})),
-                    'targets': status_data.get('targets', printer_data.get('targets', {})),
-                    'power': status_data.get('power', printer_data.get('power', {})),
-                    'progress': status_data.get('progress', printer_data.get('progress', 0)),
-                    'is_active': status_data.get('is_active', printer_data.get('is_active', False)),
-                    'layer': status_data.get('layer', printer_data.get('layer', {'current': 0, 'total': 0})),
-                    'filename': status_data.get('filename', printer_data.get('filename', '')),
-                    'state': status_data.get('state', printer_data.get('state', 'offline')),
-                    'print_duration': status_data.get('print_duration', printer_data.get('print_duration', 0)),
-                    'message': status_data.get('message', printer_data.get('message', ''))
-                })
+            if not printer_registry.contains(printer_id):
+                logger.debug(f"Skipping status update for removed printer: {printer_id}")
+                return
                 
-                # Direkte Speicherung mit Lock
-                with open(printer_file, 'w') as f:
-                    json.dump(printer_data, f, indent=2)
-                    
+            # Live-Status im Speicher, persistiert wird gesammelt im Hintergrund
+            if status_store.update(printer_id, status_data):
                 logger.debug('Updated status for printer %s', printer_id)
+                status_events.publish(printer_id, status_store.get(printer_id))
+                telemetry_history.record(printer_id, status_store.get_state(printer_id))
                 
         except Exception as e:
             logger.error(f"Error updating printer status: {e}", exc_info=True)
 
     def setup_creality_polling(self, printer_id: str, printer_ip: str):
-        """Richtet Polling für einen Creality K1 Drucker ein"""
+        """Nimmt einen Creality K1 Drucker in den gemeinsamen Moonraker-Poller auf"""
         try:
-            # Prüfe ob bereits ein Polling-Thread läuft
-            if printer_id in self.polling_threads:
+            if not self.creality_poller.add(printer_id, printer_ip):
                 logger.info(f"Polling already active for printer {printer_id}")
-                return
-            
-            def poll_status():
-                logger.info(f"Starting polling thread for printer {printer_id}")
-                while printer_id in self.polling_threads:
-                    try:
-                        url = f"http://{printer_ip}:7125/printer/objects/query"
-                        params = {
-                            "objects": {
-                                "extruder": None,
-                                "heater_bed": None,
-                                "temperature_sensor chamber_temp": None,
-                                "print_stats": None,
-                                "virtual_sdcard": None
-                            }
-                        }
-                        
-                        response = requests.post(url, json=params, timeout=2)
-                        
-                        if response.ok:
-                            data = response.json()
-                            status = data.get('result', {}).get('status', {})
-                            
-                            status_data = {
-                                'status': 'online',
-                                'temperatures': {
-                                    'hotend': status.get('extruder', {}).get('temperature', 0),
-                                    'bed': status.get('heater_bed', {}).get('temperature', 0),
-                                    'chamber': status.get('temperature_sensor chamber_temp', {}).get('temperature', 0)
-                                },
-                                'targets': {
-                                    'hotend': status.get('extruder', {}).get('target', 0),
-                                    'bed': status.get('heater_bed', {}).get('target', 0)
-                                },
-                                'progress': status.get('virtual_sdcard', {}).get('progress', 0) * 100,
-                                'state': status.get('print_stats', {}).get('state', 'standby')
-                            }
-                            
-                            # Cache die Daten
-                            self.printer_data[printer_id] = status_data
-                            
-                            # Update Drucker Status
-                            self.update_printer_status(printer_id, status_data)
-                        else:
-                            logger.warning(f"Error polling printer {printer_id}: {response.status_code}")
-                            
-                    except requests.exceptions.RequestException as e:
-                        logger.error(f"Connection error polling printer {printer_id}: {e}")
-                        status_data = {
-                            'status': 'error',
-                            'temperatures': {'hotend': 0, 'bed': 0, 'chamber': 0},
-                            'targets': {'hotend': 0, 'bed': 0},
-                            'progress': 0,
-                            'state': 'error'
-                        }
-                        self.printer_data[printer_id] = status_data
-                        self.update_printer_status(printer_id, status_data)
-                    except Exception as e:
-                        logger.error(f"Error in polling thread for {printer_id}: {e}")
-                    
-                    time.sleep(2)
-                logger.info(f"Polling thread stopped for printer {printer_id}")
-
-            # Starte den Thread
-            thread = threading.Thread(target=poll_status, daemon=True)
-            self.polling_threads[printer_id] = thread
-            thread.start()
-            logger.info(f"Successfully started polling for Creality printer {printer_id}")
 
         except Exception as e:
             logger.error(f"Error setting up Creality polling: {e}")
             raise
 
+    def is_polling(self, printer_id: str) -> bool:
+        """Ob der Status eines Creality-Druckers bereits abgefragt wird"""
+        return self.creality_poller.is_polling(printer_id)
+
     def _save_printer(self, printer_id: str, printer_data: dict):
         """Speichert einen Drucker in einer JSON-Datei"""
         try:
-            file_path = os.path.join(PRINTERS_DIR, f"{printer_id}.json")
-            logger.info(f"Saving printer to file: {file_path}")
-            
-            with open(file_path, 'w') as f:
-                json.dump(printer_data, f, indent=2)
+            logger.info(f"Saving printer {printer_id}")
+            printer_registry.save(printer_data)
                 
         except Exception as e:
             logger.error(f"Error saving printer: {e}")
@@ -420,6 +362,13 @@ class PrinterService:
             
             if data['type'] == 'BAMBULAB':
                 logger.info(f"Setting up BambuLab printer {printer_data['name']} ({printer_data['ip']})")
+
+                # Seriennummer aus dem Scan übernehmen, sonst aus dem Discovery-Cache
+                if not printer_data.get('serial'):
+                    printer_data['serial'] = next((entry['serial'] for entry in discovery_cache.printers()
+                                                   if entry['ip'] == data['ip'] and entry.get('serial')), None)
+                if not printer_data['serial']:
+                    del printer_data['serial']
                 
                 # Stream URL erstellen
                 printer_data['streamUrl'] = f"rtsps://bblp:{data['accessCode']}@{data['ip']}:322/streaming/live/1"
@@ -471,6 +420,9 @@ class PrinterService:
             
             # Drucker speichern
             self._save_printer(printer_id, printer_data)
+            if printer_data['type'] == 'BAMBULAB':
+                # Seriennummer aus einem Report, der schon vor dem Speichern kam
+                self.mqtt_service.persist_serial(printer_id)
             
             return printer_data
             
@@ -493,7 +445,7 @@ class PrinterService:
             # Lade bestehende Konfiguration wenn sie existiert
             if config_path.exists():
                 try:
-                    with open(config_path, 'r') as f:
+                    with track_disk("read go2rtc config"), open(config_path, 'r') as f:
                         loaded_config = yaml.safe_load(f)
                         if loaded_config:  # Nur wenn die Datei nicht leer ist
                             config['streams'] = loaded_config.get('streams', {})
@@ -510,7 +462,7 @@ class PrinterService:
                 try:
                     # Schreibe zuerst in eine temporäre Datei
                     temp_path = f"{config_path}.tmp"
-                    with open(temp_path, 'w') as f:
+                    with track_disk("write go2rtc config"), open(temp_path, 'w') as f:
                         yaml.safe_dump(config, f, default_flow_style=False)
                     
                     # Dann verschiebe die temporäre Datei
@@ -521,7 +473,7 @@ class PrinterService:
 
                     # Füge Stream über die API hinzu
                     try:
-                        response = requests.put(
+                        response = http_client.put(
                             f"{self.go2rtc_api_url}/api/streams",
                             params={
                                 "src": printer_data['streamUrl'],
@@ -562,7 +514,7 @@ class PrinterService:
             
             # Lade aktuelle Konfiguration
             try:
-                with open(config_path, 'r') as f:
+                with track_disk("read go2rtc config"), open(config_path, 'r') as f:
                     config = yaml.safe_load(f) or {}
             except Exception as e:
                 logger.error(f"Failed to load config: {e}")
@@ -573,13 +525,13 @@ class PrinterService:
                 del config['streams'][printer_id]
                 
                 # Speichere aktualisierte Konfiguration
-                with open(config_path, 'w') as f:
+                with track_disk("write go2rtc config"), open(config_path, 'w') as f:
                     yaml.safe_dump(config, f)
                 logger.info(f"Removed stream from config for printer {printer_id}")
 
                 # Entferne Stream über die API
                 try:
-                    response = requests.delete(
+                    response = http_client.delete(
                         f"http://{self.host_ip}:1984/api/streams",
                         params={"name": printer_id}
                     )
@@ -589,7 +541,7 @@ class PrinterService:
                         logger.warning(f"Failed to remove stream via API: {response.status_code} - {response.text}")
                     
                     # Lade Konfiguration neu
-                    reload_response = requests.post(
+                    reload_response = http_client.post(
                         f"http://{self.host_ip}:1984/api/restart"
                     )
                     if reload_response.status_code == 200:
@@ -608,7 +560,7 @@ class PrinterService:
 
     def remove_printer(self, printer_id):
         try:
-            printer = self.get_printer(printer_id)
+            printer = printer_registry.get(printer_id)
             if not printer:
                 return False
             
@@ -619,7 +571,12 @@ class PrinterService:
                 self.mqtt_service.disconnect_printer(printer_id)
             
             # Drucker-Datei löschen
-            os.remove(f"{PRINTERS_DIR}/{printer_id}.json")
+            status_store.discard(printer_id)
+            status_events.remove(printer_id)
+            telemetry_history.remove(printer_id)
+            printer_views.forget(printer_id)
+            metrics.remove_series('printer_id', printer_id)
+            printer_registry.remove(printer_id)
             return True
         
         except Exception as e:
@@ -651,30 +608,26 @@ class PrinterService:
                     "id": int(time.time()),
                     "method": "emergency_stop"
                 }
-                response = requests.post(f"{base_url}/printer/api", json=json_rpc_payload, timeout=5)
+                response = http_client.post(f"{base_url}/printer/api", json=json_rpc_payload, timeout=5)
                 
                 if response.status_code == 200:
                     logger.info(f"Emergency stop command sent successfully via JSON-RPC to Creality printer {printer_id}")
                     
                     # Aktualisiere den Status des Druckers
-                    if printer_id in self.printer_data:
-                        self.printer_data[printer_id]['status'] = 'stopped'
-                        self.printer_data[printer_id]['state'] = 'error'
+                    self.update_printer_status(printer_id, {'status': 'stopped', 'state': 'error'})
                     
                     return True
             except Exception as e:
                 logger.warning(f"JSON-RPC emergency stop failed, trying REST endpoint: {e}")
             
             # Fallback to REST-style endpoint
-            response = requests.post(f"{base_url}/printer/emergency_stop", timeout=5)
+            response = http_client.post(f"{base_url}/printer/emergency_stop", timeout=5)
             
             if response.status_code == 200:
                 logger.info(f"Emergency stop command sent successfully via REST endpoint to Creality printer {printer_id}")
                 
                 # Aktualisiere den Status des Druckers
-                if printer_id in self.printer_data:
-                    self.printer_data[printer_id]['status'] = 'stopped'
-                    self.printer_data[printer_id]['state'] = 'error'
+                self.update_printer_status(printer_id, {'status': 'stopped', 'state': 'error'})
                 
                 return True
             else:
@@ -726,42 +679,17 @@ def addPrinter(data):
     return printer_service.add_printer(data)
 
 def getPrinters():
-    """Lädt alle Drucker aus den einzelnen JSON-Dateien"""
-    printers = []
-    
+    """Liefert alle Drucker aus der In-Memory-Registry"""
     try:
-        # Stelle sicher, dass das Verzeichnis existiert
-        os.makedirs(PRINTERS_DIR, exist_ok=True)
-        
-        logger.info(f"Loading printers from directory: {PRINTERS_DIR}")
-        
-        # Lade jeden Drucker aus seiner JSON-Datei
-        for printer_file in os.listdir(PRINTERS_DIR):
-            if printer_file.endswith('.json'):
-                file_path = PRINTERS_DIR / printer_file
-                try:
-                    with open(file_path, 'r') as f:
-                        printer = json.load(f)
-                        printers.append(printer)
-                        logger.debug(f"Loaded printer: {printer.get('name')} from {file_path}")
-                except Exception as e:
-                    logger.error(f"Error loading printer from {file_path}: {e}")
-                    continue
-                    
-        logger.info(f"Successfully loaded {len(printers)} printers")
-        return printers
+        return printer_registry.get_all()
     except Exception as e:
         logger.error(f"Error getting printers: {e}", exc_info=True)
         return []
 
 def getPrinterById(printer_id):
-    """Lädt einen spezifischen Drucker aus seiner JSON-Datei"""
+    """Liefert einen spezifischen Drucker aus der In-Memory-Registry"""
     try:
-        printer_file = PRINTERS_DIR / f"{printer_id}.json"
-        with open(printer_file, 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return None
+        return printer_registry.get(printer_id)
     except Exception as e:
         logger.error(f"Error getting printer {printer_id}: {e}")
         return None
@@ -784,11 +712,13 @@ def removePrinter(printer_id):
             printer_service.cleanup(printer_id)
             
         # Lösche Drucker-Datei
-        printer_file = PRINTERS_DIR / f"{printer_id}.json"
-        try:
-            os.remove(printer_file)
-        except FileNotFoundError:
-            pass
+        status_store.discard(printer_id)
+        status_events.remove(printer_id)
+        telemetry_history.remove(printer_id)
+        printer_views.forget(printer_id)
+        # Serien des Druckers (Nachrichten, Restarts usw.) nicht weiter exportieren
+        metrics.remove_series('printer_id', printer_id)
+        printer_registry.remove(printer_id)
 
         # Lösche zugehörige Stream-Datei falls vorhanden
         stream_file = STREAMS_DIR / f"{printer_id}.json"
@@ -817,7 +747,7 @@ def startPrint(printer_id, file_path):
             "file": file_path
         }
         
-        response = requests.post(url, headers=headers, json=data)
+        response = http_client.post(url, headers=headers, json=data)
         return response.status_code == 200
         
     except Exception as e:
@@ -836,7 +766,7 @@ def stopPrint(printer_id):
             "Authorization": f"Bearer {printer['accessCode']}"
         }
         
-        response = requests.post(url, headers=headers)
+        response = http_client.post(url, headers=headers)
         return response.status_code == 200
         
     except Exception as e:
@@ -890,7 +820,7 @@ def getPrinterStatus(printer_id):
             return mqtt_service.get_printer_status(printer_id)
         elif printer['type'] == 'CREALITY':
             # Moonraker API Abfrage
-            response = requests.get(f"http://{printer['ip']}:7125/printer/objects/query?heater_bed&extruder&temperature_sensor%20chamber_temp", timeout=5)
+            response = http_client.get(f"http://{printer['ip']}:7125/printer/objects/query?heater_bed&extruder&temperature_sensor%20chamber_temp", timeout=5)
             if response.status_code == 200:
                 data = response.json()
                 logger.debug(f"Moonraker response: {data}")
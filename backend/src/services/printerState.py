@@ -0,0 +1,180 @@
+import threading
+import time
+
+# Typisierte Felder des Live-Status mit ihren Standardwerten
+STATE_FIELDS = {
+    'name': '',
+    'status': 'offline',
+    'online': False,
+    'hotend': 0.0,
+    'bed': 0.0,
+    'chamber': 0.0,
+    'target_hotend': 0.0,
+    'target_bed': 0.0,
+    'progress': 0.0,
+    'remaining_time': 0,
+    'current_layer': 0,
+    'total_layers': 0,
+    'state': 'offline',
+    'filename': '',
+    'print_duration': 0.0,
+    'message': '',
+    'is_active': False,
+    'power': None,
+}
+
+_FIELD_TYPES = {
+    field: type(default) for field, default in STATE_FIELDS.items() if default is not None
+}
+
+# Status-Text eines Druckers ohne Daten, falls er vom Standard abweicht
+_OFFLINE_STATUS = {'CLOUD': 'OFFLINE'}
+
+
+def _coerce(field: str, value):
+    if value is None:
+        default = STATE_FIELDS[field]
+        return dict(default) if isinstance(default, dict) else default
+    field_type = _FIELD_TYPES.get(field)
+    if field_type is None or isinstance(value, field_type) and not (field_type is int and isinstance(value, bool)):
+        return value
+    return field_type(value)
+
+
+class PrinterState:
+    """
+    Kompakter Live-Status eines Druckers, gemeinsam für alle Backends.
+
+    Jede Änderung erhöht die Versionsnummer. Die Ausgabe als Dict im Format des
+    jeweiligen Backends (siehe _VIEWS) wird nur einmal pro Version gebaut und
+    danach geteilt, Aufrufer dürfen das Ergebnis von snapshot() nicht verändern.
+    """
+
+    __slots__ = ('printer_id', 'kind', 'version', 'updated_at', '_view', '_view_version', '_lock') + tuple(STATE_FIELDS)
+
+    def __init__(self, printer_id: str, kind: str, **fields):
+        self.printer_id = printer_id
+        self.kind = kind
+        self.version = 0
+        self.updated_at = 0.0
+        self._view = None
+        self._view_version = -1
+        self._lock = threading.Lock()
+        for field in STATE_FIELDS:
+            setattr(self, field, _coerce(field, fields.get(field)))
+
+    def update(self, **fields) -> tuple:
+        """
+        Setzt die übergebenen Felder. Gibt die Namen der geänderten Felder zurück
+        (leer, wenn sich nichts geändert hat) und erhöht nur dann die Version.
+        """
+        changed = []
+        with self._lock:
+            for field, value in fields.items():
+                value = _coerce(field, value)
+                if getattr(self, field) != value:
+                    setattr(self, field, value)
+                    changed.append(field)
+            if changed:
+                self.version += 1
+                self.updated_at = time.time()
+        return tuple(changed)
+
+    def update_from_dict(self, status_data: dict) -> tuple:
+        """Übernimmt einen Status im verschachtelten Dict-Format (z.B. aus PUT /status oder der Registry)"""
+        fields = {
+            field: status_data[field]
+            for field in ('status', 'online', 'progress', 'remaining_time', 'state', 'filename',
+                          'print_duration', 'message', 'is_active', 'power')
+            if field in status_data
+        }
+        temperatures = status_data.get('temperatures') or {}
+        if 'hotend' in temperatures or 'nozzle' in temperatures:
+            fields['hotend'] = temperatures.get('hotend', temperatures.get('nozzle'))
+        if 'bed' in temperatures:
+            fields['bed'] = temperatures['bed']
+        if 'chamber' in temperatures:
+            fields['chamber'] = temperatures['chamber']
+        targets = status_data.get('targets') or {}
+        if 'hotend' in targets or 'nozzle' in targets:
+            fields['target_hotend'] = targets.get('hotend', targets.get('nozzle'))
+        if 'bed' in targets:
+            fields['target_bed'] = targets['bed']
+        layer = status_data.get('layer') or {}
+        if 'current' in layer:
+            fields['current_layer'] = layer['current']
+        if 'total' in layer:
+            fields['total_layers'] = layer['total']
+        return self.update(**fields)
+
+    def snapshot(self) -> dict:
+        """Status im Format des Backends, einmal pro Version gebaut"""
+        with self._lock:
+            if self._view_version != self.version:
+                self._view = _VIEWS[self.kind](self)
+                self._view_version = self.version
+            return self._view
+
+
+def _bambulab_view(state: PrinterState) -> dict:
+    return {
+        'status': state.status,
+        'temperatures': {'nozzle': state.hotend, 'bed': state.bed, 'chamber': state.chamber},
+        'targets': {'nozzle': state.target_hotend, 'bed': state.target_bed},
+        'progress': state.progress,
+        'remaining_time': state.remaining_time
+    }
+
+
+def _octoprint_view(state: PrinterState) -> dict:
+    temperatures = {'hotend': state.hotend, 'nozzle': state.hotend, 'bed': state.bed, 'chamber': state.chamber}
+    return {
+        'id': state.printer_id,
+        'name': state.name,
+        'temps': temperatures,
+        'temperatures': dict(temperatures),  # für Frontend-Kompatibilität
+        'status': state.status,
+        'progress': state.progress
+    }
+
+
+def _creality_view(state: PrinterState) -> dict:
+    return {
+        'status': state.status,
+        'temperatures': {'hotend': state.hotend, 'bed': state.bed, 'chamber': state.chamber},
+        'targets': {'hotend': state.target_hotend, 'bed': state.target_bed},
+        'power': dict(state.power or {}),
+        'progress': state.progress,
+        'is_active': state.is_active,
+        'layer': {'current': state.current_layer, 'total': state.total_layers},
+        'filename': state.filename,
+        'state': state.state,
+        'print_duration': state.print_duration,
+        'message': state.message
+    }
+
+
+def _cloud_view(state: PrinterState) -> dict:
+    return {
+        'online': state.online,
+        'print_status': state.status,
+        'temperatures': {'hotend': state.hotend, 'bed': state.bed, 'chamber': state.chamber},
+        'targets': {'hotend': state.target_hotend, 'bed': state.target_bed},
+        'progress': state.progress,
+        'remaining_time': state.remaining_time,
+        'current_layer': state.current_layer,
+        'total_layers': state.total_layers
+    }
+
+
+_VIEWS = {
+    'BAMBULAB': _bambulab_view,
+    'OCTOPRINT': _octoprint_view,
+    'CREALITY': _creality_view,
+    'CLOUD': _cloud_view,
+}
+
+
+def offline_status(kind: str, printer_id: str = None, name: str = '') -> dict:
+    """Fallback-Status im Format des Backends, wenn für einen Drucker keine Daten vorliegen"""
+    return PrinterState(printer_id, kind, name=name, status=_OFFLINE_STATUS.get(kind)).snapshot()
@@ -0,0 +1,140 @@
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Ausgabeformate von profile()
+PROFILE_FORMATS = ('collapsed', 'speedscope')
+
+_SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _short_path(filename: str) -> str:
+    """Pfade innerhalb des Backends relativ, sonst nur Dateiname (z.B. für Bibliotheken)"""
+    if filename.startswith(_SRC_DIR):
+        return os.path.relpath(filename, os.path.dirname(_SRC_DIR))
+    return os.path.basename(filename)
+
+
+class SamplingProfiler:
+    """
+    Sampling-Profiler über alle Threads des Prozesses.
+
+    Ein Hintergrund-Thread liest in festen Abständen per sys._current_frames()
+    die Stacks aller Threads (Flask, paho loop_start, Moonraker-Poller, asyncio
+    Loop des StreamService ...) und zählt gleiche Stacks. Der Prozess muss dafür
+    nicht neu gestartet werden, der Aufwand entsteht nur während der Messung.
+    Es läuft immer höchstens eine Messung gleichzeitig.
+    """
+
+    def __init__(self):
+        self._running = threading.Lock()
+        self._labels = {}  # code object -> (name, datei, zeile)
+
+    @property
+    def busy(self) -> bool:
+        return self._running.locked()
+
+    def _frame(self, code) -> tuple:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = (code.co_name, _short_path(code.co_filename), code.co_firstlineno)
+        return label
+
+    def sample(self, duration: float, interval: float = 0.01) -> dict:
+        """
+        Sammelt duration Sekunden lang Stacks. Liefert {'samples': {(thread, code...): anzahl},
+        'duration', 'interval'}. Wirft RuntimeError, wenn bereits eine Messung läuft.
+        """
+        if not self._running.acquire(blocking=False):
+            raise RuntimeError("Profiler is already running")
+        try:
+            samples = {}
+            own_ident = threading.get_ident()
+            started = time.perf_counter()
+            deadline = started + duration
+            next_sample = started
+            while True:
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own_ident:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(frame.f_code)
+                        frame = frame.f_back
+                    stack.reverse()
+                    key = (names.get(ident, f"thread-{ident}"),) + tuple(stack)
+                    samples[key] = samples.get(key, 0) + 1
+                next_sample += interval
+                time.sleep(max(next_sample - time.perf_counter(), 0))
+            return {'samples': samples, 'duration': time.perf_counter() - started, 'interval': interval}
+        finally:
+            self._running.release()
+
+    def collapsed(self, result: dict) -> str:
+        """Brendan-Gregg-Format (thread;func;func anzahl), direkt für flamegraph.pl / speedscope"""
+        lines = []
+        for key, count in sorted(result['samples'].items(), key=lambda item: -item[1]):
+            frames = [key[0].replace(';', ':').replace(' ', '_')]
+            for code in key[1:]:
+                name, filename, line = self._frame(code)
+                frames.append(f"{name} ({filename}:{line})".replace(';', ':'))
+            lines.append(f"{';'.join(frames)} {count}")
+        return '\n'.join(lines) + '\n'
+
+    def speedscope(self, result: dict) -> dict:
+        """Speedscope-Datei mit einem 'sampled'-Profil je Thread"""
+        frames = []
+        frame_index = {}
+        profiles = {}
+        for key, count in result['samples'].items():
+            stack = []
+            for code in key[1:]:
+                index = frame_index.get(code)
+                if index is None:
+                    name, filename, line = self._frame(code)
+                    index = frame_index[code] = len(frames)
+                    frames.append({'name': name, 'file': filename, 'line': line})
+                stack.append(index)
+            profile = profiles.setdefault(key[0], {'samples': [], 'weights': []})
+            profile['samples'].append(stack)
+            profile['weights'].append(count * result['interval'])
+
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': f"BambuCAM backend ({result['duration']:.1f}s)",
+            'exporter': 'bambucam-profiler',
+            'shared': {'frames': frames},
+            'profiles': [
+                {
+                    'type': 'sampled',
+                    'name': thread,
+                    'unit': 'seconds',
+                    'startValue': 0,
+                    'endValue': round(sum(profile['weights']), 6),
+                    'samples': profile['samples'],
+                    'weights': profile['weights']
+                }
+                for thread, profile in sorted(profiles.items())
+            ]
+        }
+
+    def profile(self, duration: float, interval: float = 0.01, output: str = 'collapsed'):
+        """Misst und liefert das Ergebnis im gewünschten Format (str für collapsed, dict für speedscope)"""
+        if output not in PROFILE_FORMATS:
+            raise ValueError(f"Unknown profile format: {output}")
+        logger.info(f"Starting sampling profiler for {duration}s (interval {interval}s)")
+        result = self.sample(duration, interval)
+        logger.info(f"Profiler collected {sum(result['samples'].values())} stack samples")
+        return self.collapsed(result) if output == 'collapsed' else self.speedscope(result)
+
+
+# Globale Instanz
+profiler = SamplingProfiler()
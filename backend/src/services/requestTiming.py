@@ -0,0 +1,188 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+import numpy as np
+from flask import g, request
+from src.config import Config
+from .metrics import HTTP_REQUEST_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Ausgewiesene Perzentile in der Zusammenfassung
+PERCENTILES = (50, 90, 95, 99)
+
+# Gegenstellen ausgehender HTTP-Aufrufe anhand des Ports bzw. Hosts
+_HTTP_PORTS = {7125: 'moonraker', 1984: 'go2rtc', 8080: 'mjpg-streamer'}
+_HTTP_HOSTS = {'bambulab.com': 'cloud', 'telegram.org': 'telegram'}
+
+# Trace der Anfrage, die der aktuelle Thread gerade bearbeitet
+_current = threading.local()
+
+
+class RequestTrace:
+    """Sammelt Plattenzugriffe und ausgehende HTTP-Aufrufe einer Anfrage"""
+
+    __slots__ = ('disk', 'http')
+
+    def __init__(self):
+        self.disk = []
+        self.http = []
+
+
+def _http_target(url: str) -> str:
+    parts = urlsplit(url)
+    host = parts.hostname or ''
+    for suffix, target in _HTTP_HOSTS.items():
+        if host.endswith(suffix):
+            return target
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    return _HTTP_PORTS.get(port, host or 'unknown')
+
+
+@contextmanager
+def track_disk(label: str):
+    """Misst einen Plattenzugriff und ordnet ihn der laufenden Anfrage zu (außerhalb von Anfragen ohne Wirkung)"""
+    trace = getattr(_current, 'trace', None)
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.disk.append({'label': label, 'ms': round((time.perf_counter() - started) * 1000, 1)})
+
+
+@contextmanager
+def track_http(method: str, url: str):
+    """
+    Misst einen ausgehenden HTTP-Aufruf und ordnet ihn der laufenden Anfrage zu.
+    Liefert den Eintrag, in den der Aufrufer 'status' schreibt (außerhalb von Anfragen None).
+    """
+    trace = getattr(_current, 'trace', None)
+    if trace is None:
+        yield None
+        return
+    call = {
+        'target': _http_target(str(url)),
+        'method': str(method).upper(),
+        'url': str(url).split('?', 1)[0],
+        'status': None
+    }
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception as e:
+        call['status'] = type(e).__name__
+        raise
+    finally:
+        call['ms'] = round((time.perf_counter() - started) * 1000, 1)
+        trace.http.append(call)
+
+
+def _breakdown(calls: list) -> dict:
+    return {'count': len(calls), 'ms': round(sum(call['ms'] for call in calls), 1), 'calls': calls}
+
+
+class RequestTiming:
+    """
+    Misst die Laufzeit jeder Flask-Anfrage je Route (URL-Regel, nicht konkrete URL).
+
+    Die letzten REQUEST_TIMING_WINDOW Laufzeiten je Route bilden die Grundlage für
+    die Perzentile. Dauert eine Anfrage länger als SLOW_REQUEST_THRESHOLD, wird ein
+    strukturierter Eintrag mit Route, Drucker-ID und der Aufteilung auf
+    Plattenzugriffe und ausgehende HTTP-Aufrufe geloggt und gemerkt.
+    """
+
+    def __init__(self, threshold=None, window=None, history=None):
+        self.threshold = Config.SLOW_REQUEST_THRESHOLD if threshold is None else threshold
+        self.window = Config.REQUEST_TIMING_WINDOW if window is None else window
+        self.slow_requests = deque(maxlen=Config.SLOW_REQUEST_HISTORY if history is None else history)
+        self._durations = {}  # route -> deque der letzten Laufzeiten in Sekunden
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def _before_request(self):
+        g.request_started = time.perf_counter()
+        _current.trace = RequestTrace()
+        if request.path.startswith('/api/'):
+            logger.debug(f"API Request: {request.method} {request.url}")
+
+    def _after_request(self, response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+        duration = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        try:
+            HTTP_REQUEST_SECONDS.observe(duration, request.method, route, str(response.status_code))
+            self.record(f"{request.method} {route}", duration)
+            if duration >= self.threshold:
+                self._record_slow(route, duration, response.status_code, getattr(_current, 'trace', None))
+        except Exception as e:
+            logger.error(f"Error recording request timing: {e}")
+        return response
+
+    def _teardown_request(self, exc=None):
+        _current.trace = None
+
+    def record(self, route: str, duration: float):
+        with self._lock:
+            durations = self._durations.get(route)
+            if durations is None:
+                durations = self._durations[route] = deque(maxlen=self.window)
+            durations.append(duration)
+            self._counts[route] = self._counts.get(route, 0) + 1
+
+    def _record_slow(self, route: str, duration: float, status: int, trace):
+        trace = trace or RequestTrace()
+        disk = _breakdown(trace.disk)
+        http = _breakdown(trace.http)
+        duration_ms = round(duration * 1000, 1)
+        entry = {
+            'timestamp': round(time.time(), 3),
+            'method': request.method,
+            'route': route,
+            'path': request.path,
+            'status': status,
+            'printer_id': (request.view_args or {}).get('printer_id'),
+            'duration_ms': duration_ms,
+            'disk': disk,
+            'http': http,
+            'other_ms': round(max(duration_ms - disk['ms'] - http['ms'], 0), 1)
+        }
+        self.slow_requests.append(entry)
+        logger.warning(f"Slow request: {json.dumps(entry)}")
+
+    def summary(self) -> dict:
+        """Anzahl sowie Perzentile und Maximum (in ms) je Route"""
+        with self._lock:
+            samples = {route: (self._counts[route], list(durations)) for route, durations in self._durations.items()}
+
+        routes = {}
+        for route, (count, durations) in samples.items():
+            values = np.array(durations) * 1000
+            quantiles = np.percentile(values, PERCENTILES)
+            routes[route] = {
+                'count': count,
+                'window': len(durations),
+                **{f'p{p}_ms': round(float(q), 1) for p, q in zip(PERCENTILES, quantiles)},
+                'max_ms': round(float(values.max()), 1)
+            }
+        return routes
+
+
+# Globale Instanz
+request_timing = RequestTiming()
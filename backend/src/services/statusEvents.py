@@ -0,0 +1,120 @@
+import copy
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Marker für Abonnenten, deren Queue übergelaufen ist und die neu synchronisieren müssen
+RESYNC = object()
+
+
+class StatusEventBus:
+    """
+    Verteilt Status-Änderungen der Drucker an Push-Clients (z.B. Server-Sent Events).
+
+    Jede Änderung bekommt eine fortlaufende Event-ID. Die letzten Events werden in
+    einem begrenzten Verlauf gehalten, damit Clients per Last-Event-ID fortsetzen
+    können. Identische Status werden nicht erneut verteilt.
+    """
+
+    def __init__(self, history_size=1000, queue_size=256):
+        self._lock = threading.Lock()
+        # IDs starten bei der aktuellen Zeit, damit IDs aus einem früheren Prozess
+        # immer älter als der Verlauf sind und zu einem Snapshot führen
+        self._next_id = int(time.time() * 1000)
+        self._history = deque(maxlen=history_size)
+        self._latest = {}  # printer_id -> letztes Event
+        self._subscribers = set()
+        self._listeners = []
+        self.queue_size = queue_size
+
+    def publish(self, printer_id: str, status: dict):
+        """Veröffentlicht einen Status, wenn er sich vom letzten unterscheidet. Gibt die Event-ID zurück."""
+        with self._lock:
+            previous = self._latest.get(printer_id)
+            if previous is not None and previous['status'] == status:
+                return None
+
+            event = {
+                'id': self._next_id,
+                'printerId': printer_id,
+                'status': copy.deepcopy(status),
+                'timestamp': time.time()
+            }
+            self._next_id += 1
+            self._history.append(event)
+            self._latest[printer_id] = event
+            subscribers = list(self._subscribers)
+
+        for subscriber in subscribers:
+            self._offer(subscriber, event)
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.error(f"Error in status event listener: {e}")
+        return event['id']
+
+    def remove(self, printer_id: str):
+        """Vergisst den letzten Status eines entfernten Druckers"""
+        with self._lock:
+            self._latest.pop(printer_id, None)
+
+    def add_listener(self, listener):
+        """
+        Registriert einen Callback, der synchron im publizierenden Thread aufgerufen wird.
+        Der Callback muss schnell sein und darf nicht blockieren.
+        """
+        self._listeners.append(listener)
+
+    def subscribe(self) -> queue.Queue:
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def events_since(self, last_event_id=None) -> list:
+        """
+        Events nach last_event_id aus dem Verlauf. Ist die ID unbekannt oder schon
+        aus dem Verlauf gefallen, wird ein Snapshot (letzter Status je Drucker) geliefert.
+        """
+        with self._lock:
+            resumable = (
+                last_event_id is not None
+                and self._history
+                and self._history[0]['id'] - 1 <= last_event_id < self._next_id
+            )
+            if resumable:
+                return [event for event in self._history if event['id'] > last_event_id]
+            return sorted(self._latest.values(), key=lambda event: event['id'])
+
+    def _offer(self, subscriber: queue.Queue, event: dict):
+        try:
+            subscriber.put_nowait(event)
+        except queue.Full:
+            # Langsamer Client: Queue leeren und Neusynchronisation anfordern
+            logger.warning("Status event queue full, requesting resync for subscriber")
+            try:
+                while True:
+                    subscriber.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                subscriber.put_nowait(RESYNC)
+            except queue.Full:
+                pass
+
+
+# Globale Instanz
+status_events = StatusEventBus()
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import logging
+import websockets
+from src.config import Config
+from .statusEvents import status_events
+from .streamService import stream_service
+
+logger = logging.getLogger(__name__)
+
+# Maximale Größe des Sendepuffers je Client, bevor ein langsamer Client getrennt wird
+MAX_CLIENT_BUFFER = 1024 * 1024
+
+
+def diff_status(old: dict, new: dict) -> dict:
+    """
+    Liefert nur die geänderten Felder von new gegenüber old.
+    Verschachtelte Dicts werden rekursiv verglichen, entfernte Felder werden zu None.
+    """
+    changes = {}
+    for key, value in new.items():
+        previous = old.get(key)
+        if isinstance(value, dict) and isinstance(previous, dict):
+            nested = diff_status(previous, value)
+            if nested:
+                changes[key] = nested
+        elif key not in old or previous != value:
+            changes[key] = value
+    for key in old:
+        if key not in new:
+            changes[key] = None
+    return changes
+
+
+class StatusFeedService:
+    """
+    WebSocket-Feed mit Delta-kodierten Status-Updates.
+
+    Neue Clients erhalten einen Snapshot aller Drucker ({"type": "snapshot"}),
+    danach nur noch die geänderten Felder je Drucker ({"type": "delta"}).
+    Änderungen werden je Drucker im Fenster STATUS_FEED_INTERVAL zusammengefasst
+    und einmal serialisiert an alle Clients verteilt. Clients wenden Deltas per
+    Deep-Merge an, None entfernt ein Feld.
+
+    Läuft im Event Loop des StreamService.
+    """
+
+    def __init__(self, port=None, interval=None):
+        self.port = Config.STATUS_FEED_PORT if port is None else port
+        self.interval = Config.STATUS_FEED_INTERVAL if interval is None else interval
+        self.loop = stream_service.loop
+        self.clients = set()
+        self.server = None
+        self._latest = {}  # printer_id -> aktueller Status
+        self._sent = {}  # printer_id -> zuletzt verteilter Status
+        self._pending = set()
+        self._flush_handle = None
+        self._last_event_id = None
+
+    def start(self):
+        """Startet den WebSocket-Server im Event Loop des StreamService"""
+        if self.server is not None:
+            return
+        try:
+            future = asyncio.run_coroutine_threadsafe(self._start_server(), self.loop)
+            self.server = future.result()
+            logger.info(f"Status feed listening on port {self.port}")
+        except Exception as e:
+            logger.error(f"Error starting status feed: {e}", exc_info=True)
+
+    async def _start_server(self):
+        # Listener zuerst registrieren, sonst gehen Events zwischen Snapshot und Registrierung verloren.
+        # Die Events landen erst nach dieser Methode im Loop, doppelte sind harmlos.
+        status_events.add_listener(self._on_event)
+        for event in status_events.events_since(None):
+            self._latest[event['printerId']] = event['status']
+            self._sent[event['printerId']] = event['status']
+            self._last_event_id = event['id']
+        return await websockets.serve(self._handle_client, "0.0.0.0", self.port)
+
+    def _on_event(self, event: dict):
+        """Wird im publizierenden Thread aufgerufen und reicht das Event an den Loop weiter"""
+        self.loop.call_soon_threadsafe(self._queue_event, event)
+
+    def _queue_event(self, event: dict):
+        self._latest[event['printerId']] = event['status']
+        self._last_event_id = max(event['id'], self._last_event_id or 0)
+        self._pending.add(event['printerId'])
+        if self._flush_handle is None:
+            self._flush_handle = self.loop.call_later(self.interval, self._flush)
+
+    def _flush(self):
+        """Verteilt die gesammelten Änderungen als ein Delta an alle Clients"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        changes = {}
+        for printer_id in self._pending:
+            status = self._latest[printer_id]
+            delta = diff_status(self._sent.get(printer_id, {}), status)
+            if delta:
+                changes[printer_id] = delta
+            self._sent[printer_id] = status
+        self._pending.clear()
+
+        if not changes or not self.clients:
+            return
+
+        message = json.dumps({
+            'type': 'delta',
+            'id': self._last_event_id,
+            'printers': changes
+        })
+        for websocket in list(self.clients):
+            transport = websocket.transport
+            if transport is not None and transport.get_write_buffer_size() > MAX_CLIENT_BUFFER:
+                # Langsamer Client: trennen, beim Reconnect gibt es einen neuen Snapshot
+                logger.warning("Status feed client too slow, closing connection")
+                self.loop.create_task(websocket.close(code=1013, reason='Client too slow'))
+                self.clients.discard(websocket)
+        websockets.broadcast(self.clients, message)
+
+    async def _handle_client(self, websocket, path=None):
+        try:
+            # Ausstehende Änderungen zuerst an die bisherigen Clients verteilen: der Snapshot
+            # entspricht dann _sent, und alle weiteren Deltas werden gegen _sent gebildet.
+            # Ohne await dazwischen kann kein Delta zwischen Snapshot und Registrierung fallen.
+            if self._pending:
+                self._flush()
+            self.clients.add(websocket)
+            await websocket.send(json.dumps({
+                'type': 'snapshot',
+                'id': self._last_event_id,
+                'printers': self._sent
+            }))
+            logger.info(f"Status feed client connected ({len(self.clients)} total)")
+            # Clients senden nichts, warten bis die Verbindung geschlossen wird
+            await websocket.wait_closed()
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        except Exception as e:
+            logger.error(f"Status feed client error: {e}")
+        finally:
+            self.clients.discard(websocket)
+
+
+# Globale Instanz
+status_feed = StatusFeedService()
@@ -0,0 +1,136 @@
+import atexit
+import copy
+import logging
+import threading
+from src.config import Config
+from .printerRegistry import printer_registry
+from .printerState import PrinterState
+
+logger = logging.getLogger(__name__)
+
+# Status-Felder im gespeicherten Drucker-Dokument
+STATUS_FIELDS = (
+    'status', 'temperatures', 'targets', 'power', 'progress', 'is_active',
+    'layer', 'filename', 'state', 'print_duration', 'message'
+)
+
+
+class StatusStore:
+    """
+    Write-Behind-Speicher für Live-Status der Drucker.
+
+    Der aktuelle Status wird nur im Speicher gehalten (ein PrinterState je
+    Drucker, Format wie bei Creality). Geänderte Drucker werden
+    als "dirty" markiert und gesammelt im konfigurierten Intervall über die
+    Registry persistiert (ein atomarer rename pro Drucker). Flüchtige Felder
+    wie Temperaturen werden nie auf die Platte geschrieben.
+    """
+
+    def __init__(self, flush_interval=None, volatile_fields=None):
+        self.flush_interval = Config.STATUS_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.volatile_fields = set(Config.STATUS_VOLATILE_FIELDS if volatile_fields is None else volatile_fields)
+        self._live = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._flush_thread = None
+        atexit.register(self.flush)
+
+    def update(self, printer_id: str, status_data: dict):
+        """Führt neue Status-Daten in den Live-Status ein und markiert ihn bei Änderung"""
+        with self._lock:
+            state = self._live.get(printer_id)
+            created = state is None
+            if created:
+                # Erster Update seit dem Start: letzten persistierten Stand übernehmen
+                state = self._live[printer_id] = PrinterState(printer_id, 'CREALITY')
+                state.update_from_dict(printer_registry.get(printer_id) or {})
+
+            previous = state.snapshot()
+            if not state.update_from_dict(status_data) and not created:
+                return False
+
+            # Snapshots werden pro Version neu gebaut, previous bleibt unverändert
+            current = state.snapshot()
+            if any(current[field] != previous[field] for field in self._persisted_fields()):
+                self._dirty.add(printer_id)
+
+        self._ensure_flush_thread()
+        return True
+
+    def get(self, printer_id: str) -> dict:
+        """Liefert den Live-Status (leer, wenn noch kein Update kam). Nicht verändern."""
+        with self._lock:
+            state = self._live.get(printer_id)
+        return state.snapshot() if state is not None else {}
+
+    def get_state(self, printer_id: str):
+        """Liefert den PrinterState eines Druckers oder None"""
+        with self._lock:
+            return self._live.get(printer_id)
+
+    def states(self) -> list:
+        """Alle Live-States (z.B. für /metrics)"""
+        with self._lock:
+            return list(self._live.values())
+
+    def discard(self, printer_id: str):
+        """Verwirft den Live-Status eines entfernten Druckers"""
+        with self._lock:
+            self._live.pop(printer_id, None)
+            self._dirty.discard(printer_id)
+
+    def flush(self):
+        """Schreibt alle geänderten Drucker gesammelt über die Registry"""
+        with self._lock:
+            batch = {
+                printer_id: {field: copy.deepcopy(self._live[printer_id].snapshot()[field]) for field in self._persisted_fields()}
+                for printer_id in self._dirty
+                if printer_id in self._live
+            }
+            self._dirty.clear()
+
+        written = 0
+        for printer_id, fields in batch.items():
+            try:
+                # Registry überspringt den Schreibvorgang, wenn das Dokument unverändert ist
+                if printer_registry.update(printer_id, fields):
+                    written += 1
+            except Exception as e:
+                logger.error(f"Error flushing status for printer {printer_id}: {e}")
+                with self._lock:
+                    self._dirty.add(printer_id)
+
+        if written:
+            logger.debug(f"Flushed status for {written} printers")
+        return written
+
+    def stop(self):
+        """Stoppt den Flush-Thread und schreibt ausstehende Änderungen"""
+        self._stop_event.set()
+        self.flush()
+
+    def _persisted_fields(self):
+        return [field for field in STATUS_FIELDS if field not in self.volatile_fields]
+
+    def _ensure_flush_thread(self):
+        # Intervall <= 0: nur beim Beenden schreiben
+        if self.flush_interval <= 0 or self._flush_thread is not None:
+            return
+        with self._lock:
+            if self._flush_thread is not None:
+                return
+            self._flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+            self._flush_thread.start()
+
+    def _flush_loop(self):
+        logger.info(f"Starting status flush thread (interval: {self.flush_interval}s)")
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error in status flush thread: {e}")
+
+
+# Globale Instanz
+status_store = StatusStore()
@@ -0,0 +1,270 @@
+import asyncio
+import logging
+import struct
+from collections import deque
+from src.config import Config
+from .metrics import STREAM_FRAGMENTS_DROPPED
+
+logger = logging.getLogger(__name__)
+
+# sample_is_non_sync_sample in den Sample-Flags (ISO/IEC 14496-12, 8.8.3.1)
+NON_SYNC_SAMPLE = 0x00010000
+
+
+def _box_header(data, offset: int):
+    """(Größe, Typ, Headerlänge) der Box bei offset"""
+    size, box_type = struct.unpack_from('>I4s', data, offset)
+    if size == 1:
+        return struct.unpack_from('>Q', data, offset + 8)[0], box_type, 16
+    return size, box_type, 8
+
+
+def _children(data, start: int, end: int):
+    """Kind-Boxen im Bereich start..end als (Typ, Inhaltsanfang, Ende)"""
+    offset = start
+    while offset + 8 <= end:
+        size, box_type, header = _box_header(data, offset)
+        if size < header or offset + size > end:
+            return
+        yield box_type, offset + header, offset + size
+        offset += size
+
+
+def _find(data, path: tuple, start: int = 0, end: int = None):
+    """Inhaltsbereich der ersten Box entlang path (z.B. (b'moov', b'mvex', b'trex')) oder None"""
+    end = len(data) if end is None else end
+    for box_type, content_start, content_end in _children(data, start, end):
+        if box_type == path[0]:
+            if len(path) == 1:
+                return content_start, content_end
+            return _find(data, path[1:], content_start, content_end)
+    return None
+
+
+def trex_sample_flags(init: bytes):
+    """default_sample_flags aus moov/mvex/trex des Init-Segments oder None"""
+    found = _find(init, (b'moov', b'mvex', b'trex'))
+    if found is None or found[1] - found[0] < 24:
+        return None
+    return struct.unpack_from('>I', init, found[0] + 20)[0]
+
+
+def first_sample_flags(moof: bytes, default_flags=None):
+    """Flags des ersten Samples im ersten traf eines Fragments (aus trun, sonst tfhd, sonst trex)"""
+    traf = _find(moof, (b'moof', b'traf'))
+    if traf is None:
+        return default_flags
+    flags = default_flags
+    for box_type, start, end in _children(moof, *traf):
+        box_flags = struct.unpack_from('>I', moof, start)[0] & 0xFFFFFF
+        if box_type == b'tfhd':
+            offset = start + 8  # version/flags, track_ID
+            for flag, length in ((0x01, 8), (0x02, 4), (0x08, 4), (0x10, 4)):
+                if box_flags & flag:
+                    offset += length
+            if box_flags & 0x20:
+                flags = struct.unpack_from('>I', moof, offset)[0]
+        elif box_type == b'trun':
+            offset = start + 8  # version/flags, sample_count
+            if box_flags & 0x01:
+                offset += 4  # data_offset
+            if box_flags & 0x04:
+                return struct.unpack_from('>I', moof, offset)[0]
+            # Ohne first_sample_flags: Flags des ersten Eintrags, falls pro Sample vorhanden
+            if box_flags & 0x400:
+                offset += 4 * bool(box_flags & 0x100) + 4 * bool(box_flags & 0x200)
+                return struct.unpack_from('>I', moof, offset)[0]
+            return flags
+    return flags
+
+
+class Fmp4Splitter:
+    """Zerlegt einen fMP4-Bytestrom in vollständige Boxen der obersten Ebene"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data: bytes) -> list:
+        """Gibt die mit data vollständig gewordenen Boxen als (Typ, Bytes) zurück"""
+        self.buffer += data
+        boxes = []
+        offset = 0
+        while len(self.buffer) - offset >= 8:
+            if self.buffer[offset:offset + 4] == b'\0\0\0\1' and len(self.buffer) - offset < 16:
+                break  # 64-Bit-Größe noch unvollständig
+            size, box_type, header = _box_header(self.buffer, offset)
+            if size < header:
+                raise ValueError(f"Invalid MP4 box size {size} for {box_type!r}")
+            if len(self.buffer) - offset < size:
+                break
+            boxes.append((box_type, bytes(self.buffer[offset:offset + size])))
+            offset += size
+        del self.buffer[:offset]
+        return boxes
+
+
+class _Subscriber:
+    """Begrenzte Warteschlange eines Zuschauers"""
+
+    __slots__ = ('init', 'queue', 'limit', 'resync', 'ready')
+
+    def __init__(self, init, limit: int):
+        self.init = init  # wird vor allen Fragmenten ausgeliefert
+        self.queue = deque()
+        self.limit = limit
+        self.resync = False
+        self.ready = asyncio.Event()
+
+    def put(self, fragment, keyframe: bool) -> bool:
+        """Reiht ein Fragment ein. Ein voller Zuschauer verliert seinen Rückstand und setzt am nächsten Keyframe wieder ein."""
+        if len(self.queue) >= self.limit:
+            self.queue.clear()
+            self.resync = True
+        if self.resync:
+            if not keyframe:
+                return False
+            self.resync = False
+        self.queue.append(fragment)
+        self.ready.set()
+        return True
+
+    def close(self):
+        self.queue.append(None)
+        self.ready.set()
+
+    async def get(self):
+        """Nächste Nachricht, None wenn der Stream beendet ist"""
+        while True:
+            if self.init is not None:
+                init, self.init = self.init, None
+                return init
+            if self.queue:
+                return self.queue.popleft()
+            self.ready.clear()
+            await self.ready.wait()
+
+
+class StreamBroadcaster:
+    """
+    Liest die fMP4-Ausgabe eines ffmpeg-Prozesses genau einmal und verteilt sie an alle Zuschauer.
+
+    Jeder Zuschauer hat eine eigene, begrenzte Warteschlange (STREAM_CLIENT_QUEUE
+    Fragmente); ein langsamer Zuschauer bremst weder ffmpeg noch die anderen,
+    sondern verliert seinen Rückstand und macht am nächsten Keyframe weiter.
+    Init-Segment (ftyp + moov) und die Fragmente seit dem letzten Keyframe
+    werden gemerkt, damit ein neuer Zuschauer sofort dekodieren kann.
+    Läuft vollständig im Event Loop des StreamService (keine Executor-Threads).
+    """
+
+    def __init__(self, printer_id: str, process, loop, client_queue=None, gop_cache_bytes=None):
+        self.printer_id = printer_id
+        self.process = process
+        self.loop = loop
+        self.client_queue = Config.STREAM_CLIENT_QUEUE if client_queue is None else client_queue
+        self.gop_cache_bytes = Config.STREAM_GOP_CACHE_BYTES if gop_cache_bytes is None else gop_cache_bytes
+        self.subscribers = set()
+        self.init = None
+        self.gop = []  # Fragmente seit dem letzten Keyframe
+        self.gop_bytes = 0
+        self.closed = False
+        self.fragments = 0
+        self.stderr_tail = deque(maxlen=20)
+        self._header = b''  # ftyp bzw. Boxen vor dem nächsten moof
+        self._trex_flags = None
+        self._task = None
+
+    def start(self):
+        """Startet das Lesen aus einem beliebigen Thread"""
+        self._task = asyncio.run_coroutine_threadsafe(self._run(), self.loop)
+
+    async def _read_pipe(self, pipe):
+        reader = asyncio.StreamReader(limit=2 ** 20)
+        transport, _ = await self.loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+        return reader, transport
+
+    async def _run(self):
+        transports = []
+        try:
+            stdout, transport = await self._read_pipe(self.process.stdout)
+            transports.append(transport)
+            if self.process.stderr is not None:
+                # ffmpeg blockiert, wenn niemand stderr liest
+                stderr, transport = await self._read_pipe(self.process.stderr)
+                transports.append(transport)
+                self.loop.create_task(self._drain_stderr(stderr))
+
+            splitter = Fmp4Splitter()
+            while True:
+                data = await stdout.read(65536)
+                if not data:
+                    break
+                for box_type, box in splitter.feed(data):
+                    self._on_box(box_type, box)
+        except Exception as e:
+            logger.error(f"Stream broadcaster for {self.printer_id} failed: {e}", exc_info=True)
+        finally:
+            for transport in transports:
+                transport.close()
+            self._close()
+
+    async def _drain_stderr(self, reader):
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            self.stderr_tail.append(line.decode(errors='replace').rstrip())
+
+    def _on_box(self, box_type: bytes, box: bytes):
+        if box_type == b'moov':
+            self.init = self._header + box
+            self._header = b''
+            self._trex_flags = trex_sample_flags(self.init)
+            self.gop, self.gop_bytes = [], 0
+            for subscriber in self.subscribers:
+                subscriber.init = self.init
+        elif box_type == b'moof':
+            self._header += box
+        elif box_type == b'mdat' and self._header:
+            fragment = self._header + box
+            self._header = b''
+            flags = first_sample_flags(fragment, self._trex_flags)
+            # Ohne Flags lässt sich nichts sagen, dann gilt jedes Fragment als Einstieg
+            self._publish(fragment, flags is None or not flags & NON_SYNC_SAMPLE)
+        else:
+            # ftyp, styp, sidx usw. gehören zum nächsten Init-Segment bzw. Fragment
+            self._header += box
+
+    def _publish(self, fragment: bytes, keyframe: bool):
+        self.fragments += 1
+        if keyframe:
+            self.gop, self.gop_bytes = [fragment], len(fragment)
+        elif self.gop:
+            self.gop.append(fragment)
+            self.gop_bytes += len(fragment)
+            if self.gop_bytes > self.gop_cache_bytes:
+                # Zu lange ohne Keyframe: neue Zuschauer warten auf den nächsten
+                self.gop, self.gop_bytes = [], 0
+        for subscriber in self.subscribers:
+            if not subscriber.put(fragment, keyframe):
+                STREAM_FRAGMENTS_DROPPED.inc(self.printer_id)
+
+    def subscribe(self) -> _Subscriber:
+        """Neuer Zuschauer (nur im Event Loop aufrufen), beginnt mit Init-Segment und aktuellem GOP"""
+        subscriber = _Subscriber(self.init, self.client_queue + len(self.gop))
+        subscriber.queue.extend(self.gop)
+        if self.closed:
+            subscriber.close()
+        else:
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: _Subscriber):
+        self.subscribers.discard(subscriber)
+
+    def _close(self):
+        self.closed = True
+        if self.stderr_tail:
+            logger.debug(f"ffmpeg for {self.printer_id} ended: {' | '.join(self.stderr_tail)}")
+        for subscriber in self.subscribers:
+            subscriber.close()
+        self.subscribers.clear()
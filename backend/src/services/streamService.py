@@ -9,6 +9,9 @@ from threading import Thread
 import time
 from flask import jsonify
 from .printerService import getPrinterById as get_printer
+from .metrics import FFMPEG_RESTARTS, WEBSOCKET_CLIENTS
+from .pollPolicy import printer_views
+from .streamBroadcaster import StreamBroadcaster
 
 logger = logging.getLogger(__name__)
 
@@ -93,13 +96,17 @@ class StreamService:
                 process.terminate()
                 return {'success': False, 'error': str(e)}
             
+            # Ein Leser je ffmpeg-Prozess, der die Ausgabe an alle Zuschauer verteilt
+            broadcaster = StreamBroadcaster(printer_id, process, self.loop)
+            broadcaster.start()
+            
             # WebSocket Server erstellen
             try:
                 future = asyncio.run_coroutine_threadsafe(
-                    self._create_ws_server(process, port),
+                    self._create_ws_server(printer_id, broadcaster, port),
                     self.loop
                 )
-                future.result()  # Warte auf Server-Start
+                ws_server = future.result()  # Warte auf Server-Start
             except Exception as e:
                 process.terminate()
                 self.release_port(port)
@@ -114,7 +121,9 @@ class StreamService:
             self.active_streams[printer_id] = {
                 'process': process,
                 'port': port,
-                'monitor_task': monitor_future
+                'monitor_task': monitor_future,
+                'broadcaster': broadcaster,
+                'ws_server': ws_server
             }
             
             return {'success': True, 'port': port}
@@ -176,6 +185,7 @@ class StreamService:
                         break
                         
                     restart_count += 1
+                    FFMPEG_RESTARTS.inc(printer_id)
                     logger.info(f"Restarting stream {printer_id} (attempt {restart_count}/{max_restarts})")
                     
                     # Cleanup
@@ -198,40 +208,34 @@ class StreamService:
                 logger.error(f"Monitor error: {e}")
                 await asyncio.sleep(5)
 
-    async def handle_websocket(self, websocket, path, process):
+    async def handle_websocket(self, websocket, path, broadcaster, printer_id=None):
+        """Schickt einem Zuschauer Init-Segment, aktuelles GOP und danach jedes neue Fragment"""
+        WEBSOCKET_CLIENTS.inc()
+        if printer_id:
+            printer_views.open(printer_id)
+        subscriber = broadcaster.subscribe()
         try:
-            chunk_size = 16384  # Optimierte Chunk-Größe
-            read_buffer = bytearray(chunk_size)
-            
             while True:
-                if process.poll() is not None:
-                    break
-                
-                try:
-                    # Effizienteres Lesen mit voralloziertem Buffer
-                    n = await self.loop.run_in_executor(
-                        None,
-                        process.stdout.readinto,
-                        read_buffer
-                    )
-                    
-                    if n == 0:
-                        await asyncio.sleep(0.01)
-                        continue
-                    
-                    await websocket.send(bytes(read_buffer[:n]))
-                    
-                except Exception as e:
-                    logger.error(f"Stream error: {e}")
+                data = await subscriber.get()
+                if data is None:
                     break
+                await websocket.send(data)
                 
+        except websockets.ConnectionClosed:
+            pass
+        except Exception as e:
+            logger.error(f"Stream error: {e}")
         finally:
+            broadcaster.unsubscribe(subscriber)
+            WEBSOCKET_CLIENTS.dec()
+            if printer_id:
+                printer_views.close(printer_id)
             await websocket.close()
 
-    async def _create_ws_server(self, process, port):
+    async def _create_ws_server(self, printer_id, broadcaster, port):
         """Erstellt einen WebSocket Server"""
         server = await websockets.serve(
-            lambda ws, path: self.handle_websocket(ws, path, process),
+            lambda ws, path: self.handle_websocket(ws, path, broadcaster, printer_id),
             "0.0.0.0",
             port
         )
@@ -252,6 +256,9 @@ class StreamService:
                     process.wait(timeout=5)
                 except:
                     process.kill()
+                # WebSocket Server schließen, Zuschauer bekommen das Stream-Ende vom Broadcaster
+                if stream.get('ws_server'):
+                    self.loop.call_soon_threadsafe(stream['ws_server'].close)
                 # Port freigeben
                 if 'port' in stream:
                     self.release_port(stream['port'])
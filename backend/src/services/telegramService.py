@@ -1,5 +1,5 @@
 import logging
-import requests
+from src.services.httpClient import http_client
 from pathlib import Path
 import json
 import os
@@ -156,7 +156,7 @@ class TelegramService:
                     "text": message,
                     "parse_mode": "Markdown"
                 }
-                response = requests.post(url, json=data)
+                response = http_client.post(url, json=data)
                 if not response.ok:
                     logger.error(f"Error sending telegram message: {response.text}")
                     
@@ -186,7 +186,7 @@ Available Commands:
                     "text": welcome_msg,
                     "parse_mode": "Markdown"
                 }
-                requests.post(url, json=data)
+                http_client.post(url, json=data)
         except Exception as e:
             logger.error(f"Error sending welcome message: {e}")
             
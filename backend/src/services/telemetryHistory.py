@@ -0,0 +1,196 @@
+import logging
+import threading
+import time
+import numpy as np
+from src.config import Config
+from .downsampling import downsample_indices
+from .telemetryStore import TelemetryStore
+
+logger = logging.getLogger(__name__)
+
+# Aufgezeichnete Messreihen und ihre Quelle im PrinterState
+HISTORY_FIELDS = {
+    'nozzle': 'hotend',
+    'bed': 'bed',
+    'chamber': 'chamber',
+    'nozzle_target': 'target_hotend',
+    'bed_target': 'target_bed',
+    'progress': 'progress',
+    'layer': 'current_layer',
+}
+_FIELD_INDEX = {field: index for index, field in enumerate(HISTORY_FIELDS)}
+_STATE_ATTRS = tuple(HISTORY_FIELDS.values())
+
+
+# Anfangsgröße eines Ringpuffers, er wächst bei Bedarf bis zur capacity
+INITIAL_RING_SIZE = 256
+
+
+class TelemetryRing:
+    """
+    Ringpuffer für die Messwerte eines Druckers, höchstens capacity Samples.
+
+    Zeitstempel und Werte liegen in NumPy-Arrays, ein Sample ist eine Zeile
+    (kein Dict pro Sample). Lesen erfolgt über Array-Slices. Die Arrays starten
+    klein und verdoppeln sich erst, wenn sie voll sind: selten aktualisierte
+    Drucker belegen so nur wenige KB statt der vollen capacity.
+    """
+
+    def __init__(self, capacity: int, initial_size: int = INITIAL_RING_SIZE):
+        self.capacity = capacity
+        self.size = min(capacity, initial_size)
+        self.timestamps = np.zeros(self.size, dtype=np.float64)
+        self.values = np.zeros((self.size, len(HISTORY_FIELDS)), dtype=np.float32)
+        self.count = 0
+        self.head = 0  # nächste Schreibposition
+        self.lock = threading.Lock()
+
+    def _grow(self):
+        """Verdoppelt die Arrays (höchstens auf capacity), die Samples liegen danach ab Index 0"""
+        size = min(self.size * 2, self.capacity)
+        order = np.concatenate((np.arange(self.head, self.count), np.arange(self.head)))
+        timestamps = np.zeros(size, dtype=np.float64)
+        values = np.zeros((size, len(HISTORY_FIELDS)), dtype=np.float32)
+        timestamps[:self.count] = self.timestamps[order]
+        values[:self.count] = self.values[order]
+        self.timestamps, self.values, self.size = timestamps, values, size
+        self.head = self.count
+
+    def append(self, timestamp: float, values: tuple, min_interval: float = 0) -> bool:
+        """Fügt ein Sample an. Gibt False zurück, wenn nur das letzte Sample überschrieben wurde."""
+        with self.lock:
+            last = (self.head - 1) % self.size
+            if self.count and timestamp - self.timestamps[last] < min_interval:
+                # Innerhalb des Mindestabstands: letztes Sample mit dem neuesten Wert überschreiben
+                self.values[last] = values
+                return False
+            if self.count == self.size < self.capacity:
+                self._grow()
+            self.timestamps[self.head] = timestamp
+            self.values[self.head] = values
+            self.head = (self.head + 1) % self.size
+            self.count = min(self.count + 1, self.size)
+            return True
+
+    def oldest(self):
+        """Zeitstempel des ältesten Samples im Puffer oder None"""
+        with self.lock:
+            if not self.count:
+                return None
+            return float(self.timestamps[(self.head - self.count) % self.size])
+
+    def since(self, since: float = None, columns: list = None):
+        """Liefert (timestamps, values) ab since in zeitlicher Reihenfolge als Kopien"""
+        columns = list(range(len(HISTORY_FIELDS))) if columns is None else columns
+        with self.lock:
+            start = (self.head - self.count) % self.size
+            if start + self.count <= self.size:
+                timestamps = self.timestamps[start:start + self.count].copy()
+                values = self.values[start:start + self.count, columns]
+            else:
+                timestamps = np.concatenate((self.timestamps[start:], self.timestamps[:self.head]))
+                values = np.concatenate((self.values[start:, columns], self.values[:self.head, columns]))
+
+        if since is not None:
+            first = np.searchsorted(timestamps, since, side='right')
+            timestamps = timestamps[first:]
+            values = values[first:]
+        return timestamps, values
+
+
+class TelemetryHistory:
+    """
+    Verlauf von Temperaturen, Zielwerten, Fortschritt und Layer je Drucker.
+
+    Jeder Drucker bekommt beim ersten Sample einen Ringpuffer, der bis auf
+    HISTORY_CAPACITY Einträge wächst, der Speicher pro Drucker ist damit begrenzt.
+    Gespeist wird der Verlauf aus den Ingest-Pfaden der Backends.
+
+    Neue Samples (höchstens eines pro HISTORY_MIN_INTERVAL) gehen zusätzlich an
+    den TelemetryStore. Abfragen, die weiter zurückreichen als der Ringpuffer
+    (z.B. nach einem Neustart), werden mit Daten aus dem Store ergänzt.
+    """
+
+    def __init__(self, capacity=None, min_interval=None, store=None):
+        self.capacity = Config.HISTORY_CAPACITY if capacity is None else capacity
+        self.min_interval = Config.HISTORY_MIN_INTERVAL if min_interval is None else min_interval
+        if store is None and Config.TELEMETRY_ENABLED:
+            store = TelemetryStore(columns=tuple(HISTORY_FIELDS))
+        self.store = store
+        self._rings = {}
+        self._lock = threading.Lock()
+
+    def record(self, printer_id: str, state, timestamp: float = None):
+        """Nimmt die aktuellen Werte eines PrinterState als Sample auf"""
+        try:
+            ring = self._rings.get(printer_id)
+            if ring is None:
+                with self._lock:
+                    ring = self._rings.setdefault(printer_id, TelemetryRing(self.capacity))
+            values = tuple(getattr(state, attr) for attr in _STATE_ATTRS)
+            timestamp = timestamp or state.updated_at or time.time()
+            if ring.append(timestamp, values, self.min_interval) and self.store is not None:
+                self.store.enqueue(printer_id, timestamp, values)
+        except Exception as e:
+            logger.error(f"Error recording telemetry for printer {printer_id}: {e}")
+
+    def query(self, printer_id: str, since: float = None, fields: list = None,
+              points: int = None, method: str = 'lttb') -> dict:
+        """
+        Verlauf ab since (Unix-Zeit in Sekunden) für die gewählten Felder. Ohne
+        since der Inhalt des Ringpuffers, gibt es noch keinen (z.B. nach einem
+        Neustart), dessen Zeitraum (HISTORY_CAPACITY * HISTORY_MIN_INTERVAL) aus dem Store.
+        Mit points wird per LTTB oder Min/Max je Bucket auf höchstens points Punkte
+        (gemeinsame Zeitachse aller Felder) reduziert. Unbekannte Felder oder Verfahren lösen einen ValueError aus.
+        """
+        fields = list(HISTORY_FIELDS) if not fields else fields
+        unknown = [field for field in fields if field not in _FIELD_INDEX]
+        if unknown:
+            raise ValueError(f"Unknown history fields: {unknown}")
+
+        if points is not None and points < 1:
+            raise ValueError("points must be positive")
+
+        ring = self._rings.get(printer_id)
+        oldest = ring.oldest() if ring is not None else None
+        if ring is not None:
+            timestamps, values = ring.since(since, [_FIELD_INDEX[field] for field in fields])
+        else:
+            timestamps = np.zeros(0, dtype=np.float64)
+            values = np.zeros((0, len(fields)), dtype=np.float32)
+
+        if since is None and oldest is None:
+            since = time.time() - self.capacity * (self.min_interval or 1.0)
+
+        # Älteren Teil aus dem Store ergänzen, bei langen Zeiträumen aus verdichteten Stufen
+        if self.store is not None and (oldest is None or since is not None and since < oldest):
+            resolution = None
+            if points and since is not None:
+                resolution = ((oldest or time.time()) - since) / points
+            stored_timestamps, stored_values = self.store.query(
+                printer_id, fields, since=since, until=oldest, resolution=resolution
+            )
+            if len(stored_timestamps):
+                timestamps = np.concatenate((stored_timestamps, timestamps))
+                values = np.concatenate((stored_values, values))
+
+        if points:
+            selected = downsample_indices(timestamps, values, points, method)
+            timestamps, values = timestamps[selected], values[selected]
+        # float32 -> float64 und runden, damit JSON keine Artefakte wie 200.10000610351562 enthält
+        values = np.round(values.astype(np.float64), 2)
+        return {
+            'timestamps': np.round(timestamps, 3).tolist(),
+            'series': {field: values[:, index].tolist() for index, field in enumerate(fields)}
+        }
+
+    def remove(self, printer_id: str):
+        """Verwirft den Verlauf eines entfernten Druckers"""
+        with self._lock:
+            self._rings.pop(printer_id, None)
+        if self.store is not None:
+            self.store.remove(printer_id)
+
+
+# Globale Instanz
+telemetry_history = TelemetryHistory()
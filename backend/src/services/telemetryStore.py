@@ -0,0 +1,318 @@
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import numpy as np
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+RAW_TABLE = 'telemetry_raw'
+ROLLUP_STATE_TABLE = 'telemetry_rollups'
+
+# Verdichtungsstufen: (Tabelle, Bucket-Größe in Sekunden, Config-Attribut der Aufbewahrung in Sekunden)
+TIERS = (
+    (RAW_TABLE, 0, 'TELEMETRY_RAW_RETENTION'),
+    ('telemetry_1m', 60, 'TELEMETRY_1M_RETENTION'),
+    ('telemetry_1h', 3600, 'TELEMETRY_1H_RETENTION'),
+)
+
+# Sekunden, die eine Minute nach ihrem Ende noch auf verspätete Samples gewartet wird
+ROLLUP_LAG = 60
+
+
+class TelemetryStore:
+    """
+    Dauerhafte Telemetrie in SQLite (WAL-Modus).
+
+    Samples kommen über eine begrenzte Queue und werden von einem einzigen
+    Writer-Thread gesammelt in Transaktionen geschrieben (höchstens eine pro
+    TELEMETRY_FLUSH_INTERVAL bzw. TELEMETRY_BATCH_SIZE Zeilen). Ist die Queue
+    voll, werden neue Samples verworfen statt die Ingest-Pfade zu blockieren.
+
+    Im selben Thread läuft alle TELEMETRY_COMPACT_INTERVAL Sekunden die
+    Verdichtung: Rohdaten -> 1-Minuten -> 1-Stunden-Werte (min/max/avg), danach
+    werden Zeilen jenseits der Aufbewahrung ihrer Stufe gelöscht. Rohdaten
+    werden erst gelöscht, wenn sie verdichtet sind.
+    """
+
+    def __init__(self, columns: tuple, db_path=None, queue_size=None, batch_size=None, flush_interval=None,
+                 compact_interval=None, retention=None):
+        self.columns = tuple(columns)
+        self.db_path = str(db_path or Config.TELEMETRY_DB)
+        self.batch_size = Config.TELEMETRY_BATCH_SIZE if batch_size is None else batch_size
+        self.flush_interval = Config.TELEMETRY_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.compact_interval = Config.TELEMETRY_COMPACT_INTERVAL if compact_interval is None else compact_interval
+        # Aufbewahrung in Sekunden je Tabelle
+        self.retention = {table: getattr(Config, attr) for table, _, attr in TIERS}
+        self.retention.update(retention or {})
+        self._queue = queue.Queue(maxsize=Config.TELEMETRY_QUEUE_SIZE if queue_size is None else queue_size)
+        self._stop_event = threading.Event()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._last_drop_warning = 0
+        self.written = 0
+        self.dropped = 0
+        atexit.register(self.stop)
+
+    def enqueue(self, printer_id: str, timestamp: float, values: tuple):
+        """Reiht ein Sample zum Schreiben ein, ohne zu blockieren"""
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(('insert', (printer_id, timestamp) + tuple(float(value) for value in values)))
+        except queue.Full:
+            self.dropped += 1
+            now = time.time()
+            if now - self._last_drop_warning > 60:
+                self._last_drop_warning = now
+                logger.warning(f"Telemetry queue full, dropped {self.dropped} samples so far")
+
+    def remove(self, printer_id: str):
+        """Löscht die gespeicherte Telemetrie eines Druckers (über den Writer-Thread)"""
+        self._ensure_writer()
+        try:
+            self._queue.put(('delete', printer_id), timeout=5)
+        except queue.Full:
+            logger.error(f"Telemetry queue full, could not delete history of printer {printer_id}")
+
+    def select_tier(self, since: float = None, resolution: float = None) -> str:
+        """
+        Wählt die Tabelle für eine Abfrage: die feinste Stufe, deren Aufbewahrung
+        since noch abdeckt, bei gewünschter Auflösung (Sekunden pro Punkt) die
+        gröbste Stufe, deren Buckets nicht größer als die Auflösung sind.
+        Ohne since gelten die Rohdaten (nicht der gesamte Zeitraum aller Stufen).
+        """
+        now = time.time()
+        if since is None:
+            since = now - self.retention[RAW_TABLE]
+        cover = next(
+            (index for index, (table, _, _) in enumerate(TIERS) if since >= now - self.retention[table]),
+            len(TIERS) - 1
+        )
+        fine_enough = 0
+        if resolution:
+            fine_enough = max(index for index, (_, bucket, _) in enumerate(TIERS) if bucket <= resolution)
+        return TIERS[max(cover, fine_enough)][0]
+
+    def query(self, printer_id: str, columns: list, since: float = None, until: float = None, resolution: float = None):
+        """
+        Liefert (timestamps, values) für since < ts < until. Bei verdichteten
+        Stufen ist ts der Bucket-Beginn und der Wert der Durchschnitt.
+        """
+        unknown = [column for column in columns if column not in self.columns]
+        if unknown:
+            raise ValueError(f"Unknown telemetry columns: {unknown}")
+
+        table = self.select_tier(since, resolution)
+        if table == RAW_TABLE:
+            selected = ', '.join(columns)
+        else:
+            selected = ', '.join(f"{column}_avg" for column in columns)
+        sql = f"SELECT ts, {selected} FROM {table} WHERE printer_id = ?"
+        params = [printer_id]
+        if since is not None:
+            sql += " AND ts > ?"
+            params.append(since)
+        if until is not None:
+            sql += " AND ts < ?"
+            params.append(until)
+        sql += " ORDER BY ts"
+
+        try:
+            conn = self._connect()
+            try:
+                rows = conn.execute(sql, params).fetchall()
+            finally:
+                conn.close()
+        except sqlite3.OperationalError as e:
+            # Datenbank oder Tabelle existiert noch nicht
+            logger.debug(f"Telemetry query failed: {e}")
+            rows = []
+
+        if not rows:
+            return np.zeros(0, dtype=np.float64), np.zeros((0, len(columns)), dtype=np.float32)
+        data = np.array(rows, dtype=np.float64)
+        return data[:, 0], data[:, 1:].astype(np.float32)
+
+    def stop(self):
+        """Stoppt den Writer-Thread, ausstehende Samples werden noch geschrieben"""
+        self._stop_event.set()
+        if self._writer is not None:
+            self._writer.join(timeout=10)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_schema(self, conn: sqlite3.Connection):
+        columns = ', '.join(f"{column} REAL" for column in self.columns)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {RAW_TABLE} (printer_id TEXT NOT NULL, ts REAL NOT NULL, {columns})")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{RAW_TABLE}_printer_ts ON {RAW_TABLE} (printer_id, ts)")
+
+        aggregates = ', '.join(
+            f"{column}_min REAL, {column}_max REAL, {column}_avg REAL" for column in self.columns
+        )
+        for table, bucket, _ in TIERS[1:]:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (printer_id TEXT NOT NULL, ts REAL NOT NULL, "
+                f"samples INTEGER NOT NULL, {aggregates}, PRIMARY KEY (printer_id, ts))"
+            )
+        # Verdichtung und Aufbewahrung filtern nur nach ts über alle Drucker, ohne diesen
+        # Index liefen sie als Full Table Scan im Writer-Thread und blockierten die Inserts
+        for table, _, _ in TIERS:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_ts ON {table} (ts)")
+        # Bis wohin (exklusiv) eine Stufe vollständig verdichtet ist
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {ROLLUP_STATE_TABLE} (tier TEXT PRIMARY KEY, until REAL NOT NULL)")
+        conn.commit()
+
+    def compact(self, conn: sqlite3.Connection, now: float = None):
+        """Verdichtet neue vollständige Buckets und wendet die Aufbewahrung an"""
+        now = time.time() if now is None else now
+        started = time.monotonic()
+        rolled = {}
+        for (source, _, _), (target, bucket, _) in zip(TIERS, TIERS[1:]):
+            if source == RAW_TABLE:
+                # Minuten erst nach Ablauf der Wartezeit für verspätete Samples verdichten
+                end = (now - ROLLUP_LAG) // bucket * bucket
+            else:
+                # Nur so weit, wie die Quellstufe selbst vollständig ist
+                end = self._rollup_until(conn, source) // bucket * bucket
+            rolled[target] = self._rollup(conn, source, target, bucket, end)
+
+        deleted = 0
+        with conn:
+            for index, (table, _, _) in enumerate(TIERS):
+                cutoff = now - self.retention[table]
+                if index + 1 < len(TIERS):
+                    # Nichts löschen, was noch nicht in die nächste Stufe verdichtet wurde
+                    cutoff = min(cutoff, self._rollup_until(conn, TIERS[index + 1][0]))
+                deleted += conn.execute(f"DELETE FROM {table} WHERE ts < ?", (cutoff,)).rowcount
+        logger.debug(
+            f"Telemetry compaction: rolled up {rolled}, deleted {deleted} rows "
+            f"in {time.monotonic() - started:.2f}s"
+        )
+        return rolled, deleted
+
+    def _rollup_until(self, conn: sqlite3.Connection, tier: str) -> float:
+        row = conn.execute(f"SELECT until FROM {ROLLUP_STATE_TABLE} WHERE tier = ?", (tier,)).fetchone()
+        return row[0] if row else 0
+
+    def _rollup(self, conn: sqlite3.Connection, source: str, target: str, bucket: int, end: float) -> int:
+        """Aggregiert source im Bereich [bisheriger Stand, end) in Buckets von target"""
+        start = self._rollup_until(conn, target)
+        if not start:
+            # Erster Lauf: beim ältesten Eintrag der Quelle beginnen
+            first = conn.execute(f"SELECT MIN(ts) FROM {source}").fetchone()[0]
+            if first is None:
+                return 0
+            start = first // bucket * bucket
+        if end <= start:
+            return 0
+
+        if source == RAW_TABLE:
+            samples = "COUNT(*)"
+            aggregates = ', '.join(f"MIN({c}), MAX({c}), AVG({c})" for c in self.columns)
+        else:
+            # Durchschnitt über die Anzahl der Samples je Quell-Bucket gewichten
+            samples = "SUM(samples)"
+            aggregates = ', '.join(
+                f"MIN({c}_min), MAX({c}_max), SUM({c}_avg * samples) / SUM(samples)" for c in self.columns
+            )
+        target_columns = ', '.join(f"{c}_min, {c}_max, {c}_avg" for c in self.columns)
+
+        with conn:
+            count = conn.execute(
+                f"INSERT OR REPLACE INTO {target} (printer_id, ts, samples, {target_columns}) "
+                f"SELECT printer_id, CAST(ts / {bucket} AS INTEGER) * {bucket} AS bucket, {samples}, {aggregates} "
+                f"FROM {source} WHERE ts >= ? AND ts < ? GROUP BY printer_id, bucket",
+                (start, end)
+            ).rowcount
+            conn.execute(
+                f"INSERT OR REPLACE INTO {ROLLUP_STATE_TABLE} (tier, until) VALUES (?, ?)", (target, end)
+            )
+        return count
+
+    def _ensure_writer(self):
+        if self._writer is not None or self._stop_event.is_set():
+            return
+        with self._writer_lock:
+            if self._writer is not None:
+                return
+            self._writer = threading.Thread(target=self._run, daemon=True)
+            self._writer.start()
+
+    def _run(self):
+        logger.info(f"Starting telemetry writer ({self.db_path})")
+        try:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = self._connect()
+            self._init_schema(conn)
+        except Exception as e:
+            logger.error(f"Error opening telemetry database: {e}", exc_info=True)
+            return
+
+        insert_sql = (
+            f"INSERT INTO {RAW_TABLE} (printer_id, ts, {', '.join(self.columns)}) "
+            f"VALUES ({', '.join('?' for _ in range(len(self.columns) + 2))})"
+        )
+        next_compaction = time.monotonic()
+        try:
+            while not (self._stop_event.is_set() and self._queue.empty()):
+                batch = self._collect_batch()
+                if batch:
+                    self._write_batch(conn, insert_sql, batch)
+                if self.compact_interval > 0 and time.monotonic() >= next_compaction:
+                    next_compaction = time.monotonic() + self.compact_interval
+                    try:
+                        self.compact(conn)
+                    except sqlite3.Error as e:
+                        logger.error(f"Error compacting telemetry: {e}")
+        finally:
+            conn.close()
+            logger.info("Telemetry writer stopped")
+
+    def _collect_batch(self) -> list:
+        """Sammelt Einträge, bis die Batch-Größe oder das Flush-Intervall erreicht ist"""
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0 or self._stop_event.is_set():
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_batch(self, conn: sqlite3.Connection, insert_sql: str, batch: list):
+        """Schreibt einen Batch in einer Transaktion, Löschungen in Queue-Reihenfolge"""
+        inserted = 0
+        try:
+            with conn:
+                rows = []
+                for op, item in batch:
+                    if op == 'insert':
+                        rows.append(item)
+                        continue
+                    if rows:
+                        conn.executemany(insert_sql, rows)
+                        inserted += len(rows)
+                        rows = []
+                    for table, _, _ in TIERS:
+                        conn.execute(f"DELETE FROM {table} WHERE printer_id = ?", (item,))
+                if rows:
+                    conn.executemany(insert_sql, rows)
+                    inserted += len(rows)
+            self.written += inserted
+        except sqlite3.Error as e:
+            logger.error(f"Error writing telemetry batch ({len(batch)} entries): {e}")
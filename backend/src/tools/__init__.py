@@ -0,0 +1 @@
+# Entwickler-Werkzeuge (Benchmarks, Simulatoren), nicht Teil der laufenden App
@@ -0,0 +1,529 @@
+"""
+Lokaler Simulator für N Bambu Lab Drucker (Skalierungstests ohne Hardware).
+
+Jeder simulierte Drucker bekommt eine eigene Loopback-Adresse (127.0.1.1,
+127.0.1.2, ...) und stellt dort wie ein echter Drucker einen MQTT-Broker über
+TLS auf Port 8883 bereit (Benutzer bblp, Passwort = Access Code). Auf
+device/<serial>/report werden realistische Reports veröffentlicht:
+Aufheizrampen, Fortschritt, Layerwechsel und gcode_state-Übergänge
+(IDLE -> PREPARE -> RUNNING -> FINISH). Auf device/<serial>/request werden
+pushall, print.stop/pause/resume und get_version beantwortet.
+
+Mit --rtsp liefert jeder Drucker zusätzlich unter
+rtsps://bblp:<code>@<ip>:322/streaming/live/1 ein Testbild (benötigt ffmpeg).
+
+Aufruf aus backend/:
+    python -m src.tools.bambuSimulator --printers 200
+    python -m src.tools.bambuSimulator --printers 20 --speed 10 --register http://localhost:4000 --rtsp
+
+Ganz 127.0.0.0/8 ist unter Linux ohne weitere Konfiguration an lo erreichbar.
+Andere Adressbereiche müssen vorher einem Interface zugewiesen werden.
+"""
+import argparse
+import asyncio
+import copy
+import ipaddress
+import json
+import logging
+import math
+import os
+import random
+import ssl
+import struct
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from .rtspStandIn import H264TestSource, RTSPEndpoint
+
+logger = logging.getLogger(__name__)
+
+MQTT_PORT = 8883
+RTSP_PORT = 322
+USERNAME = 'bblp'
+PUSHALL_TEMPLATE = Path(__file__).parent / 'payloads' / 'bambu_report.jsonl'
+
+# MQTT 3.1.1 Pakettypen
+CONNECT = 1
+CONNACK = 2
+PUBLISH = 3
+PUBACK = 4
+SUBSCRIBE = 8
+SUBACK = 9
+UNSUBSCRIBE = 10
+UNSUBACK = 11
+PINGREQ = 12
+PINGRESP = 13
+DISCONNECT = 14
+
+# CONNACK Return Codes
+CONNACK_ACCEPTED = 0
+CONNACK_BAD_PROTOCOL = 1
+CONNACK_BAD_CREDENTIALS = 4
+
+AMBIENT = 25.0
+NOZZLE_TARGET = 220
+BED_TARGET = 55
+
+
+def make_ssl_context(directory: str, serial: str) -> ssl.SSLContext:
+    """
+    Selbstsigniertes Zertifikat wie auf den Druckern, mit der Seriennummer als CN
+    (Clients prüfen die Kette nicht, die Umstellung per Discovery prüft den CN)
+    """
+    cert = os.path.join(directory, f'{serial}.crt')
+    key = os.path.join(directory, f'{serial}.key')
+    if not (os.path.exists(cert) and os.path.exists(key)):
+        subprocess.run(
+            ['openssl', 'req', '-x509', '-newkey', 'ec', '-pkeyopt', 'ec_paramgen_curve:prime256v1', '-nodes',
+             '-keyout', key, '-out', cert, '-days', '3650', '-subj', f'/CN={serial}'],
+            check=True, capture_output=True
+        )
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    return context
+
+
+def _load_pushall_template() -> dict:
+    with open(PUSHALL_TEMPLATE, 'r') as f:
+        return json.loads(f.readline())['payload']
+
+
+class SimulatedPrinter:
+    """
+    Zustand und Physik eines Druckers. tick() schreitet die (mit speed
+    beschleunigte) Zeit fort, report() liefert nur die seit dem letzten Report
+    geänderten Felder wie die echten inkrementellen push_status-Nachrichten.
+    """
+
+    def __init__(self, serial: str, ip: str, access_code: str, speed: float = 1.0, template: dict = None):
+        self.serial = serial
+        self.ip = ip
+        self.access_code = access_code
+        self.speed = speed
+        self.template = template or _load_pushall_template()
+        self.rng = random.Random(serial)
+        self.gcode_state = 'IDLE'
+        self.nozzle = self.bed = self.chamber = AMBIENT
+        self.nozzle_target = self.bed_target = 0
+        self.percent = 0
+        self.remaining = 0
+        self.layer = 0
+        self.total_layers = 0
+        self.subtask_name = ''
+        self.job_duration = 0.0
+        self.job_elapsed = 0.0
+        self.idle_left = self.rng.uniform(2, 20)
+        self.sequence_id = 0
+        self._reported = {}
+
+    def _next_sequence(self) -> str:
+        self.sequence_id += 1
+        return str(self.sequence_id)
+
+    def _start_job(self):
+        self.gcode_state = 'PREPARE'
+        self.nozzle_target = NOZZLE_TARGET
+        self.bed_target = BED_TARGET
+        self.job_duration = self.rng.uniform(15, 90) * 60
+        self.job_elapsed = 0.0
+        self.total_layers = self.rng.randint(50, 400)
+        self.layer = 0
+        self.percent = 0
+        self.remaining = math.ceil(self.job_duration / 60)
+        self.subtask_name = self.rng.choice(['3DBenchy', 'calicat', 'gearbox_housing', 'vase_mode', 'phone_stand'])
+
+    def _end_job(self, state: str):
+        self.gcode_state = state
+        self.nozzle_target = self.bed_target = 0
+        self.remaining = 0
+        self.idle_left = self.rng.uniform(30, 300)
+
+    @staticmethod
+    def _approach(value: float, target: float, tau: float, dt: float) -> float:
+        return value + (target - value) * (1 - math.exp(-dt / tau))
+
+    def tick(self, dt: float):
+        dt *= self.speed
+        if self.gcode_state in ('IDLE', 'FINISH', 'FAILED'):
+            self.idle_left -= dt
+            if self.idle_left <= 0:
+                if self.gcode_state != 'IDLE':
+                    self.gcode_state = 'IDLE'
+                    self.idle_left = self.rng.uniform(10, 60)
+                else:
+                    self._start_job()
+        elif self.gcode_state == 'PREPARE':
+            if abs(self.nozzle - self.nozzle_target) < 2 and abs(self.bed - self.bed_target) < 1:
+                self.gcode_state = 'RUNNING'
+        elif self.gcode_state == 'RUNNING':
+            self.job_elapsed = min(self.job_elapsed + dt, self.job_duration)
+            fraction = self.job_elapsed / self.job_duration
+            self.percent = int(fraction * 100)
+            self.layer = max(1, int(fraction * self.total_layers))
+            self.remaining = math.ceil((self.job_duration - self.job_elapsed) / 60)
+            if self.job_elapsed >= self.job_duration:
+                self._end_job('FINISH')
+
+        # Temperaturen nähern sich Ziel bzw. Umgebung, am Ziel leichtes Rauschen
+        self.nozzle = self._approach(self.nozzle, self.nozzle_target or AMBIENT, 25, dt)
+        self.bed = self._approach(self.bed, self.bed_target or AMBIENT, 80, dt)
+        self.chamber = self._approach(self.chamber, AMBIENT + (self.bed - AMBIENT) * 0.2, 300, dt)
+        if self.nozzle_target and abs(self.nozzle - self.nozzle_target) < 2:
+            self.nozzle += self.rng.uniform(-0.5, 0.5)
+
+    def fields(self) -> dict:
+        active = self.gcode_state in ('PREPARE', 'RUNNING', 'PAUSE')
+        return {
+            'gcode_state': self.gcode_state,
+            'nozzle_temper': round(self.nozzle, 1),
+            'nozzle_target_temper': self.nozzle_target,
+            'bed_temper': round(self.bed, 1),
+            'bed_target_temper': self.bed_target,
+            'chamber_temper': int(self.chamber),
+            'mc_percent': self.percent,
+            'mc_remaining_time': self.remaining,
+            'layer_num': self.layer,
+            'total_layer_num': self.total_layers,
+            'mc_print_stage': '2' if self.gcode_state == 'RUNNING' else '1',
+            'subtask_name': self.subtask_name if active or self.gcode_state == 'FINISH' else '',
+            'gcode_file': '/data/Metadata/plate_1.gcode' if active else '',
+        }
+
+    def report(self):
+        """Inkrementeller push_status mit den geänderten Feldern oder None"""
+        fields = self.fields()
+        changed = {key: value for key, value in fields.items() if self._reported.get(key) != value}
+        if not changed:
+            return None
+        self._reported = fields
+        return {'print': {**changed, 'command': 'push_status', 'msg': 1, 'sequence_id': self._next_sequence()}}
+
+    def full_report(self) -> dict:
+        """Vollständiger Status wie nach pushall"""
+        payload = copy.deepcopy(self.template)
+        fields = self.fields()
+        payload['print'].update(fields)
+        payload['print'].update({'msg': 0, 'sequence_id': self._next_sequence()})
+        self._reported = fields
+        return payload
+
+    def handle_request(self, request: dict) -> list:
+        """Beantwortet eine Nachricht auf device/<serial>/request, liefert die zu veröffentlichenden Reports"""
+        pushing = request.get('pushing') or {}
+        if pushing.get('command') == 'pushall':
+            return [self.full_report()]
+
+        info = request.get('info') or {}
+        if info.get('command') == 'get_version':
+            return [{'info': {
+                'command': 'get_version', 'sequence_id': info.get('sequence_id', '0'),
+                'module': [{'name': 'ota', 'project_name': 'C11', 'sw_ver': '01.07.00.00', 'hw_ver': 'OTA',
+                            'sn': self.serial}],
+                'result': 'success', 'reason': ''
+            }}]
+
+        command = (request.get('print') or {}).get('command')
+        if command not in ('stop', 'pause', 'resume'):
+            return []
+        if command == 'stop' and self.gcode_state in ('PREPARE', 'RUNNING', 'PAUSE'):
+            self._end_job('FAILED')
+        elif command == 'pause' and self.gcode_state in ('PREPARE', 'RUNNING'):
+            self.gcode_state = 'PAUSE'
+        elif command == 'resume' and self.gcode_state == 'PAUSE':
+            self.gcode_state = 'RUNNING'
+        response = {'print': {
+            'command': command, 'param': request['print'].get('param', ''), 'result': 'success', 'reason': 'success',
+            'sequence_id': request['print'].get('sequence_id', '0')
+        }}
+        update = self.report()
+        return [response] + ([update] if update else [])
+
+
+def _encode_length(length: int) -> bytes:
+    encoded = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        encoded.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(encoded)
+
+
+def _packet(packet_type: int, body: bytes, flags: int = 0) -> bytes:
+    return bytes((packet_type << 4 | flags,)) + _encode_length(len(body)) + body
+
+
+def encode_publish(topic: str, payload: bytes) -> bytes:
+    """PUBLISH mit QoS 0"""
+    topic = topic.encode('utf-8')
+    return _packet(PUBLISH, struct.pack('!H', len(topic)) + topic + payload)
+
+
+def _read_string(body: bytes, offset: int) -> tuple:
+    length = struct.unpack_from('!H', body, offset)[0]
+    return body[offset + 2:offset + 2 + length], offset + 2 + length
+
+
+async def read_packet(reader) -> tuple:
+    """Liest ein MQTT-Paket, liefert (typ, flags, body)"""
+    header = (await reader.readexactly(1))[0]
+    length = 0
+    for shift in range(0, 28, 7):
+        byte = (await reader.readexactly(1))[0]
+        length |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            break
+    else:
+        raise ValueError("Malformed remaining length")
+    body = await reader.readexactly(length) if length else b''
+    return header >> 4, header & 0x0F, body
+
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    filter_parts = topic_filter.split('/')
+    topic_parts = topic.split('/')
+    for index, part in enumerate(filter_parts):
+        if part == '#':
+            return True
+        if index >= len(topic_parts) or part not in ('+', topic_parts[index]):
+            return False
+    return len(filter_parts) == len(topic_parts)
+
+
+class MQTTEndpoint:
+    """MQTT-Broker eines simulierten Druckers (nur was die Bambu Clients benötigen)"""
+
+    def __init__(self, printer: SimulatedPrinter, ssl_context, port: int = MQTT_PORT, max_buffer: int = 1 << 20):
+        self.printer = printer
+        self.ssl_context = ssl_context
+        self.port = port
+        self.max_buffer = max_buffer
+        self.report_topic = f"device/{printer.serial}/report"
+        self.request_topic = f"device/{printer.serial}/request"
+        self.sessions = {}  # writer -> Topic-Filter
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle_client, self.printer.ip, self.port, ssl=self.ssl_context)
+
+    def publish(self, payload: dict):
+        packet = encode_publish(self.report_topic, json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+        for writer, filters in list(self.sessions.items()):
+            if not any(topic_matches(topic_filter, self.report_topic) for topic_filter in filters):
+                continue
+            if writer.transport.get_write_buffer_size() > self.max_buffer:
+                logger.warning(f"{self.printer.serial}: dropping slow MQTT client")
+                writer.close()
+                self.sessions.pop(writer, None)
+                continue
+            writer.write(packet)
+
+    def _check_connect(self, body: bytes) -> tuple:
+        """Prüft CONNECT, liefert (return code, keepalive)"""
+        _, offset = _read_string(body, 0)
+        level, flags, keepalive = struct.unpack_from('!BBH', body, offset)
+        if level not in (3, 4):
+            return CONNACK_BAD_PROTOCOL, keepalive
+        offset += 4
+        _, offset = _read_string(body, offset)  # Client-ID
+        if flags & 0x04:  # Will Topic und Message überspringen
+            _, offset = _read_string(body, offset)
+            _, offset = _read_string(body, offset)
+        username = password = b''
+        if flags & 0x80:
+            username, offset = _read_string(body, offset)
+        if flags & 0x40:
+            password, offset = _read_string(body, offset)
+        if username.decode('utf-8', 'replace') != USERNAME or password.decode('utf-8', 'replace') != self.printer.access_code:
+            return CONNACK_BAD_CREDENTIALS, keepalive
+        return CONNACK_ACCEPTED, keepalive
+
+    def _handle_publish(self, writer, flags: int, body: bytes):
+        topic, offset = _read_string(body, 0)
+        qos = (flags >> 1) & 0x03
+        if qos:
+            packet_id = body[offset:offset + 2]
+            offset += 2
+            writer.write(_packet(PUBACK, packet_id))
+        if topic.decode('utf-8', 'replace') != self.request_topic:
+            return
+        try:
+            request = json.loads(body[offset:])
+        except ValueError:
+            logger.warning(f"{self.printer.serial}: invalid request payload")
+            return
+        for payload in self.printer.handle_request(request):
+            self.publish(payload)
+
+    def _handle_subscribe(self, writer, body: bytes) -> list:
+        packet_id = body[:2]
+        offset = 2
+        filters = []
+        while offset < len(body):
+            topic_filter, offset = _read_string(body, offset)
+            offset += 1  # angeforderte QoS, gewährt wird immer 0
+            filters.append(topic_filter.decode('utf-8', 'replace'))
+        writer.write(_packet(SUBACK, packet_id + bytes(len(filters))))
+        return filters
+
+    async def _handle_client(self, reader, writer):
+        try:
+            packet_type, _, body = await read_packet(reader)
+            if packet_type != CONNECT:
+                return
+            return_code, keepalive = self._check_connect(body)
+            writer.write(_packet(CONNACK, bytes((0, return_code))))
+            await writer.drain()
+            if return_code != CONNACK_ACCEPTED:
+                return
+
+            filters = self.sessions[writer] = []
+            timeout = keepalive * 1.5 if keepalive else None
+            while True:
+                packet_type, flags, body = await asyncio.wait_for(read_packet(reader), timeout)
+                if packet_type == PUBLISH:
+                    self._handle_publish(writer, flags, body)
+                elif packet_type == SUBSCRIBE:
+                    filters.extend(self._handle_subscribe(writer, body))
+                elif packet_type == UNSUBSCRIBE:
+                    offset = 2
+                    while offset < len(body):
+                        topic_filter, offset = _read_string(body, offset)
+                        if topic_filter.decode('utf-8', 'replace') in filters:
+                            filters.remove(topic_filter.decode('utf-8', 'replace'))
+                    writer.write(_packet(UNSUBACK, body[:2]))
+                elif packet_type == PINGREQ:
+                    writer.write(_packet(PINGRESP, b''))
+                elif packet_type == DISCONNECT:
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError, ssl.SSLError, ValueError, struct.error):
+            pass
+        finally:
+            self.sessions.pop(writer, None)
+            writer.close()
+
+
+class PrinterFarm:
+    """Startet alle simulierten Drucker und treibt deren Reports an"""
+
+    def __init__(self, count: int, base_ip: str, access_code: str, interval: float = 1.0, speed: float = 1.0,
+                 mqtt_port: int = MQTT_PORT, rtsp: bool = False, rtsp_port: int = RTSP_PORT, cert_dir: str = None):
+        self.interval = interval
+        self.mqtt_port = mqtt_port
+        self.rtsp = rtsp
+        self.rtsp_port = rtsp_port
+        self.cert_dir = cert_dir or tempfile.mkdtemp(prefix='bambucam-sim-')
+        template = _load_pushall_template()
+        first = ipaddress.ip_address(base_ip)
+        self.printers = [
+            SimulatedPrinter(f"01S00C{index:09d}", str(first + index), access_code, speed, template)
+            for index in range(count)
+        ]
+        self.endpoints = []
+        self.video_source = None
+        self.cameras = []
+
+    def manifest(self) -> list:
+        return [
+            {'serial': printer.serial, 'ip': printer.ip, 'accessCode': printer.access_code,
+             'mqttPort': self.mqtt_port,
+             'streamUrl': f"rtsps://{USERNAME}:{printer.access_code}@{printer.ip}:{self.rtsp_port}/streaming/live/1"}
+            for printer in self.printers
+        ]
+
+    async def start(self):
+        ssl_contexts = {printer.serial: make_ssl_context(self.cert_dir, printer.serial) for printer in self.printers}
+        for printer in self.printers:
+            endpoint = MQTTEndpoint(printer, ssl_contexts[printer.serial], self.mqtt_port)
+            await endpoint.start()
+            self.endpoints.append(endpoint)
+        logger.info(f"Started {len(self.printers)} simulated printers "
+                    f"({self.printers[0].ip} - {self.printers[-1].ip}, port {self.mqtt_port})")
+
+        if self.rtsp:
+            if not H264TestSource.available():
+                logger.error("ffmpeg not found, RTSP stand-in disabled")
+                return
+            self.video_source = H264TestSource()
+            asyncio.ensure_future(self.video_source.run())
+            for printer in self.printers:
+                camera = RTSPEndpoint(self.video_source, printer.ip, self.rtsp_port, printer.access_code,
+                                      ssl_contexts[printer.serial])
+                await camera.start()
+                self.cameras.append(camera)
+            logger.info(f"RTSP stand-in listening on port {self.rtsp_port}")
+
+    async def _drive(self, endpoint: MQTTEndpoint):
+        # Versetzter Start, damit nicht alle Drucker im selben Moment senden
+        await asyncio.sleep(random.uniform(0, self.interval))
+        last = time.monotonic()
+        while True:
+            now = time.monotonic()
+            endpoint.printer.tick(now - last)
+            last = now
+            report = endpoint.printer.report()
+            if report is not None:
+                endpoint.publish(report)
+            await asyncio.sleep(self.interval)
+
+
+def register_printers(api_url: str, manifest: list):
+    """Legt die simulierten Drucker über POST /api/printers im Backend an (addPrinter)"""
+    import requests
+
+    for index, printer in enumerate(manifest):
+        try:
+            response = requests.post(f"{api_url.rstrip('/')}/api/printers", json={
+                'name': f"Sim {index + 1:03d}", 'ip': printer['ip'], 'accessCode': printer['accessCode'],
+                'type': 'BAMBULAB'
+            }, timeout=30)
+            if not response.ok:
+                logger.error(f"Registering {printer['ip']} failed: {response.status_code} {response.text[:200]}")
+        except Exception as e:
+            logger.error(f"Registering {printer['ip']} failed: {e}")
+    logger.info(f"Registered {len(manifest)} printers at {api_url}")
+
+
+async def _main(args):
+    farm = PrinterFarm(args.printers, args.base_ip, args.access_code, args.interval, args.speed,
+                       args.mqtt_port, args.rtsp, args.rtsp_port, args.cert_dir)
+    await farm.start()
+    manifest = farm.manifest()
+    if args.manifest:
+        with open(args.manifest, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        logger.info(f"Wrote manifest to {args.manifest}")
+    if args.register:
+        await asyncio.get_running_loop().run_in_executor(None, register_printers, args.register, manifest)
+    await asyncio.gather(*(farm._drive(endpoint) for endpoint in farm.endpoints))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate Bambu Lab printers (MQTT over TLS, optional RTSP)")
+    parser.add_argument('--printers', type=int, default=10, help="number of simulated printers")
+    parser.add_argument('--base-ip', default='127.0.1.1', help="address of the first printer, incremented per printer")
+    parser.add_argument('--access-code', default='12345678', help="access code (MQTT password) of all printers")
+    parser.add_argument('--interval', type=float, default=1.0, help="seconds between incremental reports")
+    parser.add_argument('--speed', type=float, default=1.0, help="simulation time factor (10 = ten times faster)")
+    parser.add_argument('--mqtt-port', type=int, default=MQTT_PORT)
+    parser.add_argument('--rtsp', action='store_true', help="serve a generated RTSPS test feed (needs ffmpeg)")
+    parser.add_argument('--rtsp-port', type=int, default=RTSP_PORT, help="ports below 1024 need root or CAP_NET_BIND_SERVICE")
+    parser.add_argument('--cert-dir', help="directory for the self-signed certificate (default: temporary)")
+    parser.add_argument('--manifest', help="write printer list (ip, serial, access code) as JSON")
+    parser.add_argument('--register', metavar='API_URL', help="add all printers to a running backend, e.g. http://localhost:4000")
+    parser.add_argument('--log-level', default='INFO')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=getattr(logging, args.log_level.upper()),
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
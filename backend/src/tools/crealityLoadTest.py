@@ -0,0 +1,239 @@
+"""
+Lasttest des Creality/Moonraker-Pollings gegen den lokalen Simulator.
+
+Startet src.tools.moonrakerSimulator als eigenen Prozess, registriert für jede
+Stufe N Creality-Drucker (temporäres Datenverzeichnis) und startet das Polling
+über printer_service.connect_printer, wie beim Hinzufügen eines Druckers.
+Gemessen werden pro Stufe:
+
+- CPU-Auslastung des Backend-Prozesses (process_time / Wandzeit)
+- Anzahl Threads (Spitze)
+- Aktualisierungen pro Sekunde (Status-Events)
+- neu aufgebaute TCP-Verbindungen zu Moonraker, HTTP-Abfragen pro Sekunde
+  und Drucker mit aktivem WebSocket-Abo am Ende der Stufe
+- Veraltung je Drucker: Zeit seit der letzten Änderung des Live-Status,
+  einmal pro Sekunde für alle Drucker abgetastet (p50/p95/max)
+- Drucker, die am Ende der Stufe nicht online sind
+
+Der Simulator rauscht die Temperaturen bei jeder Abfrage, jede erfolgreiche
+Abfrage ändert also den Status. Fehlerbilder (Latenz, Fehler, Hänger, stumme
+Drucker) werden an den Simulator durchgereicht.
+
+Aufruf aus backend/:
+    python -m src.tools.crealityLoadTest --printers 1,10,50,100 --duration 30
+    python -m src.tools.crealityLoadTest --printers 100 --latency 150 --jitter 50 --hang-rate 0.02 --offline 5 --json
+    python -m src.tools.crealityLoadTest --printers 100 --poll-only
+    python -m src.tools.crealityLoadTest --printers 100 --ws-drop-rate 0.05
+"""
+import argparse
+import ipaddress
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from .ingestBenchmark import _configure_logging, _percentile
+from .moonrakerSimulator import add_fault_arguments
+
+
+def start_simulator(args, count: int) -> subprocess.Popen:
+    """Startet den Simulator mit count Druckern und wartet auf seine Bereitschaft"""
+    command = [
+        sys.executable, '-m', 'src.tools.moonrakerSimulator',
+        '--printers', str(count), '--base-ip', args.base_ip, '--no-mjpeg', '--log-level', 'WARNING',
+        '--latency', str(args.latency), '--jitter', str(args.jitter),
+        '--error-rate', str(args.error_rate), '--hang-rate', str(args.hang_rate),
+        '--hang-seconds', str(args.hang_seconds), '--offline', str(args.offline),
+        '--ws-drop-rate', str(args.ws_drop_rate),
+    ]
+    if args.no_websocket:
+        command.append('--no-websocket')
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True,
+                               cwd=Path(__file__).resolve().parents[2])
+    line = process.stdout.readline()
+    if line.strip() != 'READY':
+        process.kill()
+        raise RuntimeError(f"Simulator did not start (exit code {process.poll()})")
+    return process
+
+
+def _printer_id(index: int) -> str:
+    return f"load-{index}"
+
+
+def start_printers(ips: list):
+    from src.services.printerRegistry import printer_registry
+    from src.services.printerService import printer_service
+
+    for index, ip in enumerate(ips):
+        printer_registry.save({'id': _printer_id(index), 'name': f"Load {index}", 'type': 'CREALITY',
+                               'ip': ip, 'accessCode': '', 'streamUrl': f"http://{ip}:8080/?action=stream"})
+        printer_service.connect_printer(_printer_id(index), 'CREALITY', ip)
+
+
+def stop_printers(count: int):
+    """Beendet das Polling und verwirft Status, Verlauf und Registrierung der Testdrucker"""
+    from src.services.printerRegistry import printer_registry
+    from src.services.printerService import printer_service
+    from src.services.statusEvents import status_events
+    from src.services.statusStore import status_store
+    from src.services.telemetryHistory import telemetry_history
+
+    for index in range(count):
+        printer_service.cleanup(_printer_id(index))
+    # Laufende Abfragen enden spätestens mit ihrem Timeout
+    time.sleep(printer_service.creality_poller.timeout)
+    for index in range(count):
+        status_store.discard(_printer_id(index))
+        status_events.remove(_printer_id(index))
+        telemetry_history.remove(_printer_id(index))
+        printer_registry.remove(_printer_id(index))
+
+
+class UpdateCounter:
+    """Zählt Status-Events der Testdrucker (Listener des status_events-Bus)"""
+
+    def __init__(self):
+        self.count = 0
+        self.active = False
+
+    def __call__(self, event):
+        if self.active and event['printerId'].startswith('load-'):
+            self.count += 1
+
+
+def _connections_opened() -> int:
+    from src.services.moonrakerPoller import moonraker_poller
+    return moonraker_poller.client.connections_opened if moonraker_poller.client else 0
+
+
+def _http_polls() -> float:
+    from src.services.metrics import MOONRAKER_POLLS
+    return sum(MOONRAKER_POLLS.value(result) for result in ('ok', 'error', 'http_error'))
+
+
+def run_step(ips: list, duration: float, warmup: float, counter: UpdateCounter) -> dict:
+    from src.services.moonrakerPoller import moonraker_poller
+    from src.services.statusStore import status_store
+
+    count = len(ips)
+    step_started = time.time()
+    start_printers(ips)
+    time.sleep(warmup)
+
+    counter.count = 0
+    counter.active = True
+    connections_started = _connections_opened()
+    polls_started = _http_polls()
+    staleness = []
+    peak_threads = threading.active_count()
+    wall_started = time.monotonic()
+    cpu_started = time.process_time()
+    while time.monotonic() - wall_started < duration:
+        time.sleep(1.0)
+        now = time.time()
+        for index in range(count):
+            state = status_store.get_state(_printer_id(index))
+            # Ohne jedes Update gilt der Drucker seit Start der Stufe als veraltet
+            updated_at = state.updated_at if state is not None and state.updated_at else step_started
+            staleness.append(now - updated_at)
+        peak_threads = max(peak_threads, threading.active_count())
+    elapsed = time.monotonic() - wall_started
+    cpu = time.process_time() - cpu_started
+    counter.active = False
+    connections = _connections_opened() - connections_started
+    polls = _http_polls() - polls_started
+    subscribed = moonraker_poller.subscribed_count()
+
+    # Fehlerstatus (Timeout, Verbindungsfehler) zählt nicht als erreichbar
+    unreachable = 0
+    for index in range(count):
+        state = status_store.get_state(_printer_id(index))
+        if state is None or state.status != 'online':
+            unreachable += 1
+    stop_printers(count)
+
+    staleness.sort()
+    return {
+        'printers': count,
+        'duration_s': round(elapsed, 1),
+        'cpu_percent': round(cpu / elapsed * 100, 1),
+        'threads_peak': peak_threads,
+        'updates_per_sec': round(counter.count / elapsed, 1),
+        'connections_opened': connections,
+        'http_polls_per_sec': round(polls / elapsed, 1),
+        'subscribed': subscribed,
+        'staleness_p50_s': round(_percentile(staleness, 50), 2),
+        'staleness_p95_s': round(_percentile(staleness, 95), 2),
+        'staleness_max_s': round(staleness[-1], 2),
+        'unreachable': unreachable,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test Creality polling against simulated Moonraker printers")
+    parser.add_argument('--printers', default='1,10,50,100', help="comma-separated printer counts")
+    parser.add_argument('--duration', type=float, default=30.0, help="measured seconds per step")
+    parser.add_argument('--warmup', type=float, default=5.0, help="seconds between starting the pollers and measuring")
+    parser.add_argument('--base-ip', default='127.0.2.1', help="address of the first simulated printer")
+    parser.add_argument('--log-level', default='CRITICAL', help="backend log level during the run")
+    parser.add_argument('--poll-only', action='store_true', help="disable the WebSocket subscription (HTTP polling only)")
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    add_fault_arguments(parser)
+    args = parser.parse_args(argv)
+
+    printer_counts = [int(count) for count in args.printers.split(',')]
+    if args.offline >= min(printer_counts):
+        parser.error("--offline must be smaller than the smallest printer count")
+
+    # Eigenes Datenverzeichnis, damit weder Drucker noch Telemetrie der echten Installation berührt werden
+    work_dir = tempfile.mkdtemp(prefix='bambucam-load-')
+    os.environ['TELEMETRY_DB'] = os.path.join(work_dir, 'telemetry.db')
+    _configure_logging(args.log_level)
+    from src.services.printerRegistry import printer_registry
+    printer_registry.printers_dir = Path(work_dir) / 'printers'
+    from src.services.printerService import printer_service
+    _configure_logging(args.log_level)
+    if args.poll_only:
+        printer_service.creality_poller.subscribe = False
+
+    # Stumme Drucker liegen am Ende des Simulator-Bereichs und sind in jeder Stufe dabei
+    total = max(printer_counts)
+    first = ipaddress.ip_address(args.base_ip)
+    all_ips = [str(first + index) for index in range(total)]
+
+    from src.services.statusEvents import status_events
+    counter = UpdateCounter()
+    status_events.add_listener(counter)
+
+    simulator = start_simulator(args, total)
+    results = []
+    try:
+        for count in printer_counts:
+            ips = all_ips[:count - args.offline] + all_ips[total - args.offline:]
+            result = run_step(ips, args.duration, args.warmup, counter)
+            results.append(result)
+            if not args.json:
+                print(f"{result['printers']:>5} printers  cpu {result['cpu_percent']:>6.1f}%  "
+                      f"threads {result['threads_peak']:>5}  {result['updates_per_sec']:>8.1f} updates/s  "
+                      f"connections {result['connections_opened']:>5}  polls {result['http_polls_per_sec']:>6.1f}/s  "
+                      f"subscribed {result['subscribed']:>4}  "
+                      f"stale p50 {result['staleness_p50_s']:>6.2f}s  p95 {result['staleness_p95_s']:>6.2f}s  "
+                      f"max {result['staleness_max_s']:>6.2f}s  unreachable {result['unreachable']}",
+                      flush=True)
+    finally:
+        simulator.terminate()
+        simulator.wait(timeout=10)
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+"""
+Benchmark der MQTT-Ingest-Pfade mit aufgezeichneten Payloads.
+
+Spielt Bambu device/<serial>/report Nachrichten (pushall + inkrementell) und
+OctoPrint MQTT-Topics direkt in MQTTService._on_message,
+BambuCloudService.on_mqtt_message und OctoPrintService._on_message ein, ohne
+Broker und ohne Netzwerk. Gemessen werden Nachrichten/s, p50/p99 der
+Verarbeitungszeit sowie Speicher-Allokationen je Nachricht.
+
+Python bietet keinen Zähler für einzelne Allokationen, deshalb werden per
+tracemalloc in einem separaten Durchlauf die Spitzen-Allokation (Bytes, die
+während einer Nachricht zusätzlich belegt werden) und der dauerhaft
+verbleibende Speicher je Nachricht ermittelt.
+
+Aufruf aus backend/:
+    python -m src.tools.ingestBenchmark --printers 1,10,100,1000 --messages 20000
+    python -m src.tools.ingestBenchmark --backends bambulab --payloads capture.jsonl --json
+
+Eigene Aufzeichnungen sind JSONL-Dateien mit {"topic": ..., "payload": ...} je
+Zeile, {serial} im Topic wird je simuliertem Drucker ersetzt.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+PAYLOAD_DIR = Path(__file__).parent / 'payloads'
+DEFAULT_PAYLOADS = {
+    'bambulab': PAYLOAD_DIR / 'bambu_report.jsonl',
+    'cloud': PAYLOAD_DIR / 'bambu_report.jsonl',
+    'octoprint': PAYLOAD_DIR / 'octoprint.jsonl',
+}
+BACKENDS = tuple(DEFAULT_PAYLOADS)
+
+
+def load_payloads(path) -> list:
+    """Liest eine Aufzeichnung als Liste von (topic, payload-bytes)"""
+    messages = []
+    with open(path, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            payload = entry['payload']
+            if not isinstance(payload, str):
+                payload = json.dumps(payload, separators=(',', ':'))
+            messages.append((entry['topic'], payload.encode('utf-8')))
+    return messages
+
+
+def _serial(index: int) -> str:
+    return f"01S00A{index:09d}"
+
+
+def build_messages(recording: list, printers: int, total: int) -> list:
+    """
+    Verschachtelt die Aufzeichnung über alle Drucker: Nachricht k geht an Drucker
+    k % printers, jeder Drucker läuft seine Aufzeichnung der Reihe nach durch.
+    """
+    import paho.mqtt.client as mqtt
+
+    messages = []
+    for k in range(total):
+        index = k % printers
+        topic, payload = recording[(k // printers) % len(recording)]
+        message = mqtt.MQTTMessage(topic=topic.replace('{serial}', _serial(index)).encode('utf-8'))
+        message.payload = payload
+        messages.append((f"bench-{index}", message))
+    return messages
+
+
+def make_handler(backend: str, printers: int):
+    """Frische Service-Instanz und eine Funktion (printer_id, msg) -> None für den Ingest-Pfad"""
+    from src.services.printerRegistry import printer_registry
+    from src.services.printerState import PrinterState
+
+    if backend == 'bambulab':
+        from src.services.mqttService import MQTTService
+        service = MQTTService()
+        return lambda printer_id, msg: service._on_message(None, None, msg, printer_id)
+
+    if backend == 'cloud':
+        from src.services.bambuCloudService import BambuCloudService
+        service = BambuCloudService()
+        # Cloud-Status wird nur für lokal registrierte Drucker gepusht
+        for index in range(printers):
+            if not printer_registry.contains(f"bench-{index}"):
+                printer_registry.save({'id': f"bench-{index}", 'name': f"Bench {index}",
+                                       'type': 'CLOUD', 'cloudId': _serial(index)})
+        return lambda printer_id, msg: service.on_mqtt_message(None, None, msg)
+
+    if backend == 'octoprint':
+        from src.services.octoprintService import OctoPrintService
+        service = OctoPrintService()
+        for index in range(printers):
+            printer_id = f"bench-{index}"
+            service.printers[printer_id] = {'name': f"Bench {index}",
+                                            'state': PrinterState(printer_id, 'OCTOPRINT', name=f"Bench {index}")}
+        return lambda printer_id, msg: service._on_message(None, None, msg, printer_id)
+
+    raise ValueError(f"Unknown backend: {backend}")
+
+
+def _percentile(values: list, percent: float) -> float:
+    return values[min(int(len(values) * percent / 100), len(values) - 1)]
+
+
+def run_case(backend: str, recording: list, printers: int, total: int, alloc_messages: int) -> dict:
+    messages = build_messages(recording, printers, total)
+
+    # Zeitmessung ohne tracemalloc
+    handle = make_handler(backend, printers)
+    latencies = []
+    started = time.perf_counter()
+    for printer_id, message in messages:
+        before = time.perf_counter()
+        handle(printer_id, message)
+        latencies.append(time.perf_counter() - before)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    # Allokationen in einem eigenen Durchlauf mit frischer Instanz
+    handle = make_handler(backend, printers)
+    sample = messages[:alloc_messages]
+    peaks = []
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for printer_id, message in sample:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        handle(printer_id, message)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    return {
+        'backend': backend,
+        'printers': printers,
+        'messages': total,
+        'msgs_per_sec': round(total / elapsed, 1),
+        'p50_us': round(_percentile(latencies, 50) * 1e6, 1),
+        'p99_us': round(_percentile(latencies, 99) * 1e6, 1),
+        'alloc_peak_bytes_per_msg': round(sum(peaks) / len(peaks)) if peaks else 0,
+        'retained_bytes_per_msg': round(retained / len(sample)) if sample else 0,
+    }
+
+
+def _cleanup(printers: int):
+    """Verwirft Status und Verlauf der simulierten Drucker zwischen zwei Läufen"""
+    from src.services.statusEvents import status_events
+    from src.services.telemetryHistory import telemetry_history
+
+    for index in range(printers):
+        status_events.remove(f"bench-{index}")
+        telemetry_history.remove(f"bench-{index}")
+
+
+def _configure_logging(level: str):
+    """Logs gehen ins Leere, werden aber je nach Level trotzdem formatiert (DEBUG-Kosten messbar)"""
+    numeric = getattr(logging, level.upper())
+    root = logging.getLogger()
+    root.handlers = [logging.StreamHandler(open(os.devnull, 'w'))]
+    root.setLevel(numeric)
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith('src'):
+            logging.getLogger(name).setLevel(numeric)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the MQTT ingest paths with recorded payloads")
+    parser.add_argument('--backends', default=','.join(BACKENDS),
+                        help=f"comma-separated subset of {', '.join(BACKENDS)}")
+    parser.add_argument('--printers', default='1,10,100,1000', help="comma-separated printer counts")
+    parser.add_argument('--messages', type=int, default=20000, help="messages per run")
+    parser.add_argument('--alloc-messages', type=int, default=2000, help="messages traced with tracemalloc per run")
+    parser.add_argument('--payloads', help="JSONL recording to replay instead of the bundled payloads")
+    parser.add_argument('--log-level', default='WARNING', help="log level during the run (DEBUG includes payload logging)")
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    backends = [backend.strip() for backend in args.backends.split(',') if backend.strip()]
+    unknown = [backend for backend in backends if backend not in BACKENDS]
+    if unknown:
+        parser.error(f"unknown backends: {unknown}")
+    printer_counts = [int(count) for count in args.printers.split(',')]
+
+    # Eigenes Datenverzeichnis, damit weder Drucker noch Telemetrie der echten Installation berührt werden.
+    # Es wird mit allen Dateien (auch der SQLite-Datenbank) am Ende wieder gelöscht.
+    with tempfile.TemporaryDirectory(prefix='bambucam-bench-') as work_dir:
+        os.environ['TELEMETRY_DB'] = os.path.join(work_dir, 'telemetry.db')
+        _configure_logging(args.log_level)
+        from src.services.printerRegistry import printer_registry
+        from src.services.telemetryHistory import telemetry_history
+        printer_registry.printers_dir = Path(work_dir) / 'printers'
+        # Beim Import setzt config.py eigene Level für einzelne Logger, daher erneut
+        _configure_logging(args.log_level)
+
+        results = []
+        try:
+            for backend in backends:
+                recording = load_payloads(args.payloads or DEFAULT_PAYLOADS[backend])
+                for printers in printer_counts:
+                    result = run_case(backend, recording, printers, args.messages,
+                                      min(args.alloc_messages, args.messages))
+                    _cleanup(printers)
+                    results.append(result)
+                    if not args.json:
+                        print(f"{result['backend']:<10} {result['printers']:>6} printers  "
+                              f"{result['msgs_per_sec']:>10.1f} msg/s  "
+                              f"p50 {result['p50_us']:>8.1f} µs  p99 {result['p99_us']:>8.1f} µs  "
+                              f"alloc {result['alloc_peak_bytes_per_msg']:>7} B/msg  "
+                              f"retained {result['retained_bytes_per_msg']:>6} B/msg",
+                              flush=True)
+        finally:
+            # Writer-Thread beenden, bevor das Verzeichnis samt Datenbank gelöscht wird
+            if telemetry_history.store is not None:
+                telemetry_history.store.stop()
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    return results
+
+
+if __name__ == '__main__':
+    main()
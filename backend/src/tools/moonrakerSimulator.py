@@ -0,0 +1,585 @@
+"""
+Lokaler Simulator für Creality/Klipper Drucker: Moonraker (:7125) und
+mjpg-streamer (:8080) für N Drucker auf eigenen Loopback-Adressen
+(127.0.2.1, 127.0.2.2, ...).
+
+Moonraker:
+    GET/POST /printer/objects/query   (Query-String oder {"objects": {...}})
+    GET      /printer/info, /server/info
+    POST     /printer/api (JSON-RPC emergency_stop), /printer/emergency_stop,
+             /printer/print/cancel|pause|resume
+    WS       /websocket (JSON-RPC: printer.objects.subscribe mit
+             notify_status_update alle 250 ms, printer.objects.query, ...)
+mjpg-streamer:
+    GET /?action=stream (multipart/x-mixed-replace), /?action=snapshot
+
+Fehlerbilder sind einstellbar: Latenz (+ Jitter), Fehlerrate (HTTP 500),
+Hänger (Verbindung bleibt ohne Antwort offen) und komplett stumme Drucker
+(--offline, nehmen Verbindungen an und antworten nie). Für die WebSocket-API
+lassen sich abreißende Verbindungen (--ws-drop-rate, je Sekunde) oder ein
+Moonraker ohne WebSocket (--no-websocket, Upgrade wird mit 404 abgelehnt)
+simulieren.
+
+Aufruf aus backend/:
+    python -m src.tools.moonrakerSimulator --printers 50
+    python -m src.tools.moonrakerSimulator --printers 50 --latency 80 --jitter 40 --error-rate 0.02 --hang-rate 0.01 --offline 2
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import ipaddress
+import json
+import logging
+import random
+import struct
+import time
+from urllib.parse import urlsplit, parse_qsl
+
+from .bambuSimulator import SimulatedPrinter
+
+logger = logging.getLogger(__name__)
+
+MOONRAKER_PORT = 7125
+MJPEG_PORT = 8080
+MJPEG_BOUNDARY = 'boundarydonotcross'
+# Moonraker fasst Statusänderungen für Abonnenten in diesem Takt zusammen
+NOTIFY_INTERVAL = 0.25
+
+_WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+_WS_TEXT, _WS_CLOSE, _WS_PING, _WS_PONG = 0x1, 0x8, 0x9, 0xA
+
+# gcode_state der gemeinsamen Druckphysik -> Klipper print_stats.state
+_KLIPPER_STATES = {
+    'IDLE': 'standby',
+    'PREPARE': 'printing',
+    'RUNNING': 'printing',
+    'PAUSE': 'paused',
+    'FINISH': 'complete',
+    'FAILED': 'cancelled',
+}
+
+_HTTP_REASONS = {101: 'Switching Protocols', 200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+                 500: 'Internal Server Error'}
+
+
+class FaultProfile:
+    """Latenz, Fehler und Hänger eines simulierten Druckers"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 hang_rate: float = 0.0, hang_seconds: float = 30.0, offline: bool = False,
+                 websocket: bool = True, ws_drop_rate: float = 0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.offline = offline
+        self.websocket = websocket
+        self.ws_drop_rate = ws_drop_rate
+        self.rng = random.Random(seed)
+
+    def delay(self) -> float:
+        return max(0.0, self.rng.gauss(self.latency, self.jitter)) if self.jitter else self.latency
+
+    def should_hang(self) -> bool:
+        return self.offline or (self.hang_rate and self.rng.random() < self.hang_rate)
+
+    def should_fail(self) -> bool:
+        return bool(self.error_rate) and self.rng.random() < self.error_rate
+
+    def should_drop(self, seconds: float) -> bool:
+        """Ob eine WebSocket-Verbindung im nächsten Zeitabschnitt abreißt"""
+        return bool(self.ws_drop_rate) and self.rng.random() < self.ws_drop_rate * seconds
+
+
+class KlipperPrinter:
+    """Klipper-Sicht auf die gemeinsame Druckphysik, wird bei jeder Abfrage fortgeschrieben"""
+
+    def __init__(self, name: str, ip: str, speed: float = 1.0):
+        self.name = name
+        self.ip = ip
+        self.physics = SimulatedPrinter(name, ip, '', speed)
+        self.started = time.monotonic()
+        self.last_tick = self.started
+        self.requests = 0
+
+    def advance(self):
+        now = time.monotonic()
+        self.physics.tick(now - self.last_tick)
+        self.last_tick = now
+
+    def objects(self) -> dict:
+        """Alle bekannten Moonraker-Objekte mit aktuellem Stand"""
+        p = self.physics
+        rng = p.rng
+        state = _KLIPPER_STATES[p.gcode_state]
+        printing = state in ('printing', 'paused')
+        elapsed = p.job_elapsed if printing or state == 'complete' else 0.0
+        # Thermistoren rauschen immer ein wenig
+        return {
+            'extruder': {'temperature': round(p.nozzle + rng.uniform(-0.2, 0.2), 2), 'target': float(p.nozzle_target),
+                         'power': 0.45 if p.nozzle_target else 0.0, 'pressure_advance': 0.04},
+            'heater_bed': {'temperature': round(p.bed + rng.uniform(-0.1, 0.1), 2), 'target': float(p.bed_target),
+                           'power': 0.3 if p.bed_target else 0.0},
+            'temperature_sensor chamber_temp': {'temperature': round(p.chamber + rng.uniform(-0.1, 0.1), 2),
+                                                'measured_min_temp': 20.0, 'measured_max_temp': 45.0},
+            'print_stats': {
+                'filename': f"{p.subtask_name}.gcode" if p.subtask_name else '',
+                'total_duration': round(elapsed + 30, 1) if elapsed else 0.0,
+                'print_duration': round(elapsed, 1),
+                'filament_used': round(elapsed * 0.8, 1),
+                'state': state,
+                'message': '',
+                'info': {'total_layer': p.total_layers or None, 'current_layer': p.layer or None},
+            },
+            'virtual_sdcard': {
+                'file_path': f"/usr/data/printer_data/gcodes/{p.subtask_name}.gcode" if printing else None,
+                'progress': round(p.job_elapsed / p.job_duration, 4) if p.job_duration and printing else 0.0,
+                'is_active': state == 'printing',
+                'file_position': int(p.job_elapsed * 1000) if printing else 0,
+                'file_size': int(p.job_duration * 1000) if printing else 0,
+            },
+            'webhooks': {'state': 'ready', 'state_message': 'Printer is ready'},
+        }
+
+    def query(self, requested: dict) -> dict:
+        """Antwort auf printer/objects/query bzw. subscribe; None/leere Attributliste = alle Felder"""
+        self.advance()
+        available = self.objects()
+        status = {}
+        for name, attributes in requested.items():
+            if name not in available:
+                continue
+            values = available[name]
+            status[name] = {key: values[key] for key in attributes if key in values} if attributes else values
+        return {'eventtime': round(time.monotonic() - self.started, 3), 'status': status}
+
+    def command(self, command: str):
+        if command in ('emergency_stop', 'cancel'):
+            self.physics.handle_request({'print': {'command': 'stop'}})
+        elif command in ('pause', 'resume'):
+            self.physics.handle_request({'print': {'command': command}})
+
+
+async def _read_http_request(reader):
+    """Liest eine HTTP/1.1-Anfrage, liefert (method, target, headers, body) oder None bei Verbindungsende"""
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+    lines = head.decode('latin-1').split('\r\n')
+    method, target, _ = lines[0].split(' ', 2)
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    body = await reader.readexactly(length) if length else b''
+    return method, target, headers, body
+
+
+def _http_response(status: int, body: bytes, content_type: str = 'application/json', keep_alive: bool = True) -> bytes:
+    headers = [
+        f"HTTP/1.1 {status} {_HTTP_REASONS.get(status, 'OK')}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    return ('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + body
+
+
+def parse_query_objects(query: str, body: bytes) -> dict:
+    """Objekte aus ?extruder&heater_bed=target,temperature oder JSON-Body {"objects": {...}}"""
+    requested = {}
+    if body:
+        payload = json.loads(body)
+        for name, attributes in (payload.get('objects') or {}).items():
+            requested[name] = list(attributes or [])
+    for name, value in parse_qsl(query, keep_blank_values=True):
+        requested[name] = [attribute for attribute in value.split(',') if attribute]
+    return requested
+
+
+def websocket_accept(key: str) -> str:
+    return base64.b64encode(hashlib.sha1((key + _WEBSOCKET_GUID).encode('latin-1')).digest()).decode()
+
+
+def websocket_frame(opcode: int, data: bytes) -> bytes:
+    """Unmaskierter, nicht fragmentierter Frame (Server -> Client)"""
+    length = len(data)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    return header + data
+
+
+async def read_websocket_frame(reader) -> tuple:
+    """Liest einen Frame (Client-Frames sind maskiert). Gibt (opcode, daten) zurück."""
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack('!H', await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack('!Q', await reader.readexactly(8))[0]
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    data = await reader.readexactly(length)
+    if mask:
+        data = bytes(byte ^ mask[index % 4] for index, byte in enumerate(data))
+    return first & 0x0F, data
+
+
+def changed_fields(previous: dict, current: dict) -> dict:
+    """Geänderte Felder je Objekt, wie in notify_status_update"""
+    changes = {}
+    for name, values in current.items():
+        before = previous.get(name, {})
+        fields = {key: value for key, value in values.items() if before.get(key) != value}
+        if fields:
+            changes[name] = fields
+    return changes
+
+
+class MoonrakerEndpoint:
+    """HTTP-API (Keep-Alive) eines simulierten Moonraker"""
+
+    def __init__(self, printer: KlipperPrinter, faults: FaultProfile, port: int = MOONRAKER_PORT):
+        self.printer = printer
+        self.faults = faults
+        self.port = port
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle_client, self.printer.ip, self.port)
+
+    def _route(self, method: str, target: str, body: bytes) -> tuple:
+        parts = urlsplit(target)
+        path = parts.path.rstrip('/')
+        if path == '/printer/objects/query':
+            return 200, {'result': self.printer.query(parse_query_objects(parts.query, body))}
+        if path == '/printer/objects/list':
+            return 200, {'result': {'objects': list(self.printer.objects())}}
+        if path == '/printer/info':
+            return 200, {'result': {'state': 'ready', 'state_message': 'Printer is ready', 'hostname': self.printer.name,
+                                    'software_version': 'v0.12.0-sim', 'klipper_path': '/usr/share/klipper'}}
+        if path == '/server/info':
+            return 200, {'result': {'klippy_connected': True, 'klippy_state': 'ready', 'components': ['websockets'],
+                                    'moonraker_version': 'v0.8.0-sim'}}
+        if method == 'POST' and path == '/printer/api':
+            rpc = json.loads(body or b'{}')
+            self.printer.command(rpc.get('method', ''))
+            return 200, {'jsonrpc': '2.0', 'result': 'ok', 'id': rpc.get('id')}
+        if method == 'POST' and path == '/printer/emergency_stop':
+            self.printer.command('emergency_stop')
+            return 200, {'result': 'ok'}
+        if method == 'POST' and path.startswith('/printer/print/'):
+            self.printer.command(path.rsplit('/', 1)[-1])
+            return 200, {'result': 'ok'}
+        return 404, {'error': {'code': 404, 'message': 'Not Found'}}
+
+    def _rpc(self, method: str, params: dict):
+        """JSON-RPC über WebSocket, gibt das result zurück (KeyError: unbekannte Methode)"""
+        if method in ('printer.objects.query', 'printer.objects.subscribe'):
+            return self.printer.query({name: list(attributes or []) for name, attributes in
+                                       (params.get('objects') or {}).items()})
+        if method == 'printer.objects.list':
+            return {'objects': list(self.printer.objects())}
+        if method == 'printer.info':
+            return self._route('GET', '/printer/info', b'')[1]['result']
+        if method == 'server.info':
+            return self._route('GET', '/server/info', b'')[1]['result']
+        if method == 'server.connection.identify':
+            return {'connection_id': id(self)}
+        if method in ('printer.emergency_stop', 'printer.print.cancel', 'printer.print.pause', 'printer.print.resume'):
+            self.printer.command(method.rsplit('.', 1)[-1])
+            return 'ok'
+        raise KeyError(method)
+
+    async def _websocket(self, reader, writer, key: str):
+        """JSON-RPC-Sitzung auf /websocket mit Statusabo"""
+        writer.write((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {websocket_accept(key)}\r\n\r\n"
+        ).encode('latin-1'))
+        await writer.drain()
+
+        subscription = {}
+        sent = {}
+
+        def send(payload: dict):
+            writer.write(websocket_frame(_WS_TEXT, json.dumps(payload).encode('utf-8')))
+
+        async def notify():
+            while True:
+                await asyncio.sleep(NOTIFY_INTERVAL)
+                if self.faults.should_drop(NOTIFY_INTERVAL):
+                    # Verbindung ohne Close-Frame kappen
+                    writer.transport.abort()
+                    return
+                if not subscription:
+                    continue
+                current = self.printer.query(subscription)
+                changes = changed_fields(sent, current['status'])
+                if changes:
+                    for name, fields in changes.items():
+                        sent.setdefault(name, {}).update(fields)
+                    send({'jsonrpc': '2.0', 'method': 'notify_status_update',
+                          'params': [changes, current['eventtime']]})
+                    await writer.drain()
+
+        notifier = asyncio.ensure_future(notify())
+        try:
+            while True:
+                opcode, data = await read_websocket_frame(reader)
+                if opcode == _WS_CLOSE:
+                    writer.write(websocket_frame(_WS_CLOSE, data[:2]))
+                    break
+                if opcode == _WS_PING:
+                    writer.write(websocket_frame(_WS_PONG, data))
+                    continue
+                if opcode != _WS_TEXT:
+                    continue
+                self.printer.requests += 1
+                request = json.loads(data)
+                method = request.get('method', '')
+                params = request.get('params') or {}
+                delay = self.faults.delay()
+                if delay:
+                    await asyncio.sleep(delay)
+                try:
+                    result = self._rpc(method, params)
+                except KeyError:
+                    send({'jsonrpc': '2.0', 'error': {'code': -32601, 'message': f"Method not found: {method}"},
+                          'id': request.get('id')})
+                    continue
+                if method == 'printer.objects.subscribe':
+                    # Ein neues Abo ersetzt das bisherige
+                    subscription = {name: list(attributes or []) for name, attributes in
+                                    (params.get('objects') or {}).items()}
+                    sent = {name: dict(values) for name, values in result['status'].items()}
+                send({'jsonrpc': '2.0', 'result': result, 'id': request.get('id')})
+                await writer.drain()
+        finally:
+            notifier.cancel()
+
+    async def _handle_client(self, reader, writer):
+        try:
+            while True:
+                request = await _read_http_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                self.printer.requests += 1
+                if self.faults.should_hang():
+                    # Verbindung offen halten, ohne zu antworten
+                    await asyncio.sleep(self.faults.hang_seconds)
+                    break
+                if urlsplit(target).path == '/websocket' and headers.get('upgrade', '').lower() == 'websocket':
+                    if not self.faults.websocket:
+                        writer.write(_http_response(404, b'{"error": {"code": 404, "message": "Not Found"}}',
+                                                    keep_alive=False))
+                        await writer.drain()
+                        break
+                    await self._websocket(reader, writer, headers.get('sec-websocket-key', ''))
+                    break
+                delay = self.faults.delay()
+                if delay:
+                    await asyncio.sleep(delay)
+                if self.faults.should_fail():
+                    status, payload = 500, {'error': {'code': 500, 'message': 'Simulated internal error'}}
+                else:
+                    try:
+                        status, payload = self._route(method, target, body)
+                    except ValueError:
+                        status, payload = 400, {'error': {'code': 400, 'message': 'Bad request'}}
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(_http_response(status, json.dumps(payload).encode('utf-8'), keep_alive=keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+class TestPattern:
+    """Gemeinsame JPEG-Quelle für alle mjpg-streamer (ein Encoder für die ganze Farm)"""
+
+    def __init__(self, width: int = 640, height: int = 480, fps: int = 10):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.frame = b''
+        self.changed = asyncio.Event()
+
+    def render(self) -> bytes:
+        import cv2
+        import numpy as np
+
+        image = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        bars = np.array([[192, 192, 192], [0, 192, 192], [192, 192, 0], [0, 192, 0],
+                         [192, 0, 192], [0, 0, 192], [192, 0, 0]], dtype=np.uint8)
+        image[:] = bars[(np.arange(self.width) * len(bars) // self.width)][None, :, :]
+        cv2.putText(image, time.strftime('%H:%M:%S') + f".{int(time.time() * 10) % 10}", (20, self.height - 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.5, (255, 255, 255), 3)
+        return cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 70])[1].tobytes()
+
+    async def run(self):
+        while True:
+            self.frame = self.render()
+            self.changed.set()
+            self.changed = asyncio.Event()
+            await asyncio.sleep(1 / self.fps)
+
+
+class MjpegEndpoint:
+    """mjpg-streamer-Ersatz: Stream und Snapshot"""
+
+    def __init__(self, printer: KlipperPrinter, pattern: TestPattern, faults: FaultProfile, port: int = MJPEG_PORT):
+        self.printer = printer
+        self.pattern = pattern
+        self.faults = faults
+        self.port = port
+        self.clients = 0
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle_client, self.printer.ip, self.port)
+
+    async def _handle_client(self, reader, writer):
+        streaming = False
+        try:
+            request = await _read_http_request(reader)
+            if request is None:
+                return
+            _, target, _, _ = request
+            if self.faults.should_hang():
+                await asyncio.sleep(self.faults.hang_seconds)
+                return
+            action = dict(parse_qsl(urlsplit(target).query)).get('action')
+            if action == 'snapshot':
+                writer.write(_http_response(200, self.pattern.frame, 'image/jpeg', keep_alive=False))
+                await writer.drain()
+                return
+            if action != 'stream':
+                writer.write(_http_response(404, b'Not Found', 'text/plain', keep_alive=False))
+                return
+
+            self.clients += 1
+            streaming = True
+            writer.write((
+                "HTTP/1.0 200 OK\r\n"
+                "Cache-Control: no-store, no-cache, must-revalidate\r\n"
+                "Pragma: no-cache\r\n"
+                f"Content-Type: multipart/x-mixed-replace;boundary={MJPEG_BOUNDARY}\r\n\r\n"
+            ).encode('latin-1'))
+            while True:
+                await self.pattern.changed.wait()
+                frame = self.pattern.frame
+                writer.write((f"--{MJPEG_BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                              f"Content-Length: {len(frame)}\r\n\r\n").encode('latin-1') + frame + b'\r\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            if streaming:
+                self.clients -= 1
+            writer.close()
+
+
+class CrealityFarm:
+    """Alle simulierten Creality-Drucker mit Moonraker und optional mjpg-streamer"""
+
+    def __init__(self, count: int, base_ip: str = '127.0.2.1', speed: float = 1.0, offline: int = 0,
+                 mjpeg: bool = True, moonraker_port: int = MOONRAKER_PORT, mjpeg_port: int = MJPEG_PORT,
+                 **fault_options):
+        first = ipaddress.ip_address(base_ip)
+        self.printers = [KlipperPrinter(f"K1SIM{index:05d}", str(first + index), speed) for index in range(count)]
+        self.faults = [
+            FaultProfile(offline=index >= count - offline, seed=index, **fault_options) for index in range(count)
+        ]
+        self.mjpeg = mjpeg
+        self.moonraker_port = moonraker_port
+        self.mjpeg_port = mjpeg_port
+        self.pattern = None
+        self.endpoints = []
+
+    def manifest(self) -> list:
+        return [{'name': printer.name, 'ip': printer.ip, 'offline': faults.offline}
+                for printer, faults in zip(self.printers, self.faults)]
+
+    async def start(self):
+        if self.mjpeg:
+            self.pattern = TestPattern()
+            asyncio.ensure_future(self.pattern.run())
+        for printer, faults in zip(self.printers, self.faults):
+            endpoint = MoonrakerEndpoint(printer, faults, self.moonraker_port)
+            await endpoint.start()
+            self.endpoints.append(endpoint)
+            if self.mjpeg:
+                camera = MjpegEndpoint(printer, self.pattern, faults, self.mjpeg_port)
+                await camera.start()
+                self.endpoints.append(camera)
+        logger.info(f"Started {len(self.printers)} simulated Creality printers "
+                    f"({self.printers[0].ip} - {self.printers[-1].ip})")
+
+
+async def _main(args):
+    farm = CrealityFarm(
+        args.printers, args.base_ip, args.speed, args.offline, not args.no_mjpeg,
+        args.moonraker_port, args.mjpeg_port,
+        latency=args.latency / 1000, jitter=args.jitter / 1000, error_rate=args.error_rate,
+        hang_rate=args.hang_rate, hang_seconds=args.hang_seconds,
+        websocket=not args.no_websocket, ws_drop_rate=args.ws_drop_rate
+    )
+    await farm.start()
+    if args.manifest:
+        with open(args.manifest, 'w') as f:
+            json.dump(farm.manifest(), f, indent=2)
+    # Bereitschaft für aufrufende Prozesse (z.B. crealityLoadTest)
+    print('READY', flush=True)
+    await asyncio.Event().wait()
+
+
+def add_fault_arguments(parser):
+    parser.add_argument('--latency', type=float, default=0.0, help="mean response latency in ms")
+    parser.add_argument('--jitter', type=float, default=0.0, help="latency standard deviation in ms")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+    parser.add_argument('--hang-rate', type=float, default=0.0, help="fraction of requests that never get an answer")
+    parser.add_argument('--hang-seconds', type=float, default=30.0, help="how long a hanging request keeps the connection")
+    parser.add_argument('--offline', type=int, default=0, help="number of printers (at the end) that never answer")
+    parser.add_argument('--no-websocket', action='store_true', help="reject the Moonraker WebSocket with 404")
+    parser.add_argument('--ws-drop-rate', type=float, default=0.0,
+                        help="probability per second that a WebSocket connection is cut")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate Creality/Klipper printers (Moonraker + mjpg-streamer)")
+    parser.add_argument('--printers', type=int, default=10)
+    parser.add_argument('--base-ip', default='127.0.2.1', help="address of the first printer, incremented per printer")
+    parser.add_argument('--speed', type=float, default=1.0, help="simulation time factor")
+    parser.add_argument('--moonraker-port', type=int, default=MOONRAKER_PORT)
+    parser.add_argument('--mjpeg-port', type=int, default=MJPEG_PORT)
+    parser.add_argument('--no-mjpeg', action='store_true', help="do not start mjpg-streamer endpoints")
+    parser.add_argument('--manifest', help="write printer list as JSON")
+    parser.add_argument('--log-level', default='INFO')
+    add_fault_arguments(parser)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=getattr(logging, args.log_level.upper()),
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,302 @@
+"""
+Minimaler RTSP(S)-Server als Ersatz für die Kamera eines Bambu Druckers.
+
+Ein gemeinsamer ffmpeg-Prozess erzeugt ein Testbild (lavfi testsrc2) als H.264
+Annex B. Die Access Units werden an alle laufenden Sitzungen verteilt und dort
+als RTP (RFC 6184, Single NAL / FU-A) über die RTSP-Verbindung verschachtelt
+gesendet (RTP/AVP/TCP, interleaved=0-1). UDP wird mit 461 abgelehnt, ffmpeg
+und go2rtc fallen dann auf TCP zurück.
+
+Unterstützt: OPTIONS, DESCRIBE, SETUP, PLAY, GET_PARAMETER, TEARDOWN mit
+Basic-Auth bblp:<Access Code>, wie rtsps://bblp:<code>@<ip>:322/streaming/live/1.
+"""
+import asyncio
+import base64
+import logging
+import random
+import shutil
+import struct
+
+logger = logging.getLogger(__name__)
+
+STREAM_PATH = '/streaming/live/1'
+RTP_PAYLOAD_TYPE = 96
+RTP_CLOCK = 90000
+MAX_RTP_PAYLOAD = 1400
+
+# NAL-Typen
+NAL_IDR = 5
+NAL_SPS = 7
+NAL_PPS = 8
+NAL_AUD = 9
+NAL_FU_A = 28
+
+_START_CODE = b'\x00\x00\x01'
+
+
+class H264TestSource:
+    """
+    Ein ffmpeg-Prozess für alle simulierten Kameras. Der Annex-B-Strom wird an den
+    Access Unit Delimitern (x264 aud=1) in Bilder zerlegt und an alle Abonnenten
+    verteilt. Sitzungen, die nicht hinterherkommen, verlieren Bilder und setzen
+    erst mit dem nächsten Keyframe wieder ein.
+    """
+
+    def __init__(self, size: str = '1280x720', fps: int = 15):
+        self.size = size
+        self.fps = fps
+        self.process = None
+        self.sps = None
+        self.pps = None
+        self.subscribers = set()
+        self.frames = 0
+        self._buffer = b''
+        self._access_unit = []
+
+    @staticmethod
+    def available() -> bool:
+        return shutil.which('ffmpeg') is not None
+
+    def command(self) -> list:
+        return [
+            'ffmpeg', '-hide_banner', '-loglevel', 'error', '-re',
+            '-f', 'lavfi', '-i', f'testsrc2=size={self.size}:rate={self.fps}',
+            '-c:v', 'libx264', '-preset', 'ultrafast', '-tune', 'zerolatency',
+            '-g', str(self.fps * 2), '-x264-params', 'aud=1',
+            '-f', 'h264', '-'
+        ]
+
+    async def run(self):
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command(), stdout=asyncio.subprocess.PIPE, stdin=asyncio.subprocess.DEVNULL
+        )
+        logger.info(f"Started ffmpeg test source ({self.size}@{self.fps}fps)")
+        try:
+            while True:
+                chunk = await self.process.stdout.read(65536)
+                if not chunk:
+                    break
+                self.feed(chunk)
+        finally:
+            if self.process.returncode is None:
+                self.process.kill()
+            logger.warning("ffmpeg test source stopped")
+
+    def feed(self, data: bytes):
+        """Zerlegt Annex-B-Daten in NAL Units; vollständige Bilder gehen an die Abonnenten"""
+        self._buffer += data
+        positions = []
+        index = self._buffer.find(_START_CODE)
+        while index != -1:
+            positions.append(index)
+            index = self._buffer.find(_START_CODE, index + 3)
+        if len(positions) < 2:
+            return
+        for start, end in zip(positions, positions[1:]):
+            self._nal(self._buffer[start + 3:end].rstrip(b'\x00'))
+        self._buffer = self._buffer[positions[-1]:]
+
+    def _nal(self, nal: bytes):
+        if not nal:
+            return
+        nal_type = nal[0] & 0x1F
+        if nal_type == NAL_AUD:
+            if self._access_unit:
+                self._publish(self._access_unit)
+            self._access_unit = []
+            return
+        if nal_type == NAL_SPS:
+            self.sps = nal
+        elif nal_type == NAL_PPS:
+            self.pps = nal
+        self._access_unit.append(nal)
+
+    def _publish(self, nals: list):
+        timestamp = int(self.frames * RTP_CLOCK / self.fps) & 0xFFFFFFFF
+        self.frames += 1
+        keyframe = any(nal[0] & 0x1F == NAL_IDR for nal in nals)
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait((timestamp, keyframe, nals))
+            except asyncio.QueueFull:
+                # Zu langsam: Warteschlange leeren, die Sitzung wartet auf den nächsten Keyframe
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    def sprop_parameter_sets(self) -> str:
+        if not self.sps or not self.pps:
+            return ''
+        return f"{base64.b64encode(self.sps).decode()},{base64.b64encode(self.pps).decode()}"
+
+
+def packetize(nals: list, sequence: int, timestamp: int, ssrc: int) -> tuple:
+    """RTP-Pakete für ein Bild (Marker-Bit am letzten Paket). Gibt (pakete, nächste Sequenznummer) zurück."""
+    payloads = []
+    for nal in nals:
+        if len(nal) <= MAX_RTP_PAYLOAD:
+            payloads.append(nal)
+            continue
+        # FU-A: NAL-Header auf Indicator und FU-Header aufteilen
+        indicator = (nal[0] & 0xE0) | NAL_FU_A
+        nal_type = nal[0] & 0x1F
+        data = nal[1:]
+        chunk = MAX_RTP_PAYLOAD - 2
+        for offset in range(0, len(data), chunk):
+            header = nal_type
+            if offset == 0:
+                header |= 0x80
+            if offset + chunk >= len(data):
+                header |= 0x40
+            payloads.append(bytes((indicator, header)) + data[offset:offset + chunk])
+
+    packets = []
+    for index, payload in enumerate(payloads):
+        marker = 0x80 if index == len(payloads) - 1 else 0
+        header = struct.pack('!BBHII', 0x80, marker | RTP_PAYLOAD_TYPE, sequence & 0xFFFF, timestamp, ssrc)
+        packets.append(header + payload)
+        sequence += 1
+    return packets, sequence
+
+
+class RTSPEndpoint:
+    """RTSP(S)-Server einer simulierten Kamera"""
+
+    def __init__(self, source: H264TestSource, host: str, port: int, access_code: str, ssl_context=None,
+                 username: str = 'bblp'):
+        self.source = source
+        self.host = host
+        self.port = port
+        self.credentials = base64.b64encode(f"{username}:{access_code}".encode()).decode()
+        self.ssl_context = ssl_context
+        self.server = None
+        self.sessions = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle_client, self.host, self.port, ssl=self.ssl_context)
+
+    async def _read_request(self, reader):
+        """Liest eine RTSP-Anfrage und überspringt dazwischen gesendete RTCP-Pakete ($-Frames)"""
+        while True:
+            first = await reader.readexactly(1)
+            if first == b'$':
+                _, length = struct.unpack('!BH', await reader.readexactly(3))
+                await reader.readexactly(length)
+                continue
+            head = first + await reader.readuntil(b'\r\n\r\n')
+            lines = head.decode('utf-8', 'replace').split('\r\n')
+            method, url, _ = lines[0].split(' ', 2)
+            headers = {}
+            for line in lines[1:]:
+                if ':' in line:
+                    name, value = line.split(':', 1)
+                    headers[name.strip().lower()] = value.strip()
+            length = int(headers.get('content-length', 0))
+            if length:
+                await reader.readexactly(length)
+            return method, url, headers
+
+    def _response(self, writer, status: str, cseq: str, headers: dict = None, body: str = ''):
+        lines = [f"RTSP/1.0 {status}", f"CSeq: {cseq}", "Server: BambuCAM simulator"]
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        if body:
+            lines.append(f"Content-Length: {len(body.encode())}")
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n' + body).encode())
+
+    def _sdp(self) -> str:
+        fmtp = 'packetization-mode=1'
+        sprop = self.source.sprop_parameter_sets()
+        if sprop:
+            fmtp += f';sprop-parameter-sets={sprop}'
+        return '\r\n'.join([
+            'v=0',
+            f'o=- 0 0 IN IP4 {self.host}',
+            's=BambuCAM simulator',
+            f'c=IN IP4 {self.host}',
+            't=0 0',
+            'm=video 0 RTP/AVP 96',
+            f'a=rtpmap:{RTP_PAYLOAD_TYPE} H264/{RTP_CLOCK}',
+            f'a=fmtp:{RTP_PAYLOAD_TYPE} {fmtp}',
+            'a=control:track1',
+            ''
+        ])
+
+    async def _handle_client(self, reader, writer):
+        session_id = f"{random.getrandbits(32):08X}"
+        streaming = None
+        try:
+            while True:
+                method, url, headers = await self._read_request(reader)
+                cseq = headers.get('cseq', '0')
+
+                if method == 'OPTIONS':
+                    self._response(writer, '200 OK', cseq,
+                                   {'Public': 'OPTIONS, DESCRIBE, SETUP, PLAY, GET_PARAMETER, TEARDOWN'})
+                elif headers.get('authorization') != f"Basic {self.credentials}":
+                    self._response(writer, '401 Unauthorized', cseq,
+                                   {'WWW-Authenticate': 'Basic realm="BambuCAM simulator"'})
+                elif STREAM_PATH not in url:
+                    self._response(writer, '404 Not Found', cseq)
+                elif method == 'DESCRIBE':
+                    base = url if url.endswith('/') else url + '/'
+                    self._response(writer, '200 OK', cseq,
+                                   {'Content-Base': base, 'Content-Type': 'application/sdp'}, self._sdp())
+                elif method == 'SETUP':
+                    transport = headers.get('transport', '')
+                    if 'TCP' not in transport or 'interleaved' not in transport:
+                        self._response(writer, '461 Unsupported Transport', cseq)
+                    else:
+                        self._response(writer, '200 OK', cseq, {
+                            'Transport': 'RTP/AVP/TCP;unicast;interleaved=0-1',
+                            'Session': f"{session_id};timeout=60"
+                        })
+                elif method == 'PLAY':
+                    self._response(writer, '200 OK', cseq, {
+                        'Session': session_id, 'Range': 'npt=0.000-', 'RTP-Info': f"url={url.rstrip('/')}/track1"
+                    })
+                    if streaming is None:
+                        streaming = asyncio.ensure_future(self._stream(writer))
+                elif method == 'GET_PARAMETER':
+                    self._response(writer, '200 OK', cseq, {'Session': session_id})
+                elif method == 'TEARDOWN':
+                    self._response(writer, '200 OK', cseq, {'Session': session_id})
+                    break
+                else:
+                    self._response(writer, '405 Method Not Allowed', cseq)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            if streaming is not None:
+                streaming.cancel()
+            writer.close()
+
+    async def _stream(self, writer):
+        """Sendet Bilder ab dem nächsten Keyframe als RTP über Kanal 0"""
+        queue = asyncio.Queue(maxsize=self.source.fps * 2)
+        self.source.subscribers.add(queue)
+        self.sessions += 1
+        sequence = random.getrandbits(16)
+        ssrc = random.getrandbits(32)
+        waiting_for_keyframe = True
+        try:
+            while True:
+                frame = await queue.get()
+                if frame is None:
+                    waiting_for_keyframe = True
+                    continue
+                timestamp, keyframe, nals = frame
+                if waiting_for_keyframe:
+                    if not keyframe:
+                        continue
+                    waiting_for_keyframe = False
+                packets, sequence = packetize(nals, sequence, timestamp, ssrc)
+                for packet in packets:
+                    writer.write(b'$\x00' + struct.pack('!H', len(packet)) + packet)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.source.subscribers.discard(queue)
+            self.sessions -= 1
@@ -0,0 +1,13 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+# Tests importieren die Module wie die App als src.*
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Telemetrie der globalen Instanzen nicht in backend/data schreiben
+_work_dir = tempfile.mkdtemp(prefix='bambucam-tests-')
+atexit.register(shutil.rmtree, _work_dir, ignore_errors=True)
+os.environ.setdefault('TELEMETRY_DB', os.path.join(_work_dir, 'telemetry.db'))
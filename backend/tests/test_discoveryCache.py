@@ -0,0 +1,69 @@
+import os
+import shutil
+import ssl
+import subprocess
+
+import pytest
+
+from src.services.discoveryCache import DiscoveryCache
+from src.services.printerCertificate import subject_common_name
+
+SERIAL = '01S00C000000001'
+
+
+def _scanned(ip, serial=''):
+    return {'id': f'id-{ip}-{serial}', 'ip': ip, 'type': 'BAMBULAB', 'serial': serial, 'name': f'Printer {ip}'}
+
+
+def test_ip_entry_is_rekeyed_to_serial():
+    cache = DiscoveryCache(ttl=60)
+    first = cache.add(_scanned('192.168.1.20'), 'scan')
+    seen = []
+    cache.add_listener(lambda entry, previous_ip: seen.append((entry['serial'], previous_ip)))
+
+    entry = cache.add(_scanned('192.168.1.20', SERIAL), 'ssdp')
+
+    assert len(cache) == 1
+    assert entry['id'] == first['id']
+    assert entry['first_seen'] == first['first_seen']
+    assert entry['serial'] == SERIAL
+    assert seen == [(SERIAL, '192.168.1.20')]
+
+
+def test_port_scan_of_known_printer_keeps_serial_entry():
+    cache = DiscoveryCache(ttl=60)
+    known = cache.add(_scanned('192.168.1.20', SERIAL), 'ssdp')
+
+    entry = cache.add(_scanned('192.168.1.20'), 'scan')
+
+    assert len(cache) == 1
+    assert entry['id'] == known['id']
+    assert entry['serial'] == SERIAL
+    assert entry['source'] == 'scan'
+    assert entry['last_seen'] >= known['last_seen']
+
+
+def test_new_ip_for_serial_reports_previous_ip():
+    cache = DiscoveryCache(ttl=60)
+    known = cache.add(_scanned('192.168.1.20', SERIAL), 'ssdp')
+    seen = []
+    cache.add_listener(lambda entry, previous_ip: seen.append((entry['ip'], previous_ip)))
+
+    entry = cache.add(_scanned('192.168.1.42', SERIAL), 'ssdp')
+
+    assert [printer['ip'] for printer in cache.printers()] == ['192.168.1.42']
+    assert entry['id'] == known['id']
+    assert seen == [('192.168.1.42', '192.168.1.20')]
+
+
+@pytest.mark.skipif(shutil.which('openssl') is None, reason="openssl not available")
+def test_subject_common_name(tmp_path):
+    cert = tmp_path / 'printer.crt'
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'ec', '-pkeyopt', 'ec_paramgen_curve:prime256v1',
+                    '-nodes', '-keyout', os.fspath(tmp_path / 'printer.key'), '-out', os.fspath(cert),
+                    '-days', '1', '-subj', f'/O=Bambu Lab/CN={SERIAL}'], check=True, capture_output=True)
+    der = ssl.PEM_cert_to_DER_cert(cert.read_text())
+
+    assert subject_common_name(der) == SERIAL
+    with pytest.raises(ValueError):
+        subject_common_name(der[:40])
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from src.services.downsampling import downsample_indices, lttb_indices, minmax_indices
+
+
+def series(length=1000):
+    x = np.arange(length, dtype=np.float64)
+    y = np.sin(x / 37.0) * 100 + np.random.default_rng(1).normal(0, 5, length)
+    return x, y
+
+
+@pytest.mark.parametrize('points', [3, 10, 100, 999])
+def test_lttb_keeps_endpoints_and_monotonic_indices(points):
+    x, y = series()
+    selected = lttb_indices(x, y, points)
+    assert len(selected) == points
+    assert selected[0] == 0 and selected[-1] == len(x) - 1
+    assert np.all(np.diff(selected) > 0)
+
+
+def test_lttb_returns_everything_when_points_exceed_length():
+    x, y = series(10)
+    assert lttb_indices(x, y, 50).tolist() == list(range(10))
+
+
+def test_lttb_keeps_a_spike():
+    x, y = series()
+    y[500] = 10_000
+    assert 500 in lttb_indices(x, y, 50)
+
+
+def test_minmax_keeps_extremes_per_bucket():
+    x, y = series()
+    selected = minmax_indices(y, 20)
+    assert np.all(np.diff(selected) > 0)
+    assert int(np.argmax(y)) in selected and int(np.argmin(y)) in selected
+    assert len(selected) <= 20
+
+
+@pytest.mark.parametrize('method', ['lttb', 'minmax'])
+@pytest.mark.parametrize('points', [3, 7, 50, 600])
+def test_downsample_indices_share_one_budget_across_columns(method, points):
+    x, y = series(5000)
+    columns = np.column_stack([y * scale for scale in (1, -1, 0.01, 50)] + [np.zeros_like(y)]).astype(np.float32)
+    selected = downsample_indices(x, columns, points, method)
+    assert len(selected) <= points
+    assert np.all(np.diff(selected) > 0)
+    if method == 'lttb':
+        assert len(selected) == points
+        assert selected[0] == 0 and selected[-1] == len(x) - 1
+
+
+def test_downsample_indices_keeps_spikes_of_every_column():
+    x, y = series(5000)
+    small, large = y * 0.01, y * 100
+    small[1234] = 50.0
+    large[4321] = -1e6
+    columns = np.column_stack((small, large)).astype(np.float32)
+    for method in ('lttb', 'minmax'):
+        selected = downsample_indices(x, columns, 100, method)
+        assert 1234 in selected and 4321 in selected
+
+
+def test_downsample_indices_rejects_unknown_method():
+    x, y = series()
+    with pytest.raises(ValueError):
+        downsample_indices(x, y[:, None], 50, 'average')
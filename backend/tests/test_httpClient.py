@@ -0,0 +1,56 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.services.httpClient import HTTPClient
+
+
+class _CookieHandler(BaseHTTPRequestHandler):
+    """Setzt bei jedem Aufruf ein Cookie und gibt den empfangenen Cookie-Header zurück"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = (self.headers.get('Cookie') or '').encode()
+        self.send_response(200)
+        self.send_header('Set-Cookie', 'session=secret; Path=/')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _CookieHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_shared_session_neither_stores_nor_sends_cookies(server):
+    client = HTTPClient()
+    try:
+        assert client.get(server).text == ''
+        assert client.get(server).text == ''
+        assert len(client.session.cookies) == 0
+    finally:
+        client.close()
+
+
+def test_own_session_keeps_cookies_and_shares_the_pool(server):
+    client = HTTPClient()
+    try:
+        session = client.new_session()
+        session.get(server)
+        assert session.get(server).text == 'session=secret'
+        # Die gemeinsame Session sieht die Cookies der eigenen nicht, beide nutzen denselben Pool
+        assert client.get(server).text == ''
+        assert client.pooled_hosts() == 1
+    finally:
+        client.close()
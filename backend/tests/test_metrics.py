@@ -0,0 +1,48 @@
+from src.services.metrics import MetricsRegistry
+
+
+def test_remove_series_drops_only_the_printers_series():
+    registry = MetricsRegistry()
+    messages = registry.counter('test_messages_total', 'Messages', ('backend', 'printer_id'))
+    latency = registry.histogram('test_seconds', 'Latency', ('printer_id',), buckets=(1,))
+    clients = registry.gauge('test_clients', 'Clients')
+    live = registry.gauge_function('test_live', 'Live', ('printer_id',), lambda: {('p1',): 1})
+    messages.inc('bambulab', 'p1')
+    messages.inc('bambulab', 'p2')
+    latency.observe(0.5, 'p1')
+    clients.inc()
+
+    registry.remove_series('printer_id', 'p1')
+
+    rendered = registry.render()
+    assert 'printer_id="p2"' in rendered
+    assert 'test_messages_total{backend="bambulab",printer_id="p1"}' not in rendered
+    assert 'test_seconds_count{printer_id="p1"}' not in rendered
+    assert 'test_clients 1' in rendered
+    # Funktions-Metriken lesen live aus den Services und bleiben unberührt
+    assert live.render()[-1] == 'test_live{printer_id="p1"} 1'
+
+
+def test_each_exported_gauge_holds_one_quantity():
+    from src.routes.metrics import metrics  # registriert die Funktions-Metriken
+
+    rendered = metrics.render()
+    assert 'value="' not in rendered
+    for name in ('bambucam_moonraker_printers', 'bambucam_moonraker_subscribed_printers',
+                 'bambucam_moonraker_idle_connections', 'bambucam_discovery_cached_printers',
+                 'bambucam_ssdp_listener_up'):
+        assert f"# TYPE {name} gauge" in rendered
+
+
+def test_removing_a_printer_drops_its_series(tmp_path, monkeypatch):
+    from src.services.metrics import MQTT_MESSAGES, metrics
+    from src.services.printerRegistry import printer_registry
+    from src.services.printerService import removePrinter
+
+    monkeypatch.setattr(printer_registry, 'printers_dir', tmp_path)
+    printer_registry.save({'id': 'metrics-test', 'name': 'Test', 'type': 'OCTOPRINT', 'ip': '127.0.0.1'})
+    MQTT_MESSAGES.inc('octoprint', 'metrics-test')
+    assert 'printer_id="metrics-test"' in metrics.render()
+
+    assert removePrinter('metrics-test')
+    assert 'printer_id="metrics-test"' not in metrics.render()
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.services.metrics import MOONRAKER_POLLS
+from src.services.moonrakerPoller import MoonrakerPoller
+from src.services.pollPolicy import PollPolicy, ViewTracker
+from src.tools.moonrakerSimulator import FaultProfile, KlipperPrinter, MoonrakerEndpoint
+
+
+@pytest.fixture
+def simulator():
+    """Startet simulierte Moonraker-Endpunkte in einem eigenen Event Loop"""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    endpoints = []
+
+    def start(ip: str, websocket: bool) -> KlipperPrinter:
+        # Hohe Geschwindigkeit, damit sich der Status laufend ändert
+        printer = KlipperPrinter(f"K1TEST{len(endpoints)}", ip, speed=100)
+        endpoint = MoonrakerEndpoint(printer, FaultProfile(websocket=websocket, seed=0))
+        asyncio.run_coroutine_threadsafe(endpoint.start(), loop).result(5)
+        endpoints.append(endpoint)
+        return printer
+
+    async def shutdown():
+        for endpoint in endpoints:
+            endpoint.server.close()
+        # Offene Verbindungen (WebSocket, Keep-Alive) beenden
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    yield start
+    asyncio.run_coroutine_threadsafe(shutdown(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    loop.close()
+
+
+@pytest.fixture
+def poller():
+    policy = PollPolicy(0.1, 0.1, 0.1, 1.0, ViewTracker())
+    poller = MoonrakerPoller(policy, concurrency=4, timeout=2.0, connect_timeout=1.0, subscribe=True)
+    poller.statuses = []
+    poller.on_status = lambda printer_id, status: poller.statuses.append((printer_id, status))
+    yield poller
+    poller.stop()
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return condition()
+
+
+def test_falls_back_to_http_polling_without_websocket(simulator, poller):
+    printer = simulator('127.0.2.201', websocket=False)
+    poller.subscribe_retry = 60
+    polls = MOONRAKER_POLLS.value('ok')
+    notifies = MOONRAKER_POLLS.value('notify')
+
+    poller.add('sim-http', printer.ip)
+    assert wait_for(lambda: MOONRAKER_POLLS.value('ok') - polls >= 3)
+
+    assert poller.subscribed_count() == 0
+    assert poller._printers['sim-http'].subscribe_failures == 1
+    assert MOONRAKER_POLLS.value('notify') == notifies
+    assert {printer_id for printer_id, _ in poller.statuses} == {'sim-http'}
+    assert all(status['status'] == 'online' for _, status in poller.statuses)
+
+
+def test_subscribes_over_websocket_when_available(simulator, poller):
+    printer = simulator('127.0.2.202', websocket=True)
+    polls = MOONRAKER_POLLS.value('ok')
+    notifies = MOONRAKER_POLLS.value('notify')
+
+    poller.add('sim-ws', printer.ip)
+    assert wait_for(lambda: poller.subscribed_count() == 1)
+    assert wait_for(lambda: MOONRAKER_POLLS.value('notify') - notifies >= 2)
+
+    # Solange das Abo steht, wird nicht per HTTP abgefragt
+    assert MOONRAKER_POLLS.value('ok') == polls
+    assert poller._printers['sim-ws'].subscribe_failures == 0
+    assert poller.statuses[-1][1]['status'] == 'online'
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.services import networkScanner
+from src.services.asyncHttp import AsyncHTTPClient
+
+IP = '127.0.0.1'
+
+
+class _PageHandler(BaseHTTPRequestHandler):
+    """Liefert die Startseite bzw. /printer/info wie der jeweilige Server"""
+
+    protocol_version = 'HTTP/1.1'
+    pages = {}
+
+    def do_GET(self):
+        body = self.pages.get(self.path, b'')
+        self.send_response(200 if self.path in self.pages else 404)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def web_port():
+    """HTTP-Server auf einem freien Port, die Tests setzen ihn als OctoPrint- bzw. Moonraker-Port"""
+    server = ThreadingHTTPServer((IP, 0), _PageHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    port = server.server_address[1]
+    yield port
+    server.shutdown()
+    server.server_close()
+
+
+def identify(ports: set, pages: dict = None):
+    async def run():
+        client = AsyncHTTPClient(max_idle_per_host=0)
+        try:
+            return await networkScanner._identify(client, IP, ports, 1.0)
+        finally:
+            client.close()
+
+    _PageHandler.pages = pages or {}
+    return asyncio.run(run())
+
+
+def test_mqtt_port_alone_is_not_a_bambu_printer():
+    assert identify({8883}) is None
+
+
+def test_bambu_lan_mode_follows_camera_ports():
+    printer = identify({8883, 990, 322})
+    assert (printer['type'], printer['mode'], printer['lan_mode_enabled']) == ('BAMBULAB', 'lan', True)
+    printer = identify({8883, 990})
+    assert (printer['type'], printer['mode'], printer['lan_mode_enabled']) == ('BAMBULAB', 'cloud', False)
+
+
+def test_web_server_without_octoprint_is_ignored(web_port, monkeypatch):
+    monkeypatch.setattr(networkScanner, 'OCTOPRINT_PORT', web_port)
+    assert identify({web_port}, {'/': b'<html><title>Router</title></html>'}) is None
+    printer = identify({web_port}, {'/': b'<html><title>OctoPrint Login</title></html>'})
+    assert printer['type'] == 'OCTOPRINT'
+
+
+def test_moonraker_port_reads_printer_info(web_port, monkeypatch):
+    monkeypatch.setattr(networkScanner, 'MOONRAKER_PORT', web_port)
+    info = json.dumps({'result': {'hostname': 'k1-max', 'software_version': 'v0.12'}}).encode()
+    printer = identify({web_port}, {'/printer/info': info})
+    assert (printer['type'], printer['name'], printer['version']) == ('CREALITY', 'k1-max', 'v0.12')
+    # Ohne Antwort bleibt es ein Creality-Drucker mit Standardnamen
+    assert identify({web_port})['name'] == f'Printer {IP}'
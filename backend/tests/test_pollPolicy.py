@@ -0,0 +1,53 @@
+import math
+
+from src.services.pollPolicy import PollPolicy, ViewTracker
+from src.services.printerState import PrinterState
+
+
+def _policy(active=2.0, idle=15.0, viewed=1.0, max_backoff=60.0):
+    return PollPolicy(active, idle, viewed, max_backoff, ViewTracker(hold=30.0))
+
+
+def test_idle_and_active_intervals():
+    policy = _policy()
+    idle = PrinterState('p', 'CREALITY', state='standby')
+    printing = PrinterState('p', 'CREALITY', state='printing')
+    heating = PrinterState('p', 'CREALITY', state='standby', target_bed=60)
+
+    assert policy.interval('p') == 15.0
+    assert policy.interval('p', idle) == 15.0
+    assert policy.interval('p', printing) == 2.0
+    assert policy.interval('p', heating) == 2.0
+
+
+def test_viewed_printer_is_polled_faster():
+    policy = _policy()
+    policy.views.touch('p')
+
+    assert policy.interval('p', PrinterState('p', 'CREALITY', state='printing')) == 1.0
+    assert policy.interval('p') == 1.0
+    assert policy.interval('other') == 15.0
+
+    policy.views.forget('p')
+    assert policy.interval('p') == 15.0
+
+
+def test_zero_interval_disables_polling_unless_viewed():
+    policy = _policy(active=0, idle=0, viewed=300.0)
+    assert math.isinf(policy.interval('p'))
+
+    policy.views.open('p')
+    assert policy.interval('p') == 300.0
+
+
+def test_backoff_doubles_up_to_maximum():
+    policy = _policy()
+    assert [policy.interval('p', None, failures) for failures in range(1, 7)] == [4.0, 8.0, 16.0, 32.0, 60.0, 60.0]
+
+
+def test_backoff_survives_very_large_failure_counts():
+    policy = _policy()
+    assert policy.interval('p', None, 1100) == 60.0
+    assert policy.interval('p', None, 10 ** 9) == 60.0
+    # Ein Maximum unter dem Grundintervall verkürzt das Intervall nicht
+    assert _policy(active=0, idle=900.0, max_backoff=60.0).interval('p', None, 5000) == 900.0
@@ -0,0 +1,94 @@
+from src.services.printerState import PrinterState, offline_status
+
+
+def test_update_bumps_version_only_on_change():
+    state = PrinterState('p1', 'BAMBULAB')
+    assert state.version == 0
+
+    assert state.update(hotend=210, bed=60) == ('hotend', 'bed')
+    assert state.version == 1
+    updated_at = state.updated_at
+    assert updated_at > 0
+
+    # Gleiche Werte (auch als int statt float) ändern nichts
+    assert state.update(hotend=210.0, bed=60) == ()
+    assert state.version == 1
+    assert state.updated_at == updated_at
+
+    assert state.update(hotend=210, progress=5) == ('progress',)
+    assert state.version == 2
+
+
+def test_update_coerces_types():
+    state = PrinterState('p1', 'CREALITY')
+    state.update(hotend='205.5', remaining_time=12.0, current_layer='3', progress=None)
+    assert state.hotend == 205.5 and isinstance(state.hotend, float)
+    assert state.remaining_time == 12 and isinstance(state.remaining_time, int)
+    assert state.current_layer == 3
+    assert state.progress == 0.0
+
+
+def test_snapshot_is_cached_per_version():
+    state = PrinterState('p1', 'BAMBULAB', status='idle')
+    first = state.snapshot()
+    assert state.snapshot() is first
+
+    state.update(status='idle')
+    assert state.snapshot() is first
+
+    state.update(status='running', hotend=220)
+    second = state.snapshot()
+    assert second is not first
+    assert second['status'] == 'running'
+    assert second['temperatures']['nozzle'] == 220.0
+    assert first['status'] == 'idle'
+
+
+def test_update_from_dict_reads_nested_status():
+    state = PrinterState('p1', 'CREALITY')
+    changed = state.update_from_dict({
+        'status': 'printing',
+        'temperatures': {'nozzle': 200, 'bed': 55},
+        'targets': {'hotend': 210},
+        'layer': {'current': 4, 'total': 100},
+    })
+    assert set(changed) == {'status', 'hotend', 'bed', 'target_hotend', 'current_layer', 'total_layers'}
+    view = state.snapshot()
+    assert view['temperatures'] == {'hotend': 200.0, 'bed': 55.0, 'chamber': 0.0}
+    assert view['layer'] == {'current': 4, 'total': 100}
+
+
+def test_offline_status_matches_backend_format():
+    assert offline_status('CLOUD')['print_status'] == 'OFFLINE'
+    assert offline_status('BAMBULAB')['status'] == 'offline'
+    octoprint = offline_status('OCTOPRINT', 'p1', 'Ender')
+    assert (octoprint['id'], octoprint['name']) == ('p1', 'Ender')
+
+
+def test_partial_bambu_reports_keep_previous_values():
+    import json
+    from types import SimpleNamespace
+    from src.services.mqttService import mqtt_service
+
+    def report(**fields):
+        message = SimpleNamespace(topic='device/01S00C000000001/report', payload=json.dumps({'print': fields}))
+        mqtt_service._on_message(None, None, message, 'state-test')
+
+    try:
+        report(nozzle_temper=25.5)
+        state = mqtt_service.states['state-test']
+        # Ohne gcode_state ist der Zustand noch unbekannt
+        assert state.status == 'unknown'
+        report(gcode_state='RUNNING', nozzle_temper=210, bed_temper=60, mc_percent=12, mc_remaining_time=30)
+        version = state.version
+        # P1/A1 schicken nur geänderte Felder
+        report(mc_percent=13)
+        assert (state.status, state.hotend, state.bed, state.progress, state.remaining_time) == \
+            ('RUNNING', 210.0, 60.0, 13.0, 30)
+        assert state.version == version + 1
+        report(mc_percent=13)
+        assert state.version == version + 1
+    finally:
+        mqtt_service.states.pop('state-test', None)
+        mqtt_service.printer_serials.pop('state-test', None)
+        mqtt_service._last_report.pop('state-test', None)
@@ -0,0 +1,68 @@
+import queue
+
+from src.services.statusEvents import RESYNC, StatusEventBus
+
+
+def _drain(subscriber: queue.Queue) -> list:
+    items = []
+    while True:
+        try:
+            items.append(subscriber.get_nowait())
+        except queue.Empty:
+            return items
+
+
+def test_publish_skips_unchanged_status():
+    bus = StatusEventBus()
+    first = bus.publish('p1', {'status': 'idle'})
+    assert first is not None
+    assert bus.publish('p1', {'status': 'idle'}) is None
+    assert bus.publish('p1', {'status': 'printing'}) == first + 1
+
+
+def test_events_since_replays_history_after_last_event_id():
+    bus = StatusEventBus(history_size=10)
+    ids = [bus.publish(printer_id, {'progress': progress})
+           for progress in range(3) for printer_id in ('p1', 'p2')]
+
+    replay = bus.events_since(ids[1])
+    assert [event['id'] for event in replay] == ids[2:]
+    assert [event['status']['progress'] for event in replay] == [1, 1, 2, 2]
+    assert bus.events_since(ids[-1]) == []
+
+
+def test_events_since_falls_back_to_snapshot_once_history_is_exhausted():
+    bus = StatusEventBus(history_size=3)
+    first = bus.publish('p1', {'progress': 0})
+    for progress in range(1, 5):
+        bus.publish('p2', {'progress': progress})
+
+    # first ist aus dem Verlauf gefallen: letzter Status je Drucker statt einer Lücke
+    snapshot = bus.events_since(first)
+    assert [(event['printerId'], event['status']['progress']) for event in snapshot] == [('p1', 0), ('p2', 4)]
+    # Ohne oder mit fremder ID (z.B. aus einem früheren Prozess) ebenso
+    assert bus.events_since(None) == snapshot
+    assert bus.events_since(first + 10 ** 9) == snapshot
+
+    bus.remove('p1')
+    assert [event['printerId'] for event in bus.events_since(None)] == ['p2']
+
+
+def test_slow_subscriber_gets_resync_instead_of_a_gap():
+    bus = StatusEventBus(queue_size=3)
+    slow = bus.subscribe()
+    fast = bus.subscribe()
+    for progress in range(3):
+        bus.publish('p1', {'progress': progress})
+    assert len(_drain(fast)) == 3
+
+    bus.publish('p1', {'progress': 3})
+    assert _drain(slow) == [RESYNC]
+    assert [event['status']['progress'] for event in _drain(fast)] == [3]
+
+    # Nach der Neusynchronisation kommen wieder Events
+    bus.publish('p1', {'progress': 4})
+    assert [event['status']['progress'] for event in _drain(slow)] == [4]
+
+    bus.unsubscribe(slow)
+    assert bus.subscriber_count() == 1
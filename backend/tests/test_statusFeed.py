@@ -0,0 +1,70 @@
+import asyncio
+import json
+from src.services import statusFeed
+from src.services.statusFeed import StatusFeedService, diff_status
+
+
+def apply_delta(status: dict, delta: dict) -> dict:
+    """Deep-Merge wie im Frontend, None entfernt ein Feld"""
+    merged = dict(status)
+    for key, value in delta.items():
+        if value is None:
+            merged.pop(key, None)
+        elif isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = apply_delta(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def test_diff_status_round_trip():
+    old = {'status': 'IDLE', 'temperatures': {'nozzle': 20.0, 'bed': 21.0}, 'progress': 0, 'message': 'x'}
+    new = {'status': 'RUNNING', 'temperatures': {'nozzle': 215.0, 'bed': 21.0}, 'progress': 3, 'filename': 'a.gcode'}
+    delta = diff_status(old, new)
+    assert delta == {'status': 'RUNNING', 'temperatures': {'nozzle': 215.0}, 'progress': 3,
+                     'filename': 'a.gcode', 'message': None}
+    assert apply_delta(old, delta) == new
+
+
+def test_diff_status_unchanged_is_empty():
+    status = {'status': 'IDLE', 'temperatures': {'nozzle': 20.0}}
+    assert diff_status(status, json.loads(json.dumps(status))) == {}
+
+
+class FakeWebSocket:
+    transport = None
+
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, message):
+        self.messages.append(json.loads(message))
+
+    async def wait_closed(self):
+        pass
+
+
+def test_new_client_sees_reverted_field(monkeypatch):
+    async def scenario():
+        feed = StatusFeedService(port=0, interval=60)
+        feed.loop = asyncio.get_running_loop()
+        feed._sent = {'p1': {'status': 'IDLE'}}
+        feed._latest = dict(feed._sent)
+        client = FakeWebSocket()
+        broadcasts = []
+        monkeypatch.setattr(statusFeed.websockets, 'broadcast', lambda clients, message: broadcasts.append(json.loads(message)))
+
+        feed._queue_event({'printerId': 'p1', 'status': {'status': 'RUNNING'}, 'id': 1})
+        # Ein zweiter Client bleibt verbunden, während sich der erste anmeldet
+        feed.clients.add(FakeWebSocket())
+        await feed._handle_client(client)
+        feed.clients.add(client)
+        feed._queue_event({'printerId': 'p1', 'status': {'status': 'IDLE'}, 'id': 2})
+        feed._flush()
+
+        state = client.messages[0]['printers']['p1']
+        for message in broadcasts[1:]:
+            state = apply_delta(state, message['printers'].get('p1', {}))
+        assert state == {'status': 'IDLE'}
+
+    asyncio.run(scenario())
@@ -0,0 +1,132 @@
+import struct
+
+import pytest
+
+from src.services.streamBroadcaster import (
+    NON_SYNC_SAMPLE, Fmp4Splitter, StreamBroadcaster, first_sample_flags, trex_sample_flags
+)
+
+SYNC = 0x02000000  # sample_depends_on = 2 (I-Frame)
+NON_SYNC = 0x01010000  # sample_depends_on = 1, sample_is_non_sync_sample
+
+
+def box(box_type: bytes, payload: bytes = b'') -> bytes:
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def large_box(box_type: bytes, payload: bytes = b'') -> bytes:
+    return struct.pack('>I4sQ', 1, box_type, 16 + len(payload)) + payload
+
+
+def full_box(box_type: bytes, flags: int, payload: bytes = b'') -> bytes:
+    return box(box_type, struct.pack('>I', flags) + payload)
+
+
+def init_segment(trex_flags: int) -> bytes:
+    trex = full_box(b'trex', 0, struct.pack('>5I', 1, 1, 0, 0, trex_flags))
+    return box(b'ftyp', b'isom') + box(b'moov', box(b'mvhd', b'\0' * 16) + box(b'mvex', trex))
+
+
+def moof(*traf_children: bytes) -> bytes:
+    return box(b'moof', full_box(b'mfhd', 0, struct.pack('>I', 1)) + box(b'traf', b''.join(traf_children)))
+
+
+def tfhd(flags: int = 0, default_sample_flags: int = None) -> bytes:
+    payload = struct.pack('>I', 1)  # track_ID
+    if flags & 0x01:
+        payload += struct.pack('>Q', 0)  # base_data_offset
+    if flags & 0x08:
+        payload += struct.pack('>I', 512)  # default_sample_duration
+    if flags & 0x20:
+        payload += struct.pack('>I', default_sample_flags)
+    return full_box(b'tfhd', flags, payload)
+
+
+def trun(flags: int = 0x01, first_flags: int = None, sample_flags: int = None) -> bytes:
+    payload = struct.pack('>I', 1)  # sample_count
+    if flags & 0x01:
+        payload += struct.pack('>i', 0)  # data_offset
+    if flags & 0x04:
+        payload += struct.pack('>I', first_flags)
+    if flags & 0x100:
+        payload += struct.pack('>I', 512)  # sample_duration
+    if flags & 0x200:
+        payload += struct.pack('>I', 100)  # sample_size
+    if flags & 0x400:
+        payload += struct.pack('>I', sample_flags)
+    return full_box(b'trun', flags, payload)
+
+
+def test_splitter_joins_boxes_split_across_feeds():
+    stream = box(b'ftyp', b'isom') + box(b'moof', b'x' * 30) + large_box(b'mdat', b'y' * 40) + box(b'free')
+    splitter = Fmp4Splitter()
+    boxes = []
+    for offset in range(0, len(stream), 5):
+        boxes += splitter.feed(stream[offset:offset + 5])
+
+    assert [box_type for box_type, _ in boxes] == [b'ftyp', b'moof', b'mdat', b'free']
+    assert b''.join(data for _, data in boxes) == stream
+    assert splitter.buffer == bytearray()
+
+
+def test_splitter_waits_for_complete_64_bit_size():
+    mdat = large_box(b'mdat', b'z' * 8)
+    splitter = Fmp4Splitter()
+
+    assert splitter.feed(mdat[:12]) == []
+    assert splitter.feed(mdat[12:20]) == []
+    assert splitter.feed(mdat[20:]) == [(b'mdat', mdat)]
+
+
+def test_splitter_rejects_invalid_size():
+    with pytest.raises(ValueError):
+        Fmp4Splitter().feed(struct.pack('>I4s', 4, b'moof'))
+
+
+def test_flags_from_trun_first_sample_flags():
+    fragment = moof(tfhd(0x20, SYNC), trun(0x01 | 0x04, first_flags=NON_SYNC))
+    assert first_sample_flags(fragment, SYNC) == NON_SYNC
+
+
+def test_flags_from_trun_per_sample_flags():
+    fragment = moof(tfhd(), trun(0x01 | 0x100 | 0x200 | 0x400, sample_flags=NON_SYNC))
+    assert first_sample_flags(fragment) == NON_SYNC
+
+
+def test_flags_from_tfhd_default_sample_flags():
+    fragment = moof(tfhd(0x01 | 0x08 | 0x20, NON_SYNC), trun())
+    assert first_sample_flags(fragment, SYNC) == NON_SYNC
+
+
+def test_flags_fall_back_to_trex():
+    init = init_segment(NON_SYNC)
+    assert trex_sample_flags(init) == NON_SYNC
+    assert first_sample_flags(moof(tfhd(), trun()), trex_sample_flags(init)) == NON_SYNC
+    assert trex_sample_flags(box(b'ftyp', b'isom') + box(b'moov')) is None
+
+
+def _feed(broadcaster: StreamBroadcaster, splitter: Fmp4Splitter, data: bytes):
+    for box_type, box_data in splitter.feed(data):
+        broadcaster._on_box(box_type, box_data)
+
+
+def test_broadcaster_keeps_gop_and_resyncs_slow_subscriber():
+    broadcaster = StreamBroadcaster('printer', None, None, client_queue=2, gop_cache_bytes=1 << 20)
+    splitter = Fmp4Splitter()
+    _feed(broadcaster, splitter, init_segment(NON_SYNC))
+    assert broadcaster.init == init_segment(NON_SYNC)
+
+    slow = broadcaster.subscribe()
+    for flags in (SYNC, NON_SYNC, NON_SYNC, NON_SYNC, SYNC):
+        # Keyframe nur aus tfhd, sonst gelten die Flags aus trex
+        traf = tfhd(0x20, SYNC) if flags == SYNC else tfhd()
+        _feed(broadcaster, splitter, moof(traf, trun()) + box(b'mdat', b'\0' * 16))
+
+    # Queue lief nach zwei Fragmenten über: Rückstand verworfen, Einstieg erst am nächsten Keyframe
+    assert len(slow.queue) == 1
+    assert not first_sample_flags(slow.queue[0]) & NON_SYNC_SAMPLE
+    assert len(broadcaster.gop) == 1
+
+    late = broadcaster.subscribe()
+    assert late.init == broadcaster.init
+    assert list(late.queue) == broadcaster.gop
@@ -0,0 +1,51 @@
+import time
+
+import numpy as np
+from src.services.printerState import PrinterState
+from src.services.telemetryHistory import HISTORY_FIELDS, TelemetryHistory, TelemetryRing
+from src.services.telemetryStore import RAW_TABLE, TelemetryStore
+
+
+def test_ring_grows_lazily_up_to_capacity():
+    ring = TelemetryRing(capacity=100, initial_size=8)
+    assert ring.size == 8
+    for i in range(20):
+        ring.append(float(i), (i,) * 7)
+    assert ring.size == 32
+    for i in range(20, 250):
+        ring.append(float(i), (i,) * 7)
+    assert ring.size == 100
+
+    timestamps, values = ring.since()
+    assert timestamps.tolist() == [float(i) for i in range(150, 250)]
+    assert np.array_equal(values[:, 0], np.arange(150, 250, dtype=np.float32))
+    assert ring.oldest() == 150.0
+
+
+def test_query_without_since_stays_within_the_ring_window(tmp_path):
+    store = TelemetryStore(tuple(HISTORY_FIELDS), db_path=tmp_path / 'telemetry.db', compact_interval=0)
+    conn = store._connect()
+    store._init_schema(conn)
+    now = time.time()
+    with conn:
+        # Zwei Stunden Rohdaten und verdichtete Stunden aus dem letzten Monat
+        conn.executemany(f"INSERT INTO {RAW_TABLE} (printer_id, ts, nozzle) VALUES ('p1', ?, 200)",
+                         [(now - age,) for age in range(7200, 0, -60)])
+        conn.executemany("INSERT INTO telemetry_1h (printer_id, ts, samples, nozzle_avg) VALUES ('p1', ?, 1, 100)",
+                         [(now - hours * 3600,) for hours in range(24, 720, 24)])
+    conn.close()
+    history = TelemetryHistory(capacity=600, min_interval=1.0, store=store)
+
+    # Ohne Ringpuffer (nach einem Neustart): nur dessen Zeitraum aus den Rohdaten
+    result = history.query('p1', fields=['nozzle'])
+    assert len(result['timestamps']) == 9  # Alter 60 bis 540 s
+    assert min(result['timestamps']) >= now - 600
+    assert set(result['series']['nozzle']) == {200.0}
+
+    # Mit Ringpuffer: nur dessen Inhalt
+    state = PrinterState('p1', 'BAMBULAB', hotend=210)
+    for offset in range(3):
+        history.record('p1', state, now + offset)
+    result = history.query('p1', fields=['nozzle'])
+    assert result['series']['nozzle'] == [210.0] * 3
+    store.stop()
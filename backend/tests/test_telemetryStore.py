@@ -0,0 +1,131 @@
+import time
+
+import pytest
+
+from src.services.telemetryStore import RAW_TABLE, ROLLUP_LAG, TelemetryStore
+
+COLUMNS = ('nozzle', 'bed')
+HOUR = 3600
+NOW = 100 * HOUR + 1800  # 100:30 Uhr
+STEP = 15
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TelemetryStore(COLUMNS, db_path=tmp_path / 'telemetry.db', compact_interval=0,
+                           retention={RAW_TABLE: HOUR, 'telemetry_1m': 5 * HOUR, 'telemetry_1h': 365 * 24 * HOUR})
+    yield store
+    store.stop()
+
+
+@pytest.fixture
+def conn(store):
+    conn = store._connect()
+    store._init_schema(conn)
+    yield conn
+    conn.close()
+
+
+def insert_raw(conn, start, end, printer_id='p1'):
+    """Ein Sample alle STEP Sekunden in [start, end), nozzle = ts / 1000"""
+    with conn:
+        conn.executemany(
+            f"INSERT INTO {RAW_TABLE} (printer_id, ts, nozzle, bed) VALUES (?, ?, ?, ?)",
+            [(printer_id, ts, ts / 1000, 60.0) for ts in range(start, end, STEP)]
+        )
+
+
+def timestamps(conn, table):
+    return [row[0] for row in conn.execute(f"SELECT ts FROM {table} ORDER BY ts")]
+
+
+def test_compaction_rolls_up_minutes_and_hours(store, conn):
+    insert_raw(conn, NOW - 8 * HOUR, NOW)
+
+    store.compact(conn, NOW)
+
+    minutes_until = (NOW - ROLLUP_LAG) // 60 * 60
+    minutes = timestamps(conn, 'telemetry_1m')
+    assert minutes[-1] == minutes_until - 60
+    hours = timestamps(conn, 'telemetry_1h')
+    assert hours == [hour * HOUR for hour in range(92, 100)]
+
+    minute = NOW - 600
+    row = conn.execute("SELECT samples, nozzle_min, nozzle_max, nozzle_avg, bed_avg FROM telemetry_1m "
+                       "WHERE printer_id = 'p1' AND ts = ?", (minute,)).fetchone()
+    assert row == pytest.approx((4, minute / 1000, (minute + 45) / 1000, (minute + 22.5) / 1000, 60.0))
+    row = conn.execute("SELECT samples, nozzle_min, nozzle_max, nozzle_avg FROM telemetry_1h "
+                       "WHERE ts = ?", (95 * HOUR,)).fetchone()
+    assert row == pytest.approx((240, 95 * HOUR / 1000, (96 * HOUR - STEP) / 1000, (95.5 * HOUR - 7.5) / 1000))
+
+
+def test_compaction_deletes_expired_rows(store, conn):
+    insert_raw(conn, NOW - 8 * HOUR, NOW)
+
+    store.compact(conn, NOW)
+
+    assert timestamps(conn, RAW_TABLE)[0] >= NOW - HOUR
+    assert timestamps(conn, RAW_TABLE)[-1] == NOW - STEP
+    assert timestamps(conn, 'telemetry_1m')[0] >= NOW - 5 * HOUR
+    # Die 1-Stunden-Stufe behält alles innerhalb ihrer Aufbewahrung
+    assert timestamps(conn, 'telemetry_1h')[0] == 92 * HOUR
+
+
+def test_compaction_keeps_rows_not_yet_rolled_up(store, conn):
+    store.retention.update({RAW_TABLE: 0, 'telemetry_1m': 0})
+    insert_raw(conn, NOW - 3 * HOUR, NOW)
+
+    store.compact(conn, NOW)
+
+    # Rohdaten der letzten (wegen ROLLUP_LAG noch offenen) Minute und die Minuten der laufenden Stunde bleiben
+    assert timestamps(conn, RAW_TABLE) == list(range(NOW - ROLLUP_LAG, NOW, STEP))
+    assert timestamps(conn, 'telemetry_1m') == list(range(100 * HOUR, NOW - ROLLUP_LAG, 60))
+
+    # Der nächste Lauf verdichtet inkrementell weiter
+    insert_raw(conn, NOW, NOW + HOUR)
+    store.compact(conn, NOW + HOUR)
+    assert timestamps(conn, 'telemetry_1h')[-1] == 100 * HOUR
+    assert conn.execute("SELECT samples FROM telemetry_1h WHERE ts = ?", (100 * HOUR,)).fetchone()[0] == 240
+
+
+def test_select_tier_defaults_to_raw_data(store):
+    now = time.time()
+    assert store.select_tier() == RAW_TABLE
+    assert store.select_tier(now - 600) == RAW_TABLE
+    assert store.select_tier(now - 2 * HOUR) == 'telemetry_1m'
+    assert store.select_tier(now - 24 * HOUR) == 'telemetry_1h'
+    assert store.select_tier(now - 600, resolution=60) == 'telemetry_1m'
+
+
+def test_writer_persists_queued_samples_across_reopen(tmp_path):
+    db_path = tmp_path / 'telemetry.db'
+    writer = TelemetryStore(COLUMNS, db_path=db_path, batch_size=100, flush_interval=0.05, compact_interval=0)
+    for index in range(1000):
+        writer.enqueue('p1', 1000.0 + index, (200.0 + index % 10, 60.0))
+    for index in range(5):
+        writer.enqueue('p2', 1000.0 + index, (1.0, 2.0))
+    # Löschungen gelten in Queue-Reihenfolge: nur die danach eingereihten Samples von p2 bleiben
+    writer.remove('p2')
+    writer.enqueue('p2', 2000.0, (210.0, 65.0))
+    writer.stop()
+    assert writer.written == 1006
+    assert writer.dropped == 0
+
+    reopened = TelemetryStore(COLUMNS, db_path=db_path, compact_interval=0)
+    timestamps, values = reopened.query('p1', ['nozzle', 'bed'])
+    assert timestamps.tolist() == [1000.0 + index for index in range(1000)]
+    assert values[:12, 0].tolist() == [200.0 + index % 10 for index in range(12)]
+    assert set(values[:, 1].tolist()) == {60.0}
+
+    timestamps, values = reopened.query('p2', ['nozzle', 'bed'])
+    assert timestamps.tolist() == [2000.0]
+    assert values.tolist() == [[210.0, 65.0]]
+    reopened.stop()
+
+
+def test_full_queue_drops_samples_without_blocking(tmp_path):
+    store = TelemetryStore(COLUMNS, db_path=tmp_path / 'telemetry.db', queue_size=10, compact_interval=0)
+    store._stop_event.set()  # kein Writer-Thread, die Queue läuft voll
+    for index in range(25):
+        store.enqueue('p1', float(index), (1.0, 2.0))
+    assert store.dropped == 15
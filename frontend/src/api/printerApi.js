@@ -27,6 +27,32 @@ export const printerApi = {
     }
   },
 
+  // Hole Status mehrerer Drucker in einer Anfrage
+  fetchAllStatus: async (printerIds) => {
+    try {
+      const query = printerIds && printerIds.length > 0
+        ? `?ids=${printerIds.map(encodeURIComponent).join(',')}`
+        : '';
+      const response = await fetch(`${API_URL}/printers/status${query}`);
+      const data = await response.json();
+      const statuses = data.printers || {};
+
+      // Normalisiere die Temperaturdaten
+      Object.values(statuses).forEach(status => {
+        if (status.temperatures && !status.temps) {
+          status.temps = status.temperatures;
+        }
+      });
+
+      Logger.logApiResponse(LOG_CATEGORIES.API, '/printers/status', statuses);
+
+      return statuses;
+    } catch (error) {
+      Logger.error('Error fetching printer status list:', error);
+      throw error;
+    }
+  },
+
   // Drucker hinzufügen
   addPrinter: async (printerData) => {
     try {
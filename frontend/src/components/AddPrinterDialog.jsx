@@ -247,7 +247,7 @@ const AddPrinterDialog = ({
   isDarkMode,
   scannedPrinters = [],
   isScanning,
-  scanTimer,
+  scanStatus,
   onScan
 }) => {
   const [selectedType, setSelectedType] = useState('BAMBULAB');
@@ -260,6 +260,7 @@ const AddPrinterDialog = ({
     mqttBroker: 'localhost',
     mqttPort: 1883,
     cloudId: '',
+    serial: '',
     model: '',
     status: ''
   });
@@ -274,6 +275,7 @@ const AddPrinterDialog = ({
       type: 'BAMBULAB',
       accessCode: printer.dev_access_code || '',
       cloudId: printer.dev_id || '',
+      serial: printer.serial || '',
       model: printer.dev_product_name || '',
       status: printer.online ? 'online' : 'offline'
     });
@@ -552,7 +554,7 @@ const AddPrinterDialog = ({
             disabled={isScanning}
             startIcon={isScanning && <CircularProgress size={20} color="inherit" />}
           >
-            {isScanning ? `Scanning... (${scanTimer}s)` : 'SCAN NETWORK'}
+            {isScanning ? (scanStatus ? `Scanning... (${scanStatus})` : 'Scanning...') : 'SCAN NETWORK'}
           </ScanButton>
 
           {scannedPrinters.length > 0 && (
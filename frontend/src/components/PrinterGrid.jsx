@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Grid, Paper, Dialog, DialogTitle, DialogContent, DialogActions, TextField, Button, Typography, Box, List, ListItem, ListItemText, IconButton, CircularProgress, Chip, Divider, Collapse, Snackbar, Alert, LinearProgress, FormControlLabel, SpeedDial, SpeedDialIcon, SpeedDialAction, Tooltip } from '@mui/material';
 import RTSPStream from './RTSPStream';
 import DeleteIcon from '@mui/icons-material/Delete';
@@ -27,6 +27,9 @@ import CloudPrinterDialog from './CloudPrinterDialog';
 
 console.log('Using API URL:', API_URL);  // Debug log
 
+// Längste Pause zwischen zwei Scan-Events (die SSDP-Phase meldet ~7 s lang nichts)
+const SCAN_STREAM_TIMEOUT = 60000;
+
 const PrinterGrid = ({ onThemeToggle, isDarkMode, mode, onModeChange, printers = [], isMobile }) => {
   // State Definitionen
   const [open, setOpen] = useState(false);
@@ -206,107 +209,104 @@ const PrinterGrid = ({ onThemeToggle, isDarkMode, mode, onModeChange, printers =
     }
   }, [mode]); // Run when mode changes
 
-  const [scanTimer, setScanTimer] = useState(10);
+  const [scanStatus, setScanStatus] = useState('');
   const [foundPrinters, setFoundPrinters] = useState([]);
   const [printerStatus, setPrinterStatus] = useState({});
 
-  // Status-Polling für LAN Drucker
+  // Push-Updates per Server-Sent Events, Polling dient nur noch als Fallback
+  const eventsConnected = useRef(false);
   useEffect(() => {
-    const updateLANPrinterStatus = async () => {
-      // Nur ausführen wenn wir im LAN Modus sind
-      if (mode !== 'lan') return;
+    if (typeof EventSource === 'undefined') return;
 
-      for (const printer of localPrinters) {
-        try {
-          const data = await printerApi.fetchStatus(printer.id);
-          setPrinterStatus(prev => ({
-            ...prev,
-            [printer.id]: data
-          }));
-        } catch (error) {
-          Logger.error('Error updating LAN printer status:', error);
+    const source = new EventSource(`${API_URL}/printers/events`);
+    source.onopen = () => {
+      eventsConnected.current = true;
+    };
+    source.onerror = () => {
+      // EventSource verbindet sich selbst neu (inkl. Last-Event-ID), bis dahin wird gepollt
+      eventsConnected.current = false;
+    };
+    source.addEventListener('status', (event) => {
+      try {
+        const { printerId, status } = JSON.parse(event.data);
+        if (status.temperatures && !status.temps) {
+          status.temps = status.temperatures;
         }
+        setPrinterStatus(prev => ({
+          ...prev,
+          [printerId]: { ...prev[printerId], ...status }
+        }));
+      } catch (error) {
+        Logger.error('Error handling printer status event:', error);
       }
-    };
+    });
 
-    if (localPrinters.length > 0 && mode === 'lan') {
-      updateLANPrinterStatus();
-      const interval = setInterval(updateLANPrinterStatus, 5000);
-      return () => clearInterval(interval);
-    }
-  }, [localPrinters, mode]);
+    return () => {
+      source.close();
+      eventsConnected.current = false;
+    };
+  }, []);
 
-  // Status-Polling für OctoPrint Drucker
+  // Status-Polling für LAN Drucker (inkl. OctoPrint) mit einer Anfrage für alle
   useEffect(() => {
-    const updateOctoPrintStatus = async () => {
-      // Nur ausführen wenn wir im LAN Modus sind
-      if (mode !== 'lan') return;
+    const updateLANPrinterStatus = async () => {
+      // Nur ausführen wenn wir im LAN Modus sind und keine Push-Updates ankommen
+      if (mode !== 'lan' || eventsConnected.current) return;
 
-      // Filtere nur OctoPrint Drucker
-      const octoPrinters = localPrinters.filter(printer => printer.type === 'OCTOPRINT');
-      
-      for (const printer of octoPrinters) {
-        try {
-          const response = await fetch(`${API_URL}/printers/${printer.id}/status`);
-          if (!response.ok) continue;
-          
-          const data = await response.json();
-          Logger.info('OctoPrint status update:', data);
-          
-          // Get current printer status to preserve temperature data if needed
-          const currentStatus = printerStatus[printer.id] || {};
-          const currentTemps = currentStatus.temperatures || {};
-          
-          // Only update temperatures if they are non-zero in the new data
-          const newTemps = data.temps || data.temperatures || {};
-          const mergedTemps = {
-            hotend: newTemps.hotend > 0 ? newTemps.hotend : (currentTemps.hotend || 0),
-            nozzle: newTemps.nozzle > 0 ? newTemps.nozzle : (currentTemps.nozzle || 0),
-            bed: newTemps.bed > 0 ? newTemps.bed : (currentTemps.bed || 0),
-            chamber: newTemps.chamber > 0 ? newTemps.chamber : (currentTemps.chamber || 0)
-          };
-          
-          setPrinterStatus(prev => ({
-            ...prev,
-            [printer.id]: {
-              ...data,
-              temperatures: mergedTemps
+      try {
+        const statuses = await printerApi.fetchAllStatus(localPrinters.map(printer => printer.id));
+
+        setPrinterStatus(prev => {
+          const next = { ...prev };
+          localPrinters.forEach(printer => {
+            const data = statuses[printer.id];
+            if (!data) return;
+
+            if (printer.type === 'OCTOPRINT') {
+              // Only update temperatures if they are non-zero in the new data
+              const currentTemps = (prev[printer.id] || {}).temperatures || {};
+              const newTemps = data.temps || data.temperatures || {};
+              next[printer.id] = {
+                ...data,
+                temperatures: {
+                  hotend: newTemps.hotend > 0 ? newTemps.hotend : (currentTemps.hotend || 0),
+                  nozzle: newTemps.nozzle > 0 ? newTemps.nozzle : (currentTemps.nozzle || 0),
+                  bed: newTemps.bed > 0 ? newTemps.bed : (currentTemps.bed || 0),
+                  chamber: newTemps.chamber > 0 ? newTemps.chamber : (currentTemps.chamber || 0)
+                }
+              };
+            } else {
+              next[printer.id] = data;
             }
-          }));
-        } catch (error) {
-          Logger.error('Error updating OctoPrint printer status:', error);
-        }
+          });
+          return next;
+        });
+      } catch (error) {
+        Logger.error('Error updating LAN printer status:', error);
       }
     };
 
     if (localPrinters.length > 0 && mode === 'lan') {
-      updateOctoPrintStatus();
-      const interval = setInterval(updateOctoPrintStatus, 5000);
+      updateLANPrinterStatus();
+      const interval = setInterval(updateLANPrinterStatus, 5000);
       return () => clearInterval(interval);
     }
   }, [localPrinters, mode]);
 
-  // Status-Polling für Cloud Drucker
+  // Status-Polling für Cloud Drucker mit einer Anfrage für alle
   useEffect(() => {
     const updateCloudPrinterStatus = async () => {
-      // Nur ausführen wenn wir im Cloud Modus sind
-      if (mode !== 'cloud') return;
+      // Nur ausführen wenn wir im Cloud Modus sind und keine Push-Updates ankommen
+      if (mode !== 'cloud' || eventsConnected.current) return;
 
-      for (const printer of cloudPrinters) {
-        try {
-          const response = await fetch(`${API_URL}/cloud/printers/${printer.id}/status`, {
-            credentials: 'include'
-          });
-          if (!response.ok) continue;
-          
-          const data = await response.json();
-          setPrinterStatus(prev => ({
-            ...prev,
-            [printer.id]: data
-          }));
-        } catch (error) {
-          Logger.error('Error updating cloud printer status:', error);
-        }
+      try {
+        const statuses = await printerApi.fetchAllStatus(cloudPrinters.map(printer => printer.id));
+        setPrinterStatus(prev => ({
+          ...prev,
+          ...statuses
+        }));
+      } catch (error) {
+        Logger.error('Error updating cloud printer status:', error);
       }
     };
 
@@ -378,21 +378,83 @@ const PrinterGrid = ({ onThemeToggle, isDarkMode, mode, onModeChange, printers =
     }
   };
 
+  // Scan per Server-Sent Events: Drucker erscheinen, sobald SSDP oder der Port-Scan sie findet,
+  // die Anzeige folgt den Phasen und dem Fortschritt (probed/total) des Scans
+  const scanStreamed = () => new Promise((resolve, reject) => {
+    const found = [];
+    const source = new EventSource(`${API_URL}/scan/stream`);
+    let timeout;
+    // Timeout gilt ab dem letzten Event, ein großer Scan darf also länger dauern, solange er Fortschritt meldet
+    const resetTimeout = () => {
+      clearTimeout(timeout);
+      timeout = setTimeout(() => {
+        source.close();
+        reject(new Error('Scan timeout'));
+      }, SCAN_STREAM_TIMEOUT);
+    };
+    resetTimeout();
+
+    source.addEventListener('phase', (event) => {
+      resetTimeout();
+      const { phase } = JSON.parse(event.data);
+      setScanStatus({ cache: 'cache', ssdp: 'SSDP', scan: '0%' }[phase] || phase);
+    });
+    source.addEventListener('progress', (event) => {
+      resetTimeout();
+      const { probed, total } = JSON.parse(event.data);
+      setScanStatus(`${total ? Math.floor((probed * 100) / total) : 100}%`);
+    });
+    source.addEventListener('printer', (event) => {
+      resetTimeout();
+      const { printer } = JSON.parse(event.data);
+      found.push(printer);
+      setScannedPrinters(prev => prev.some(p => p.ip === printer.ip) ? prev : [...prev, printer]);
+    });
+    source.addEventListener('done', () => {
+      // Schließen, bevor EventSource sich neu verbindet und einen weiteren Scan startet
+      clearTimeout(timeout);
+      source.close();
+      resolve(found);
+    });
+    source.onerror = () => {
+      clearTimeout(timeout);
+      source.close();
+      reject(new Error('Scan stream failed'));
+    };
+  });
+
   const handleScan = async () => {
+    let timer;
     try {
       setIsScanning(true);
-      setScanTimer(10);
+      setScanStatus('');
       console.log('Starte Scan...');
-      
-      // Timer UI updaten
-      const timer = setInterval(() => {
-        setScanTimer(prev => prev - 1);
-      }, 1000);
 
-      // Timeout nach 10 Sekunden
+      if (typeof EventSource !== 'undefined') {
+        setScannedPrinters([]);
+        try {
+          const printers = await scanStreamed();
+          setSnackbar({
+            open: true,
+            message: `Found ${printers.length} printer(s)`,
+            severity: 'success'
+          });
+          return;
+        } catch (error) {
+          if (error.message === 'Scan timeout') throw error;
+          console.warn('Streaming scan failed, falling back to /scan:', error);
+        }
+      }
+
+      // Ohne Stream kein Fortschritt: Countdown bis zum Timeout nach 10 Sekunden
+      let remaining = 10;
+      setScanStatus(`${remaining}s`);
+      timer = setInterval(() => {
+        remaining = Math.max(remaining - 1, 0);
+        setScanStatus(`${remaining}s`);
+      }, 1000);
       const timeoutPromise = new Promise((_, reject) => {
         setTimeout(() => {
-          clearInterval(timer);
           reject(new Error('Scan timeout'));
         }, 10000);
       });
@@ -421,11 +483,12 @@ const PrinterGrid = ({ onThemeToggle, isDarkMode, mode, onModeChange, printers =
       setSnackbar({
         open: true,
         message: error.message === 'Scan timeout' ? 
-          'Scan timeout after 10 seconds' : 
+          'Scan timed out' : 
           'Error scanning for printers',
         severity: 'error'
       });
     } finally {
+      clearInterval(timer);
       setIsScanning(false);
     }
   };
@@ -855,7 +918,7 @@ const PrinterGrid = ({ onThemeToggle, isDarkMode, mode, onModeChange, printers =
         isDarkMode={isDarkMode}
         scannedPrinters={scannedPrinters}
         isScanning={isScanning}
-        scanTimer={scanTimer}
+        scanStatus={scanStatus}
         onScan={handleScan}
       />
 